@@ -0,0 +1,242 @@
+# backfill_features.py
+"""
+Parallel historical feature backfill.
+
+History in the 'bars' table is split into shards of whole trading days.
+Each shard is built by `build_features` in a worker process, on the
+shard's bars plus the FEATURE_WARMUP_BARS bars before it so every
+rolling window (incl. the 1500-bar HVN profile) is exact; the warm-up
+rows are dropped again. The 15m/30m EMAs are not windowed, so they are
+computed in the parent, in shard order, from a carried EMA state.
+
+Shards are merged in order into the SQLite 'features' table or into the
+date-partitioned Parquet feature store (one day.parquet per date).
+
+    python backfill_features.py --start 2024-01-01 --end 2024-12-31 --workers 8
+    python backfill_features.py --to parquet --verify
+"""
+
+import argparse
+import logging
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from trade_config import TradeConfig
+from db import get_read_conn
+from feature_generator import build_features, ensure_feature_columns, insert_feature_rows
+from training_features.feature_registry import FEATURE_STAGES
+from training_features.feature_schema import apply_feature_dtypes
+from training_features.resample_manager import multi_timeframe_columns
+
+console = logging.getLogger("console")
+log = logging.getLogger(__name__)
+
+# Everything but the carried multi-timeframe EMAs is built inside the shards
+_SHARD_COLUMNS = [
+    col for stage in FEATURE_STAGES if stage.name != "multi_timeframe" for col in stage.produces
+]
+
+
+def trading_days(start: str | None = None, end: str | None = None) -> list[str]:
+    """Distinct 'YYYY-MM-DD' dates in the bars table within [start, end]."""
+    sql = "SELECT DISTINCT substr(timestamp, 1, 10) FROM bars WHERE 1=1"
+    params = []
+    if start:
+        sql += " AND timestamp >= ?"
+        params.append(start)
+    if end:
+        sql += " AND timestamp < date(?, '+1 day')"
+        params.append(end)
+    with get_read_conn() as conn:
+        rows = conn.execute(sql + " ORDER BY 1", params).fetchall()
+    return [r[0] for r in rows]
+
+
+def make_shards(days: list[str], days_per_shard: int) -> list[tuple[str, str]]:
+    """Consecutive (first_day, last_day) groups of whole trading days."""
+    return [
+        (days[i], days[min(i + days_per_shard, len(days)) - 1])
+        for i in range(0, len(days), days_per_shard)
+    ]
+
+
+def _ema_filter_15(close: pd.Series) -> np.ndarray:
+    """EMA20 > EMA50 regime flag, as computed by the streaming engine."""
+    ema20 = close.ewm(span=20, adjust=False).mean()
+    ema50 = close.ewm(span=50, adjust=False).mean()
+    return (ema20 > ema50).astype(int).to_numpy()
+
+
+def _load_bars(first_day: str, last_day: str, warmup_bars: int) -> tuple[pd.DataFrame, int]:
+    """Bars of [first_day, last_day] preceded by up to `warmup_bars` earlier bars."""
+    with get_read_conn() as conn:
+        warmup = pd.read_sql(
+            """
+            SELECT * FROM (
+                SELECT * FROM bars
+                 WHERE timestamp < ?
+                 ORDER BY timestamp DESC
+                 LIMIT ?
+            ) ORDER BY timestamp
+            """,
+            conn,
+            params=(first_day, warmup_bars)
+        )
+        shard = pd.read_sql(
+            "SELECT * FROM bars WHERE timestamp >= ? AND timestamp < date(?, '+1 day') ORDER BY timestamp",
+            conn,
+            params=(first_day, last_day)
+        )
+    if warmup.empty:
+        # Start of history (an empty frame would turn every column into object dtype)
+        return shard, 0
+    return pd.concat([warmup, shard], ignore_index=True), len(warmup)
+
+
+def build_shard(shard: tuple[str, str], warmup_bars: int = TradeConfig.FEATURE_WARMUP_BARS) -> pd.DataFrame:
+    """Worker: feature rows for one shard of trading days (warm-up rows dropped)."""
+    bars, n_warmup = _load_bars(shard[0], shard[1], warmup_bars)
+    bars['ema_filter_15'] = _ema_filter_15(bars['close'])
+    df = build_features(bars, _SHARD_COLUMNS)
+    return df.iloc[n_warmup:].reset_index(drop=True)
+
+
+def _add_multi_timeframe(df: pd.DataFrame, carry: dict) -> pd.DataFrame:
+    """Append the 15m/30m EMA columns, continuing the EMA state from the previous shard."""
+    for name, values in multi_timeframe_columns(df, carry=carry).items():
+        df[name] = values
+    return apply_feature_dtypes(df)
+
+
+def _seed_multi_timeframe(first_day: str) -> dict:
+    """EMA carry as of `first_day`, from the same warm-up bars a serial run would see."""
+    bars, n_warmup = _load_bars(first_day, first_day, TradeConfig.FEATURE_WARMUP_BARS)
+    carry = {}
+    warmup = bars.iloc[:n_warmup]
+    if len(warmup):
+        multi_timeframe_columns(
+            {'datetime': pd.to_datetime(warmup['timestamp']).to_numpy(), 'close': warmup['close'].to_numpy()},
+            carry=carry
+        )
+    return carry
+
+
+def iter_backfill(shards, workers: int):
+    """
+    Yield finished shards in order. At most 2 × workers shards are in
+    flight, so memory stays bounded however long the history is.
+    """
+    carry = _seed_multi_timeframe(shards[0][0])
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = deque()
+        shards = iter(shards)
+        for shard in shards:
+            pending.append(pool.submit(build_shard, shard))
+            if len(pending) >= 2 * workers:
+                break
+        while pending:
+            df = pending.popleft().result()
+            shard = next(shards, None)
+            if shard is not None:
+                pending.append(pool.submit(build_shard, shard))
+            yield _add_multi_timeframe(df, carry)
+
+
+def serial_backfill(shards) -> pd.DataFrame:
+    """Reference: one build_features run over the whole range (for --verify)."""
+    bars, n_warmup = _load_bars(shards[0][0], shards[-1][1], TradeConfig.FEATURE_WARMUP_BARS)
+    bars['ema_filter_15'] = _ema_filter_15(bars['close'])
+    return build_features(bars).iloc[n_warmup:].reset_index(drop=True)
+
+
+def compare_frames(parallel: pd.DataFrame, serial: pd.DataFrame, rtol: float = 1e-9) -> list[str]:
+    """
+    Columns that differ between two feature frames. Floats are compared
+    with `rtol` (rolling sums restarted at a shard boundary can differ in
+    the last ulp); 'nearest_zone_strength' is a random placeholder.
+    """
+    if list(parallel.columns) != list(serial.columns) or len(parallel) != len(serial):
+        return ["<shape/columns>"]
+    bad = []
+    for col in serial.columns:
+        if col == "nearest_zone_strength":
+            continue
+        a, b = parallel[col], serial[col]
+        if pd.api.types.is_numeric_dtype(b) and not pd.api.types.is_bool_dtype(b):
+            same = np.allclose(a.to_numpy(float), b.to_numpy(float), rtol=rtol, atol=1e-9, equal_nan=True)
+        else:
+            same = (a.isna() == b.isna()).all() and (a[a.notna()].astype(str) == b[b.notna()].astype(str)).all()
+        if not same:
+            bad.append(col)
+    return bad
+
+
+def _write_parquet_day(day: str, df: pd.DataFrame, root: Path) -> None:
+    day_dir = root / day
+    day_dir.mkdir(parents=True, exist_ok=True)
+    tmp = day_dir / "day.parquet.tmp"
+    df.to_parquet(tmp, index=False, compression=TradeConfig.PARQUET_COMPRESSION)
+    tmp.replace(day_dir / "day.parquet")
+
+
+def run_backfill(
+    start: str | None = None,
+    end: str | None = None,
+    workers: int | None = None,
+    days_per_shard: int = 20,
+    to: str = "sqlite",
+    verify: bool = False
+) -> int:
+    """Backfill features for [start, end]; returns rows written."""
+    workers = workers or os.cpu_count() or 1
+    shards = make_shards(trading_days(start, end), days_per_shard)
+    if not shards:
+        console.info("No bars to backfill.")
+        return 0
+    console.info(f"🛠 Backfilling {shards[0][0]} → {shards[-1][1]}: {len(shards)} shards on {workers} workers")
+
+    if to == "sqlite":
+        ensure_feature_columns()
+
+    t0 = time.time()
+    written = 0
+    kept = [] if verify else None
+    for df in iter_backfill(shards, workers):
+        if kept is not None:
+            kept.append(df.copy())
+        if to == "sqlite":
+            # One shard in flight at a time; only committed rows are counted
+            written += insert_feature_rows(df, wait=True)
+        else:
+            days = pd.to_datetime(df['timestamp']).dt.strftime("%Y-%m-%d")
+            for day, part in df.groupby(days, sort=True):
+                _write_parquet_day(day, part, TradeConfig.FEATURE_STORE_DIR)
+            written += len(df)
+    console.info(f"✅ Backfilled {written} feature rows in {time.time() - t0:.1f}s")
+
+    if verify:
+        parallel = pd.concat(kept, ignore_index=True)
+        bad = compare_frames(parallel, serial_backfill(shards))
+        if bad:
+            raise AssertionError(f"Parallel backfill differs from serial run in: {', '.join(bad)}")
+        console.info(f"✅ Verified {len(parallel)} rows identical to a serial build_features run")
+
+    return written
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description="Parallel historical feature backfill")
+    parser.add_argument("--start", help="first date (YYYY-MM-DD)")
+    parser.add_argument("--end", help="last date (YYYY-MM-DD)")
+    parser.add_argument("--workers", type=int, help="worker processes (default: all cores)")
+    parser.add_argument("--days-per-shard", type=int, default=20)
+    parser.add_argument("--to", choices=("sqlite", "parquet"), default="sqlite")
+    parser.add_argument("--verify", action="store_true", help="compare against a serial build_features run")
+    args = parser.parse_args()
+    run_backfill(args.start, args.end, args.workers, args.days_per_shard, args.to, args.verify)
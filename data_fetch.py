@@ -8,36 +8,56 @@ import logging
 import pandas as pd
 from trade_config import TradeConfig
 from true_data_utils import fetch_latest_ohlcv
-from db import get_conn
+from db import init_db, get_read_conn, bulk_insert, get_signal_cache
+from db_writer import submit, log_bulk_result, FailedWrites
 
 log = logging.getLogger(__name__)
 
-def data_fetch_cycle() -> int:
+# Newest bar stored by this process (read from 'bars' once, then kept in memory)
+_last_ts = None
+# Newest queued 'bars' insert, and the ones that failed (_last_ts is already past them)
+_last_insert = None
+_failed_inserts = FailedWrites()
+
+
+def fetch_new_bars() -> pd.DataFrame:
     """
     1) Ensure DB & 'bars' table exist
-    2) Read the last timestamp (ISO string) from 'bars'
+    2) Last stored timestamp: from memory, or MAX(timestamp) of 'bars' on the
+       first call and after a failed insert (then the last one before it)
     3) Fetch fresh bars via TrueData
     4) Normalize & filter to only those newer than last_ts
     5) Ensure symbol & date columns
     6) Convert timestamps to "YYYY-MM-DD HH:MM:SS"
-    7) INSERT OR IGNORE into 'bars' table
-    Returns number of rows inserted.
+    7) INSERT OR IGNORE into 'bars' table (queued for the db_writer thread)
+    Returns the new bars, shaped like rows of 'bars' (empty if none).
     """
+    global _last_ts, _last_insert
+    cols = list(TradeConfig.BAR_COLS) + ['symbol', 'date']
+
     # 1) Init schema
     init_db()
 
     # 2) Get the last timestamp from bars (as "YYYY-MM-DD HH:MM:SS" or None)
-    with get_conn() as conn:
-        cur = conn.cursor()
-        cur.execute("SELECT MAX(timestamp) FROM bars")
-        row = cur.fetchone()
-        last_ts = row[0] if row and row[0] is not None else None
+    failed_from = _failed_inserts.take()
+    if failed_from is not None:
+        log.warning("Bars from %s were not stored; fetching them again", failed_from)
+    if _last_ts is None or failed_from is not None:
+        with get_read_conn() as conn:
+            cur = conn.cursor()
+            if failed_from is not None:
+                cur.execute("SELECT MAX(timestamp) FROM bars WHERE timestamp < ?", (failed_from,))
+            else:
+                cur.execute("SELECT MAX(timestamp) FROM bars")
+            row = cur.fetchone()
+            _last_ts = row[0] if row and row[0] is not None else None
+    last_ts = _last_ts
 
     # 3) Fetch raw bars
     df = fetch_latest_ohlcv()
     if df is None or df.empty:
         log.debug("No new bars fetched.")
-        return 0
+        return pd.DataFrame(columns=cols)
 
     # 4) Parse & filter by last_ts
     df['timestamp'] = pd.to_datetime(df['timestamp'], errors='coerce')
@@ -46,7 +66,7 @@ def data_fetch_cycle() -> int:
         df = df[df['timestamp'] > pd.to_datetime(last_ts)]
     if df.empty:
         log.debug("No bars newer than last timestamp; nothing to insert.")
-        return 0
+        return pd.DataFrame(columns=cols)
 
     # 5) Ensure metadata
     if 'symbol' not in df.columns:
@@ -55,26 +75,30 @@ def data_fetch_cycle() -> int:
         df['date'] = df['timestamp'].dt.strftime("%Y-%m-%d")
 
     # 6) Format timestamps with a SPACE
+    df = df.sort_values('timestamp')
     df['timestamp'] = df['timestamp'].dt.strftime("%Y-%m-%d %H:%M:%S")
 
     # 7) Bulk INSERT OR IGNORE
-    cols = list(TradeConfig.BAR_COLS) + ['symbol', 'date']
-    placeholders = ", ".join("?" for _ in cols)
-    sql = f"INSERT OR IGNORE INTO bars ({','.join(cols)}) VALUES ({placeholders})"
-
-    inserted = 0
-    with get_conn() as conn:
-        cur = conn.cursor()
-        for vals in df[cols].itertuples(index=False, name=None):
-            try:
-                cur.execute(sql, vals)
-                inserted += cur.rowcount
-            except Exception as e:
-                log.error("Failed to insert %s: %s", vals, e)
-        conn.commit()
-
-    log.info("Inserted %d new bars into SQLite 'bars' table", inserted)
-    return inserted
+    bars = df[cols].reset_index(drop=True)
+    # (committed by the db_writer thread; counts logged once done)
+    _last_insert = submit(bulk_insert, "bars", bars)
+    log_bulk_result(_last_insert, "bars", log)
+    _failed_inserts.watch(_last_insert, bars['timestamp'].iloc[0])
+    _last_ts = bars['timestamp'].iloc[-1]
+    # Closes for the entry/exit signal join (db.SignalCache)
+    get_signal_cache().publish_bars(bars['timestamp'].tolist(), bars['close'].tolist())
+    return bars
+
+
+def wait_for_bars() -> None:
+    """Block until the newest queued 'bars' insert is committed; raises if it failed."""
+    if _last_insert is not None:
+        _last_insert.result()
+
+
+def data_fetch_cycle() -> int:
+    """Fetch and store new bars (see fetch_new_bars). Returns number of new bars."""
+    return len(fetch_new_bars())
 
 if __name__ == "__main__":
     logging.basicConfig(level=logging.INFO)
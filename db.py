@@ -1,46 +1,487 @@
 # db.py
 # Utility functions for DB interaction (SQLite3)
 
+import atexit
+import logging
+import os
+import queue
 import sqlite3
+import threading
+from pathlib import Path
+import numpy as np
 import pandas as pd
 from contextlib import contextmanager
-from trade_config import BASE_DIR
+from dataclasses import dataclass, field
+from datetime import datetime
+from trade_config import BASE_DIR, TradeConfig
+import db_schema
+
+log = logging.getLogger(__name__)
 
 DB_PATH = BASE_DIR / "core_files" / "trading_data.db"
 
 
-@contextmanager
+# === Connection manager ===
+
+class ConnectionManager:
+    """
+    Long-lived, tuned connections to one SQLite file.
+
+    - one persistent writer connection, handed to one thread at a time
+      (SQLite allows a single writer anyway); re-entrant within a thread
+    - a pool of read-only connections (up to `pool_size` idle), which in
+      WAL mode never block the writer and are never blocked by it
+
+    Every connection runs with WAL, synchronous=NORMAL, a large page
+    cache, mmap I/O and a busy timeout, and keeps sqlite3's prepared
+    statement cache warm because it is reused.
+    """
+
+    def __init__(self, path, pool_size: int = TradeConfig.DB_READ_POOL_SIZE):
+        self.path = path
+        self._writer = None
+        self._writer_lock = threading.RLock()
+        self._local = threading.local()
+        self._readers = queue.LifoQueue(maxsize=pool_size)
+        self._closed = False
+        self.schema_ready = False   # set by init_db()
+
+    def _connect(self, readonly: bool) -> sqlite3.Connection:
+        if readonly:
+            conn = sqlite3.connect(
+                Path(self.path).resolve().as_uri() + "?mode=ro", uri=True,
+                check_same_thread=False,
+                cached_statements=TradeConfig.DB_CACHED_STATEMENTS
+            )
+        else:
+            conn = sqlite3.connect(
+                self.path,
+                check_same_thread=False,
+                cached_statements=TradeConfig.DB_CACHED_STATEMENTS
+            )
+            conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(f"PRAGMA busy_timeout={int(TradeConfig.DB_BUSY_TIMEOUT_MS)}")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(f"PRAGMA cache_size={-int(TradeConfig.DB_CACHE_SIZE_KB)}")
+        conn.execute(f"PRAGMA mmap_size={int(TradeConfig.DB_MMAP_SIZE)}")
+        conn.execute("PRAGMA temp_store=MEMORY")
+        if readonly:
+            conn.execute("PRAGMA query_only=ON")
+        return conn
+
+    @contextmanager
+    def writer(self):
+        """
+        The shared read-write connection, locked for the duration of the
+        block. Anything left uncommitted when the outermost block exits
+        (or raises) is rolled back, as closing a connection would.
+        """
+        with self._writer_lock:
+            if self._writer is None:
+                self._writer = self._connect(readonly=False)
+            conn = self._writer
+            depth = getattr(self._local, "depth", 0)
+            self._local.depth = depth + 1
+            try:
+                yield conn
+            finally:
+                self._local.depth = depth
+                if depth == 0 and conn.in_transaction:
+                    conn.rollback()
+
+    @contextmanager
+    def reader(self):
+        """A pooled read-only connection (returned to the pool afterwards)."""
+        try:
+            conn = self._readers.get_nowait()
+        except queue.Empty:
+            # The writer creates the file and switches it to WAL first
+            with self.writer():
+                pass
+            conn = self._connect(readonly=True)
+        try:
+            yield conn
+        finally:
+            if conn.in_transaction:
+                conn.rollback()
+            try:
+                if self._closed:
+                    raise queue.Full
+                self._readers.put_nowait(conn)
+            except queue.Full:
+                conn.close()
+
+    def holds_writer(self) -> bool:
+        """True inside a writer() block on this thread."""
+        return getattr(self._local, "depth", 0) > 0
+
+    def close(self) -> None:
+        """Close the writer and every idle reader."""
+        self._closed = True
+        with self._writer_lock:
+            if self._writer is not None:
+                try:
+                    # Refresh planner statistics that drifted this session
+                    self._writer.execute("PRAGMA optimize")
+                except sqlite3.Error as e:
+                    log.debug("PRAGMA optimize failed: %s", e)
+                self._writer.close()
+                self._writer = None
+        while True:
+            try:
+                self._readers.get_nowait().close()
+            except queue.Empty:
+                break
+
+
+_manager = None
+_manager_pid = None
+_manager_lock = threading.Lock()
+
+
+def get_manager() -> ConnectionManager:
+    """Process-wide manager (rebuilt in a forked child: connections don't survive fork)."""
+    global _manager, _manager_pid
+    with _manager_lock:
+        if _manager is None or _manager_pid != os.getpid():
+            _manager = ConnectionManager(DB_PATH)
+            _manager_pid = os.getpid()
+        return _manager
+
+
+def close_connections() -> None:
+    global _manager
+    with _manager_lock:
+        if _manager is not None and _manager_pid == os.getpid():
+            _manager.close()
+        _manager = None
+
+
+atexit.register(close_connections)
+
+
 def get_conn():
-    conn = sqlite3.connect(DB_PATH)
+    """Shared read-write connection (use as `with get_conn() as conn:`)."""
+    return get_manager().writer()
+
+
+def get_read_conn():
+    """
+    Pooled read-only connection for queries that never write. With the
+    async writer running, writes queued by this process are committed
+    first (read-your-writes; see db_writer).
+    """
+    if _read_barrier is not None and not get_manager().holds_writer():
+        _read_barrier()
+    return get_manager().reader()
+
+
+_read_barrier = None
+
+
+def set_read_barrier(barrier) -> None:
+    """Callable run before every get_read_conn() (None to remove)."""
+    global _read_barrier
+    _read_barrier = barrier
+
+
+@contextmanager
+def transaction(conn):
+    """
+    BEGIN ... COMMIT on `conn`, or a savepoint when a transaction is
+    already open (a db_writer group commit), so the same write code runs
+    standalone or batched with others.
+    """
+    if conn.in_transaction:
+        conn.execute("SAVEPOINT txn")
+        try:
+            yield conn
+        except BaseException:
+            conn.execute("ROLLBACK TO txn")
+            conn.execute("RELEASE txn")
+            raise
+        conn.execute("RELEASE txn")
+        return
+    conn.execute("BEGIN")
     try:
         yield conn
-    finally:
-        conn.close()
+    except BaseException:
+        conn.rollback()
+        raise
+    conn.commit()
+
+
+# === Bulk writes ===
+
+def execute_write(sql: str, params=(), many: bool = False) -> int:
+    """
+    One write statement (executemany with `many`) in its own transaction,
+    or the caller's group. Returns rows changed.
+    """
+    with get_conn() as conn, transaction(conn):
+        if many:
+            return conn.executemany(sql, params).rowcount
+        return conn.execute(sql, params).rowcount
+
+
+@dataclass
+class BulkResult:
+    inserted: int = 0
+    ignored: int = 0                              # duplicates skipped by OR IGNORE
+    failed: list = field(default_factory=list)    # (row position, error message)
+
+
+def frame_rows(df: pd.DataFrame, columns=None) -> list:
+    """
+    DataFrame -> list of tuples sqlite3 can bind: datetimes as
+    "YYYY-MM-DD HH:MM:SS" strings, missing values as None/NaN (both
+    stored as NULL), numpy scalars as Python scalars.
+    """
+    columns = list(df.columns) if columns is None else list(columns)
+    values = []
+    for col in columns:
+        s = df[col]
+        if pd.api.types.is_datetime64_any_dtype(s):
+            s = s.dt.strftime("%Y-%m-%d %H:%M:%S")
+        if isinstance(s.dtype, np.dtype) and s.dtype.kind in "biuf":
+            # Plain numpy column: tolist() yields Python scalars directly
+            values.append(s.to_numpy().tolist())
+        else:
+            values.append(s.astype(object).where(s.notna(), None).tolist())
+    return list(zip(*values))
+
+
+def _execute_isolating(cur, sql: str, rows: list, offset: int, failed: list) -> int:
+    """
+    executemany `rows` inside a savepoint; if any row fails, roll the
+    savepoint back and bisect, so good rows still go in and each bad row
+    is reported once (no per-row commits). Returns rows changed.
+    """
+    if not rows:
+        return 0
+    cur.execute("SAVEPOINT bulk_rows")
+    try:
+        cur.executemany(sql, rows)
+        changed = cur.rowcount
+        cur.execute("RELEASE bulk_rows")
+        return changed
+    except (sqlite3.DatabaseError, sqlite3.InterfaceError, ValueError, OverflowError) as e:
+        cur.execute("ROLLBACK TO bulk_rows")
+        cur.execute("RELEASE bulk_rows")
+        if len(rows) == 1:
+            failed.append((offset, str(e)))
+            return 0
+    mid = len(rows) // 2
+    return (
+        _execute_isolating(cur, sql, rows[:mid], offset, failed)
+        + _execute_isolating(cur, sql, rows[mid:], offset + mid, failed)
+    )
+
+
+def _row_chunks(rows, columns, chunk_rows: int):
+    """(offset, list of tuples) chunks, converting DataFrame slices lazily."""
+    if isinstance(rows, pd.DataFrame):
+        for start in range(0, len(rows), chunk_rows):
+            yield start, frame_rows(rows.iloc[start:start + chunk_rows], columns)
+    else:
+        rows = list(rows)
+        for start in range(0, len(rows), chunk_rows):
+            yield start, rows[start:start + chunk_rows]
+
+
+def bulk_insert(
+    table: str,
+    rows,
+    columns=None,
+    staging: bool | None = None,
+    or_ignore: bool = True
+) -> BulkResult:
+    """
+    Insert many rows in one transaction with executemany.
+
+    `rows` is a DataFrame (columns default to its columns) or a sequence
+    of tuples matching `columns`; it is bound in chunks of
+    DB_BULK_CHUNK_ROWS so large frames are never converted all at once.
+    With `staging` (default: at least DB_BULK_STAGING_ROWS rows) the rows
+    are first loaded into an unindexed TEMP table and moved with one
+    INSERT OR IGNORE … SELECT, so the target's indexes are maintained in
+    a single pass.
+
+    Rows that cannot be bound or violate a constraint are skipped and
+    reported in `failed`; everything else is committed once.
+    """
+    if isinstance(rows, pd.DataFrame):
+        columns = list(rows.columns) if columns is None else list(columns)
+    else:
+        rows = list(rows)
+    result = BulkResult()
+    n_rows = len(rows)
+    if not n_rows:
+        return result
+    if staging is None:
+        staging = n_rows >= TradeConfig.DB_BULK_STAGING_ROWS
+
+    col_sql = ", ".join(columns)
+    params = ", ".join("?" for _ in columns)
+    verb = "INSERT OR IGNORE" if or_ignore else "INSERT"
+    target = "temp.bulk_staging" if staging else table
+    insert_sql = f"{'INSERT' if staging else verb} INTO {target} ({col_sql}) VALUES ({params})"
+
+    with get_conn() as conn, transaction(conn):
+        cur = conn.cursor()
+        if staging:
+            cur.execute("DROP TABLE IF EXISTS temp.bulk_staging")
+            cur.execute(f"CREATE TEMP TABLE bulk_staging ({col_sql})")
+        for offset, chunk in _row_chunks(rows, columns, TradeConfig.DB_BULK_CHUNK_ROWS):
+            result.inserted += _execute_isolating(cur, insert_sql, chunk, offset, result.failed)
+        if staging:
+            cur.execute(
+                f"{verb} INTO {table} ({col_sql}) SELECT {col_sql} FROM temp.bulk_staging ORDER BY rowid"
+            )
+            result.inserted = cur.rowcount
+            cur.execute("DROP TABLE temp.bulk_staging")
+
+    result.ignored = n_rows - len(result.failed) - result.inserted
+    for pos, err in result.failed[:5]:
+        log.error("Bulk insert into %s: row %d rejected: %s", table, pos, err)
+    if len(result.failed) > 5:
+        log.error("Bulk insert into %s: %d more rows rejected", table, len(result.failed) - 5)
+    return result
 
 
 def read_table(table_name: str) -> pd.DataFrame:
     """Generic fetch for full table."""
-    with get_conn() as conn:
+    with get_read_conn() as conn:
         df = pd.read_sql(f"SELECT * FROM {table_name}", conn, parse_dates=["timestamp"])
     return df
 
 
 def read_today_predictions() -> pd.DataFrame:
     """Fetch today's predictions (new_predictions table)."""
+    # Range on the key instead of date(timestamp), so it is an index seek
     sql = """
         SELECT *
           FROM new_predictions
-         WHERE date(timestamp) = date('now', 'localtime')
+         WHERE timestamp >= date('now', 'localtime')
+           AND timestamp <  date('now', 'localtime', '+1 day')
          ORDER BY timestamp
     """
-    with get_conn() as conn:
+    with get_read_conn() as conn:
         df = pd.read_sql(sql, conn, parse_dates=["timestamp"])
     return df
 
 
+# === Latest signal cache ===
+
+_SIGNAL_COLUMNS = (
+    "timestamp", "direction", "confidence", "long_conf", "short_conf",
+    "entry_smoothed_long_conf", "entry_smoothed_short_conf",
+    "exit_smoothed_long_conf", "exit_smoothed_short_conf",
+)
+
+
+class SignalCache:
+    """
+    The latest smoothed prediction joined with its bar close, in memory.
+
+    data_fetch publishes the closes it stores and smooth_prediction the
+    newest smoothed row, so `latest()` is a dict lookup and the
+    entry/exit path never queries in steady state. An empty cache (fresh
+    process) is filled by one index range query over today's predictions.
+    """
+
+    def __init__(self, max_bars: int = TradeConfig.SIGNAL_CACHE_BARS):
+        self.max_bars = max_bars
+        self._closes = {}     # "YYYY-MM-DD HH:MM:SS" -> close, oldest first
+        self._signal = None   # newest smoothed prediction row (dict, timestamp as str)
+        self._lock = threading.Lock()
+
+    def publish_bars(self, timestamps, closes) -> None:
+        """Bar closes just stored (timestamps as "YYYY-MM-DD HH:MM:SS" strings)."""
+        with self._lock:
+            for ts, close in zip(timestamps, closes):
+                self._closes[ts] = float(close)
+            while len(self._closes) > self.max_bars:
+                del self._closes[next(iter(self._closes))]
+
+    def publish_signal(self, row: dict) -> None:
+        """Newest smoothed prediction (keys from _SIGNAL_COLUMNS; older rows are ignored)."""
+        signal = {col: row.get(col) for col in _SIGNAL_COLUMNS}
+        with self._lock:
+            if self._signal is None or signal["timestamp"] >= self._signal["timestamp"]:
+                self._signal = signal
+
+    def latest(self) -> dict | None:
+        """
+        Latest smoothed prediction with the bar 'close' and a parsed
+        'timestamp', or None if there is none today.
+        """
+        with self._lock:
+            signal = self._signal
+            close = self._closes.get(signal["timestamp"]) if signal else None
+        if signal is None:
+            signal = self.reload()
+            if signal is None:
+                return None
+            close = signal.get("close")
+        if close is None:
+            # Bar stored by another process: one primary-key lookup
+            with get_read_conn() as conn:
+                row = conn.execute(
+                    "SELECT close FROM bars WHERE timestamp = ?", (signal["timestamp"],)
+                ).fetchone()
+            if row is None:
+                return None
+            close = row[0]
+            self.publish_bars([signal["timestamp"]], [close])
+        out = dict(signal, close=close)
+        out["timestamp"] = datetime.strptime(signal["timestamp"], "%Y-%m-%d %H:%M:%S")
+        return out
+
+    def reload(self) -> dict | None:
+        """Seed the cache from today's newest smoothed prediction and its bar."""
+        cols = ", ".join(f"p.{col}" for col in _SIGNAL_COLUMNS)
+        with get_read_conn() as conn:
+            cur = conn.execute(f"""
+                SELECT {cols}, b.close
+                  FROM new_predictions p
+                  LEFT JOIN bars b ON b.timestamp = p.timestamp
+                 WHERE p.timestamp >= date('now', 'localtime')
+                   AND p.timestamp <  date('now', 'localtime', '+1 day')
+                   AND p.entry_smoothed_long_conf IS NOT NULL
+                 ORDER BY p.timestamp DESC
+                 LIMIT 1
+            """)
+            row = cur.fetchone()
+        if row is None:
+            return None
+        signal = dict(zip(_SIGNAL_COLUMNS + ("close",), row))
+        self.publish_signal(signal)
+        if signal["close"] is not None:
+            self.publish_bars([signal["timestamp"]], [signal["close"]])
+        return signal
+
+    def clear(self) -> None:
+        with self._lock:
+            self._closes.clear()
+            self._signal = None
+
+
+_signal_cache = SignalCache()
+
+
+def get_signal_cache() -> SignalCache:
+    return _signal_cache
+
+
+def load_latest_prediction_row() -> dict | None:
+    """Latest smoothed prediction joined with its bar close (see SignalCache)."""
+    return _signal_cache.latest()
+
+
 def get_active_trade_count() -> int:
     """Return how many trades are currently open."""
-    with get_conn() as conn:
+    with get_read_conn() as conn:
         cursor = conn.cursor()
         cursor.execute("""
             SELECT COUNT(*) 
@@ -50,96 +491,52 @@ def get_active_trade_count() -> int:
         return cursor.fetchone()[0]
 
 
+# Daily counters and trades live in state_manager.DailyLedger / TradeBook
+# (imported lazily: state_manager imports this module)
+
 def get_last_trade_number() -> int:
     """Return last trade number used today."""
-    with get_conn() as conn:
-        cursor = conn.cursor()
-        cursor.execute("""
-            SELECT last_trade_number
-              FROM daily_trade_state
-             WHERE date = date('now', 'localtime')
-        """)
-        row = cursor.fetchone()
-        return row[0] if row else 0
+    from state_manager import get_daily_ledger
+    return get_daily_ledger().trade_count()
 
 
-def increment_trade_number_and_update_state():
-    """Increments today's trade number and updates state."""
-    with get_conn() as conn:
-        cursor = conn.cursor()
-        cursor.execute("""
-            INSERT INTO daily_trade_state (date, last_trade_number, active_trade_count, closed_trade_count, win_count, loss_count, daily_pnl)
-            VALUES (date('now', 'localtime'), 1, 0, 0, 0, 0, 0.0)
-            ON CONFLICT(date)
-            DO UPDATE SET last_trade_number = last_trade_number + 1
-        """)
-        conn.commit()
+def increment_trade_number_and_update_state() -> int:
+    """Increments today's trade number and updates state; returns the new number."""
+    from state_manager import get_daily_ledger
+    return get_daily_ledger().open_trade()
 
 
 def insert_live_trade(trade: dict):
-    """Insert a new trade into live_trade_details."""
-    with get_conn() as conn:
-        cursor = conn.cursor()
-        cursor.execute("""
-            INSERT INTO live_trade_details (
-                trade_number, timestamp, entry_time, entry_order_id, direction, confidence,
-                instrument, quantity, entry_index_price, entry_price_option, status,
-                fut_index_sl_level, fut_index_tp_level, strike, raw_confidence
-            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-        """, (
-            trade['trade_number'], trade['timestamp'], trade['entry_time'], trade['entry_order_id'], trade['direction'],
-            trade['confidence'], trade['instrument'], trade['quantity'], trade['entry_index_price'],
-            trade['entry_price_option'], trade['status'], trade['fut_index_sl_level'], trade['fut_index_tp_level'],
-            trade['strike'], trade.get('raw_confidence')
-        ))
-        conn.commit()
+    """Insert a new trade into live_trade_details (through the trade book)."""
+    from state_manager import get_trade_book
+    return get_trade_book().add(trade)
 
 
 def update_trade_exit(trade_number: int, updates: dict):
-    """Update exit-related fields in live_trade_details."""
-    with get_conn() as conn:
-        cursor = conn.cursor()
-        cursor.execute("""
-            UPDATE live_trade_details
-               SET exit_time = ?, exit_order_id = ?, exit_index_price = ?, exit_price_option = ?,
-                   option_pnl = ?, index_pnl = ?, exit_reason = ?, status = ?
-             WHERE trade_number = ?
-        """, (
-            updates['exit_time'], updates['exit_order_id'], updates['exit_index_price'],
-            updates['exit_price_option'], updates['option_pnl'], updates['index_pnl'],
-            updates['exit_reason'], updates['status'], trade_number
-        ))
-        conn.commit()
+    """Update exit-related fields of the newest open trade with this number."""
+    from state_manager import get_trade_book
+    book = get_trade_book()
+    trade = book.find(trade_number)
+    if trade is None:
+        log.warning("No open trade %s to update", trade_number)
+        return None
+    return book.update(trade["id"], updates)
 
 
 def update_daily_pnl(win: bool, pnl: float):
     """Update daily P&L and trade stats."""
-    with get_conn() as conn:
-        cursor = conn.cursor()
-        cursor.execute("""
-            UPDATE daily_trade_state
-               SET closed_trade_count = closed_trade_count + 1,
-                   win_count = win_count + ?,
-                   loss_count = loss_count + ?,
-                   daily_pnl = daily_pnl + ?
-             WHERE date = date('now', 'localtime')
-        """, (
-            1 if win else 0,
-            0 if win else 1,
-            pnl
-        ))
-        conn.commit()
-        
+    from state_manager import get_daily_ledger
+    get_daily_ledger().close_trade(pnl, win=win)
+
+
 def init_db():
+    """
+    Create / migrate the schema (see db_schema). Runs the migrations once
+    per process; later calls only return.
+    """
+    manager = get_manager()
+    if manager.schema_ready:
+        return
     with get_conn() as conn:
-        cursor = conn.cursor()
-        # Create tables if not exist
-        cursor.execute("""
-        CREATE TABLE IF NOT EXISTS new_predictions (
-            timestamp TEXT PRIMARY KEY,
-            direction TEXT,
-            confidence REAL,
-            ...
-        );
-        """)
-        conn.commit()
+        db_schema.migrate(conn)
+    manager.schema_ready = True
@@ -0,0 +1,290 @@
+# db_schema.py
+"""
+Versioned schema for the trading SQLite database.
+
+The schema version lives in `PRAGMA user_version`. `migrate()` applies
+every MIGRATIONS step above the stored version, each in its own
+transaction, then refreshes the planner statistics (ANALYZE). Steps are
+written to also upgrade databases created before this module existed:
+tables are created IF NOT EXISTS, tables that predate their timestamp /
+date primary key get an equivalent unique index instead, and a
+live_trade_details table without its row id is rebuilt with one.
+
+The 'features' table follows the feature pipeline: columns produced by
+a newer pipeline are added on every migrate() (no version bump needed).
+"""
+
+import logging
+import sqlite3
+
+from training_features.feature_registry import BASE_COLUMNS, FEATURE_STAGES
+from training_features.feature_schema import sqlite_type
+
+log = logging.getLogger(__name__)
+
+
+# === Table definitions ===
+
+BARS_DDL = """
+CREATE TABLE IF NOT EXISTS bars (
+    timestamp      TEXT PRIMARY KEY,
+    open           REAL,
+    high           REAL,
+    low            REAL,
+    close          REAL,
+    volume         REAL,
+    open_interest  REAL,
+    symbol         TEXT,
+    date           TEXT
+)
+"""
+
+NEW_PREDICTIONS_DDL = """
+CREATE TABLE IF NOT EXISTS new_predictions (
+    timestamp                  TEXT PRIMARY KEY,
+    direction                  TEXT,
+    confidence                 REAL,
+    long_conf                  REAL,
+    short_conf                 REAL,
+    entry_smoothed_long_conf   REAL,
+    entry_smoothed_short_conf  REAL,
+    exit_smoothed_long_conf    REAL,
+    exit_smoothed_short_conf   REAL
+)
+"""
+
+# trade_number restarts every day, so the row id is the key
+LIVE_TRADE_DETAILS_DDL = """
+CREATE TABLE IF NOT EXISTS live_trade_details (
+    id                  INTEGER PRIMARY KEY,
+    trade_number        INTEGER NOT NULL,
+    timestamp           TEXT,
+    entry_time          TEXT,
+    entry_order_id      TEXT,
+    direction           TEXT,
+    confidence          REAL,
+    raw_confidence      REAL,
+    instrument          TEXT,
+    strike              INTEGER,
+    quantity            INTEGER,
+    entry_index_price   REAL,
+    entry_price_option  REAL,
+    fut_index_sl_level  REAL,
+    fut_index_tp_level  REAL,
+    status              TEXT NOT NULL DEFAULT 'OPEN',
+    exit_time           TEXT,
+    exit_order_id       TEXT,
+    exit_index_price    REAL,
+    exit_price_option   REAL,
+    option_pnl          REAL,
+    index_pnl           REAL,
+    exit_reason         TEXT
+)
+"""
+
+DAILY_TRADE_STATE_DDL = """
+CREATE TABLE IF NOT EXISTS daily_trade_state (
+    date                TEXT PRIMARY KEY,
+    last_trade_number   INTEGER NOT NULL DEFAULT 0,
+    active_trade_count  INTEGER NOT NULL DEFAULT 0,
+    closed_trade_count  INTEGER NOT NULL DEFAULT 0,
+    win_count           INTEGER NOT NULL DEFAULT 0,
+    loss_count          INTEGER NOT NULL DEFAULT 0,
+    daily_pnl           REAL    NOT NULL DEFAULT 0.0
+)
+"""
+
+
+def feature_columns() -> dict:
+    """Every column build_features can emit -> SQLite declaration (timestamp is the key)."""
+    columns = {}
+    for col in BASE_COLUMNS + tuple(c for stage in FEATURE_STAGES for c in stage.produces):
+        if col != "timestamp":
+            columns.setdefault(col, sqlite_type(col))
+    return columns
+
+
+def features_ddl() -> str:
+    cols = ",\n    ".join(f"{col} {col_type}" for col, col_type in feature_columns().items())
+    return f"CREATE TABLE IF NOT EXISTS features (\n    timestamp TEXT PRIMARY KEY,\n    {cols}\n)"
+
+
+# === Helpers ===
+
+def table_columns(conn, table: str) -> dict:
+    """Column name -> pk position (0 = not part of the primary key)."""
+    return {row[1]: row[5] for row in conn.execute(f"PRAGMA table_info({table})")}
+
+
+def _declared_columns(ddl: str) -> dict:
+    """
+    Column -> declaration from one of the CREATE TABLE statements above,
+    in the form ALTER TABLE ADD COLUMN accepts (key columns skipped,
+    NOT NULL dropped).
+    """
+    body = ddl[ddl.index("(") + 1: ddl.rindex(")")]
+    columns = {}
+    for line in body.strip().splitlines():
+        name, *decl = line.strip().rstrip(",").split()
+        if "PRIMARY" in decl:
+            continue
+        columns[name] = " ".join(decl).replace("NOT NULL ", "").replace(" NOT NULL", "")
+    return columns
+
+
+# live_trade_details columns a trade dict may carry ('id' is the row key)
+LIVE_TRADE_COLUMNS = ("id",) + tuple(_declared_columns(LIVE_TRADE_DETAILS_DDL))
+
+
+def _add_missing_columns(conn, table: str, columns: dict) -> list:
+    existing = table_columns(conn, table)
+    added = []
+    for col, col_type in columns.items():
+        if col not in existing:
+            conn.execute(f"ALTER TABLE {table} ADD COLUMN {col} {col_type}")
+            added.append(col)
+    return added
+
+
+def _ensure_unique(conn, table: str, column: str) -> None:
+    """Unique index on `column` for tables created before it was the primary key."""
+    if table_columns(conn, table).get(column):
+        return
+    try:
+        conn.execute(f"CREATE UNIQUE INDEX IF NOT EXISTS ux_{table}_{column} ON {table}({column})")
+    except sqlite3.IntegrityError:
+        # Duplicates already stored: fall back to a plain index for the lookups
+        log.warning("Duplicate %s.%s values; creating a non-unique index", table, column)
+        conn.execute(f"CREATE INDEX IF NOT EXISTS ix_{table}_{column} ON {table}({column})")
+
+
+def sync_feature_columns(conn) -> list:
+    """Add feature columns the current pipeline emits but 'features' lacks. Returns them."""
+    return _add_missing_columns(conn, "features", feature_columns())
+
+
+# === Migrations ===
+
+def _v1_tables(conn):
+    """All tables, keyed on timestamp / date."""
+    conn.execute(BARS_DDL)
+    conn.execute(features_ddl())
+    conn.execute(NEW_PREDICTIONS_DDL)
+    conn.execute(LIVE_TRADE_DETAILS_DDL)
+    conn.execute(DAILY_TRADE_STATE_DDL)
+
+    # Databases created before this schema: bring columns and keys up to date
+    for table, ddl in (
+        ("bars", BARS_DDL),
+        ("new_predictions", NEW_PREDICTIONS_DDL),
+        ("live_trade_details", LIVE_TRADE_DETAILS_DDL),
+        ("daily_trade_state", DAILY_TRADE_STATE_DDL),
+    ):
+        _add_missing_columns(conn, table, _declared_columns(ddl))
+    for table, key in (
+        ("bars", "timestamp"),
+        ("features", "timestamp"),
+        ("new_predictions", "timestamp"),
+        ("daily_trade_state", "date"),
+    ):
+        _ensure_unique(conn, table, key)
+
+
+def _v2_live_indexes(conn):
+    """Indexes for the per-minute lookups."""
+    # Open positions: COUNT(*) / SELECT * ... WHERE status = 'OPEN'
+    conn.execute("""
+        CREATE INDEX IF NOT EXISTS ix_live_trade_details_open
+            ON live_trade_details(trade_number)
+         WHERE status = 'OPEN'
+    """)
+    # Exit updates by trade number, most recent first
+    conn.execute("""
+        CREATE INDEX IF NOT EXISTS ix_live_trade_details_trade_number
+            ON live_trade_details(trade_number, entry_time)
+    """)
+    # Day ranges over entries (exports, daily stats)
+    conn.execute("""
+        CREATE INDEX IF NOT EXISTS ix_live_trade_details_entry_time
+            ON live_trade_details(entry_time)
+    """)
+
+
+def _v3_unsmoothed_predictions(conn):
+    """Predictions still waiting for smoothing (smooth_prediction finds them by seek)."""
+    conn.execute("""
+        CREATE INDEX IF NOT EXISTS ix_new_predictions_unsmoothed
+            ON new_predictions(timestamp)
+         WHERE entry_smoothed_long_conf IS NULL
+    """)
+
+
+def _v4_live_trade_ids(conn):
+    """
+    Row id key for live_trade_details created before it had one (ADD
+    COLUMN cannot add a primary key): create, copy, drop, rename.
+    """
+    existing = table_columns(conn, "live_trade_details")
+    if "id" in existing:
+        return
+    log.info("Rebuilding live_trade_details with an id primary key")
+    conn.execute(LIVE_TRADE_DETAILS_DDL.replace("live_trade_details", "live_trade_details_new"))
+    columns = [c for c in LIVE_TRADE_COLUMNS if c in existing]
+    # Columns that are NOT NULL in the new table
+    source = {"trade_number": "COALESCE(trade_number, 0)", "status": "COALESCE(status, 'CLOSED')"}
+    conn.execute(
+        f"INSERT INTO live_trade_details_new ({', '.join(columns)}) "
+        f"SELECT {', '.join(source.get(c, c) for c in columns)} FROM live_trade_details ORDER BY rowid"
+    )
+    conn.execute("DROP TABLE live_trade_details")
+    conn.execute("ALTER TABLE live_trade_details_new RENAME TO live_trade_details")
+    # The dropped table took its indexes with it
+    _v2_live_indexes(conn)
+
+
+# (version, description, step) — append only; never edit an applied step
+MIGRATIONS = (
+    (1, "tables with primary keys", _v1_tables),
+    (2, "live query indexes", _v2_live_indexes),
+    (3, "unsmoothed predictions index", _v3_unsmoothed_predictions),
+    (4, "live_trade_details row id key", _v4_live_trade_ids),
+)
+
+SCHEMA_VERSION = MIGRATIONS[-1][0]
+
+
+def schema_version(conn) -> int:
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def migrate(conn) -> int:
+    """
+    Bring the database to SCHEMA_VERSION and sync the feature columns.
+    Returns the number of migration steps applied.
+    """
+    current = schema_version(conn)
+    applied = 0
+    for version, description, step in MIGRATIONS:
+        if version <= current:
+            continue
+        log.info("Applying schema migration %d: %s", version, description)
+        try:
+            conn.execute("BEGIN")
+            step(conn)
+            conn.execute(f"PRAGMA user_version = {version}")
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        applied += 1
+
+    added = sync_feature_columns(conn)
+    conn.commit()
+    if added:
+        log.info("Added feature columns: %s", ", ".join(added))
+
+    if applied or added:
+        # Fresh statistics so the planner picks the new indexes
+        conn.execute("ANALYZE")
+        conn.commit()
+    return applied
@@ -0,0 +1,277 @@
+# db_writer.py
+"""
+Single background writer for the live loop's SQLite persistence.
+
+    future = submit(bulk_insert, "bars", df)   # returns immediately
+    ...
+    flush()                                    # everything submitted so far is committed
+
+Jobs are plain write functions (bulk_insert, TradeBook / ledger writes,
+...) that use `get_conn()` and `db.transaction()` as usual. The writer
+thread takes every job waiting in its bounded queue (up to
+DB_WRITER_BATCH_JOBS), runs each inside its own savepoint and commits the
+batch once: one fsync for the whole group, and a failing job is rolled
+back alone. Futures resolve after the commit.
+
+Read-your-writes: while the writer runs, `db.get_read_conn()` first
+waits until this process's queued writes are committed, so readers never
+see older data than the process has written. When the queue is full,
+submit() blocks (backpressure); the waits, queue high-water mark and
+commit timings are in `stats()` and the stage metrics
+(db_writer.commit / db_writer.backpressure).
+
+With DB_ASYNC_WRITES off, submit() runs the job inline and returns a
+finished future (errors are raised, as before).
+"""
+
+import atexit
+import logging
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+import db
+from db import get_conn
+from trade_config import TradeConfig
+from stage_metrics import get_stage_metrics, measure
+
+log = logging.getLogger(__name__)
+
+_STOP = object()
+
+
+class _Job:
+    __slots__ = ("seq", "fn", "args", "kwargs", "future")
+
+    def __init__(self, seq, fn, args, kwargs):
+        self.seq = seq
+        self.fn = fn
+        self.args = args
+        self.kwargs = kwargs
+        self.future = Future()
+
+
+class AsyncWriter:
+    """Background thread that group-commits queued write jobs (see module docstring)."""
+
+    def __init__(
+        self,
+        max_queue: int = TradeConfig.DB_WRITER_QUEUE,
+        batch_jobs: int = TradeConfig.DB_WRITER_BATCH_JOBS
+    ):
+        self.batch_jobs = batch_jobs
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._cond = threading.Condition()
+        self._submit_lock = threading.Lock()
+        self._submitted = 0    # seq of the last job queued
+        self._done = 0         # seq of the last job committed (or failed)
+        self._stats = {
+            "committed": 0, "failed": 0, "batches": 0,
+            "blocked": 0, "blocked_sec": 0.0, "high_water": 0,
+        }
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name="db-writer", daemon=True)
+        self._thread.start()
+        db.set_read_barrier(self._read_barrier)
+
+    # ---------- producer side ----------
+
+    def submit(self, fn, *args, **kwargs) -> Future:
+        """Queue fn(*args, **kwargs) for the writer thread; blocks only while the queue is full."""
+        if self._closed:
+            raise RuntimeError("AsyncWriter is closed")
+        # One submitter at a time, so queue order follows seq
+        with self._submit_lock:
+            job = _Job(self._submitted + 1, fn, args, kwargs)
+            try:
+                self._queue.put_nowait(job)
+            except queue.Full:
+                t0 = time.perf_counter()
+                self._queue.put(job)
+                waited = time.perf_counter() - t0
+                get_stage_metrics().record("db_writer.backpressure", waited)
+                with self._cond:
+                    self._stats["blocked"] += 1
+                    self._stats["blocked_sec"] += waited
+            with self._cond:
+                self._submitted = job.seq
+                self._stats["high_water"] = max(self._stats["high_water"], self._queue.qsize())
+        return job.future
+
+    def flush(self, timeout: float | None = None) -> bool:
+        """Wait until every job submitted so far is committed. False on timeout."""
+        if threading.current_thread() is self._thread:
+            return True
+        with self._cond:
+            target = self._submitted
+            return self._cond.wait_for(lambda: self._done >= target, timeout)
+
+    def pending(self) -> int:
+        with self._cond:
+            return self._submitted - self._done
+
+    def stats(self) -> dict:
+        with self._cond:
+            return dict(self._stats, queued=self._queue.qsize(), pending=self._submitted - self._done)
+
+    def close(self) -> None:
+        """Commit everything still queued and stop the thread."""
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put(_STOP)
+        self._thread.join()
+        db.set_read_barrier(None)
+        log.info("DB writer closed: %s", self.stats())
+
+    def _read_barrier(self):
+        if self.pending() and threading.current_thread() is not self._thread:
+            self.flush()
+
+    # ---------- writer thread ----------
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            while len(batch) < self.batch_jobs:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            jobs = [item for item in batch if item is not _STOP]
+            if jobs:
+                self._commit(jobs)
+            if len(jobs) < len(batch):
+                return
+
+    def _commit(self, jobs):
+        outcomes = []
+        with measure("db_writer.commit", rows=len(jobs)):
+            try:
+                with get_conn() as conn:
+                    conn.execute("BEGIN")
+                    for job in jobs:
+                        outcomes.append(self._run_job(conn, job))
+                    conn.commit()
+            except Exception as e:
+                # The group could not be committed: every job in it failed
+                log.error("DB writer commit of %d jobs failed: %s", len(jobs), e)
+                outcomes = [(None, e)] * len(jobs)
+
+        failed = 0
+        for job, (result, error) in zip(jobs, outcomes):
+            if error is None:
+                job.future.set_result(result)
+            else:
+                failed += 1
+                job.future.set_exception(error)
+        with self._cond:
+            self._done = jobs[-1].seq
+            self._stats["committed"] += len(jobs) - failed
+            self._stats["failed"] += failed
+            self._stats["batches"] += 1
+            self._cond.notify_all()
+
+    @staticmethod
+    def _run_job(conn, job):
+        conn.execute("SAVEPOINT job")
+        try:
+            result = job.fn(*job.args, **job.kwargs)
+        except Exception as e:
+            conn.execute("ROLLBACK TO job")
+            conn.execute("RELEASE job")
+            log.error("DB write %s failed: %s", getattr(job.fn, "__qualname__", job.fn), e)
+            return None, e
+        conn.execute("RELEASE job")
+        return result, None
+
+
+# Process-wide writer (a forked child starts its own)
+_writer = None
+_writer_pid = None
+_writer_lock = threading.Lock()
+
+
+def get_db_writer() -> AsyncWriter | None:
+    """The process-wide writer, started on first use; None with DB_ASYNC_WRITES off."""
+    global _writer, _writer_pid
+    if not TradeConfig.DB_ASYNC_WRITES:
+        return None
+    with _writer_lock:
+        if _writer is None or _writer_pid != os.getpid():
+            _writer = AsyncWriter()
+            _writer_pid = os.getpid()
+        return _writer
+
+
+def submit(fn, *args, **kwargs) -> Future:
+    """Run a write job on the async writer, or inline with DB_ASYNC_WRITES off."""
+    writer = get_db_writer()
+    if writer is not None:
+        return writer.submit(fn, *args, **kwargs)
+    future = Future()
+    future.set_result(fn(*args, **kwargs))
+    return future
+
+
+def flush(timeout: float | None = None) -> bool:
+    """Commit everything submitted so far (no-op without a running writer)."""
+    if _writer is None or _writer_pid != os.getpid():
+        return True
+    return _writer.flush(timeout)
+
+
+def log_bulk_result(future: Future, table: str, logger: logging.Logger = log) -> None:
+    """Log a submitted bulk_insert's counts once it has been committed."""
+    def _done(f):
+        if f.exception() is not None:
+            logger.error("Insert into '%s' failed: %s", table, f.exception())
+            return
+        result = f.result()
+        logger.info(
+            "Inserted %d new rows into SQLite '%s' table (%d ignored, %d rejected)",
+            result.inserted, table, result.ignored, len(result.failed)
+        )
+    future.add_done_callback(_done)
+
+
+class FailedWrites:
+    """
+    Earliest key (e.g. first timestamp) of submitted writes that failed.
+    Stages whose in-memory state has moved past rows they queued watch()
+    each future and take() the mark at the start of the next cycle, then
+    resume from the database before it.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._from = None
+
+    def watch(self, future: Future, first_key) -> None:
+        def _done(f):
+            if f.exception() is None:
+                return
+            with self._lock:
+                if self._from is None or first_key < self._from:
+                    self._from = first_key
+        future.add_done_callback(_done)
+
+    def take(self):
+        """The earliest failed key since the last call (None if none failed)."""
+        with self._lock:
+            first, self._from = self._from, None
+            return first
+
+
+def close_db_writer() -> None:
+    global _writer
+    with _writer_lock:
+        if _writer is not None and _writer_pid == os.getpid():
+            _writer.close()
+        _writer = None
+
+
+# Registered after db's close_connections, so it runs first at exit
+atexit.register(close_db_writer)
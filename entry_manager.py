@@ -2,13 +2,12 @@
 
 from datetime import datetime, timedelta
 from state_manager import (
-    get_live_trades, update_live_trades,
+    get_trade_book,
     get_daily_trade_count, increment_trade_count
 )
 from trade_config import TradeConfig
 from broker_utils import entry_order
 from db import load_latest_prediction_row
-from state_manager import get_live_trades
 
 import logging
 logger = logging.getLogger("entry")
@@ -35,8 +34,8 @@ def build_trade_object(row, direction: str) -> dict:
         "direction": direction,
         "entry_price": row["close"],
         "entry_conf": row["entry_smoothed_long_conf"] if direction == "LONG" else row["entry_smoothed_short_conf"],
-        "symbol": TradeConfig.SYMBOL,
-        "qty": TradeConfig.DEFAULT_QTY,
+        "symbol": TradeConfig.TD_SYMBOL,
+        "qty": TradeConfig.ORDER_QUANTITY,
         "status": "OPEN",
         "exit_time": None,
         "exit_price": None,
@@ -56,10 +55,9 @@ def entry_manager():
         if not signal:
             return
 
-        live_trades = get_live_trades()
-        active_trades = [t for t in live_trades if t["status"] == "OPEN"]
-
-        if len(active_trades) >= TradeConfig.MAX_CONCURRENT_TRADES:
+        # Open trades come from the in-memory trade book
+        book = get_trade_book()
+        if book.open_count() >= TradeConfig.MAX_CONCURRENT_TRADES:
             logger.info(f"🚫 Max concurrent trades reached.")
             return
 
@@ -70,14 +68,13 @@ def entry_manager():
 
         # Place broker order
         entry_price = row["close"]
-        success, order_id = entry_order(direction=signal, price=entry_price, qty=TradeConfig.DEFAULT_QTY)
+        success, order_id = entry_order(direction=signal, price=entry_price, qty=TradeConfig.ORDER_QUANTITY)
 
         if success:
             trade = build_trade_object(row, signal)
             trade["order_id"] = order_id
-            live_trades.append(trade)
-            update_live_trades(live_trades)
-            increment_trade_count()
+            trade["trade_number"] = increment_trade_count()   # the book's row needs the number
+            book.add(trade)   # one INSERT
             logger.info(f"✅ TRADE ENTRY [{signal}] at {entry_price} | conf={trade['entry_conf']:.3f}")
         else:
             logger.warning(f"❌ Order rejected for {signal} at {entry_price}")
@@ -9,7 +9,7 @@ relative to the script's directory:
 import os
 import pandas as pd
 from pathlib import Path
-from db import get_conn, init_db
+from db import get_read_conn, init_db
 
 # Ensure DB schema exists
 init_db()
@@ -23,7 +23,7 @@ STATE_DIR.mkdir(exist_ok=True)
 def export_live_trades(output_dir: Path = STATE_DIR):
     """Exports the live_trade_details table to a CSV file in the given directory."""
     output_path = output_dir / "live_trade_details.csv"
-    with get_conn() as conn:
+    with get_read_conn() as conn:
         df = pd.read_sql("SELECT * FROM live_trade_details", conn)
     df.to_csv(output_path, index=False)
     print(f"✅ Exported live_trade_details to {output_path}")
@@ -32,7 +32,7 @@ def export_live_trades(output_dir: Path = STATE_DIR):
 def export_daily_state(output_dir: Path = STATE_DIR):
     """Exports the daily_trade_state table to a CSV file in the given directory."""
     output_path = output_dir / "daily_trade_state.csv"
-    with get_conn() as conn:
+    with get_read_conn() as conn:
         df = pd.read_sql("SELECT * FROM daily_trade_state", conn)
     df.to_csv(output_path, index=False)
     print(f"✅ Exported daily_trade_state to {output_path}")
@@ -7,14 +7,14 @@ in TradeConfig so you overwrite your existing CSVs.
 
 import pandas as pd
 from pathlib import Path
-from db import get_conn
+from db import get_read_conn
 from trade_config import TradeConfig
 
 def export_table(table_name: str, output_path: Path):
     """
     Read the entire table from SQLite and write it to CSV.
     """
-    with get_conn() as conn:
+    with get_read_conn() as conn:
         df = pd.read_sql(f"SELECT * FROM {table_name} ORDER BY timestamp", conn)
     output_path.parent.mkdir(parents=True, exist_ok=True)
     df.to_csv(output_path, index=False)
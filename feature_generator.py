@@ -7,9 +7,14 @@ end up only in your terminal logs (not as raw prints).
 """
 
 import logging
+import numpy as np
 import pandas as pd
 from trade_config import TradeConfig
-from db import init_db, get_conn
+from db import init_db, get_conn, get_read_conn, bulk_insert
+from db_writer import submit, log_bulk_result, FailedWrites
+from db_schema import sync_feature_columns
+from feature_store import get_feature_store
+from stage_metrics import measure
 
 # Console logger for user-visible messages
 console = logging.getLogger("console")
@@ -17,180 +22,130 @@ console = logging.getLogger("console")
 log = logging.getLogger(__name__)
 
 # Feature-engineering imports
-from training_features.price_action       import add_price_action_features
-from training_features.volume_features    import add_volume_features
-from training_features.volume_signals     import add_volume_features as add_volume_signals
-from training_features.open_interest      import add_oi_features as add_open_interest_features
-from training_features.structure_features import add_structure_features
-from training_features.vwap_utils         import calculate_vwap as add_vwap_features
-from training_features.hvn_engine         import compute_rolling_hvn as add_hvn_features
-from training_features.time_features      import add_time_features
-from training_features.momentum_features  import add_momentum_features
-from training_features.trend_detector     import add_trend_regime as add_trend_label
-from training_features.meta_features      import add_meta_quality_flags
-from training_features.features_engineered import add_feature_engineering
-
-
-def _compute_ema_filter_15(df_bars: pd.DataFrame) -> pd.Series:
-    """
-    Given raw 1-min bars with a 'timestamp' column, compute a 1-min
-    EMA20/EMA50 regime flag and return a series of 1s and 0s aligned to each bar.
+from training_features.feature_registry  import plan_stages, run_stages
+from training_features.streaming_engine  import StreamingFeatureEngine
+from training_features.feature_schema    import apply_feature_dtypes
+from predictor import MODEL_PATH, load_model, get_feature_order
 
-    This version prepends the last 50 bars from the 'bars' table for warm-up
-    so that the EMA has the correct memory when running incrementally.
-    """
-    # Prepare datetime index
-    df_temp = df_bars.copy()
-    df_temp['datetime'] = pd.to_datetime(df_temp['timestamp'], errors='coerce')
-    df_temp.set_index('datetime', inplace=True)
+# Streaming feature state, kept across live cycles (built on first cycle)
+_engine = None
+# Model columns the engine's stages were planned for, and the model pickle's mtime then
+_engine_columns = None
+_engine_model_mtime = None
+# 'features' inserts that failed in the db_writer (the engine is already past them)
+_failed_inserts = FailedWrites()
 
-    # Extract close series
-    close = df_temp['close']
 
-    # Warm-up: pull prior 50 bars for EMA memory
-    first_ts = df_temp.index[0]
-    warmup_start_str = first_ts.strftime("%Y-%m-%d %H:%M:%S")
-    with get_conn() as conn:
-        warmup_df = pd.read_sql(
-            """
-            SELECT timestamp, close
-            FROM bars
-            WHERE timestamp < ?
-            ORDER BY timestamp DESC
-            LIMIT 50
-            """,
-            conn,
-            params=(warmup_start_str,)
-        )
-
-    if not warmup_df.empty:
-        # Reverse to ascending order
-        warmup_df = warmup_df.iloc[::-1].reset_index(drop=True)
-        # Prepare combined close series
-        warmup_closes = warmup_df['close']
-        combined = pd.concat([
-            warmup_closes,
-            close.reset_index(drop=True)
-        ], ignore_index=True)
-        # Compute EMAs on combined history
-        ema20 = combined.ewm(span=20, adjust=False).mean()
-        ema50 = combined.ewm(span=50, adjust=False).mean()
-        regime_all = (ema20 > ema50).astype(int)
-        # Slice off warm-up portion
-        regime_today = regime_all.iloc[len(warmup_closes):].reset_index(drop=True)
-        # Return with original index alignment
-        return pd.Series(regime_today.values, index=df_bars.index, dtype=int)
-
-    # Fallback: full-day EWM if no warm-up data
-    ema20 = close.ewm(span=20, adjust=False).mean()
-    ema50 = close.ewm(span=50, adjust=False).mean()
-    regime = (ema20 > ema50).astype(int)
-    ts = pd.to_datetime(df_bars['timestamp'], errors='coerce')
-    return ts.map(regime).fillna(0).astype(int)
-
-
-def build_features(df: pd.DataFrame) -> pd.DataFrame:
+def build_features(df: pd.DataFrame, columns=None) -> pd.DataFrame:
     """
     Apply the full historical feature pipeline to the incoming bars.
     Expects df to include 'timestamp','open','high','low','close','volume','open_interest',
     plus an 'ema_filter_15' boolean. Returns a DataFrame of engineered features.
+
+    If `columns` is given, only the stages needed to produce them (and
+    their inputs) are run; see training_features.feature_registry.
+
+    Stages run over a column store (dict of numpy arrays) and the output
+    frame is assembled once at the end, with the compact dtypes of
+    training_features.feature_schema; `df` itself is not modified.
     """
+    # Ensure datetime column for sorting
+    dt = pd.to_datetime(df['timestamp'], errors='coerce').to_numpy()
+    order = np.argsort(dt, kind='stable')
+
+    store = {name: df[name].to_numpy()[order] for name in df.columns}
+
     # Align OI columns
-    if 'oi' in df.columns and 'open_interest' not in df.columns:
-        df['open_interest'] = df['oi']
-    elif 'open_interest' in df.columns and 'oi' not in df.columns:
-        df['oi'] = df['open_interest']
+    if 'oi' in store and 'open_interest' not in store:
+        store['open_interest'] = store['oi']
+    elif 'open_interest' in store and 'oi' not in store:
+        store['oi'] = store['open_interest']
+    store['datetime'] = dt[order]
 
-    # Ensure datetime column for sorting
-    df['datetime'] = pd.to_datetime(df['timestamp'], errors='coerce')
-    df.sort_values('datetime', inplace=True)
-    df.reset_index(drop=True, inplace=True)
-
-    # ATR(14)
-    df['prev_close'] = df['close'].shift(1)
-    df['tr1']        = df['high'] - df['low']
-    df['tr2']        = (df['high'] - df['prev_close']).abs()
-    df['tr3']        = (df['low']  - df['prev_close']).abs()
-    df['true_range'] = df[['tr1','tr2','tr3']].max(axis=1)
-    df['atr']        = df['true_range'].rolling(window=14, min_periods=1).mean()
-    df.drop(columns=['prev_close','tr1','tr2','tr3','true_range'], inplace=True)
-
-    # Core pipeline
-    df = add_price_action_features(df)
-    df = add_volume_features(df)
-    df = add_volume_signals(df)
-    df = add_open_interest_features(df)
-    df = add_structure_features(df)
-    df = add_vwap_features(df)
-    df = add_hvn_features(df)
-    df = add_time_features(df)
-    df = add_momentum_features(df)
-    df = add_trend_label(df)
-    df = add_meta_quality_flags(df)
-
-    # Final flags & scores
-    df = add_feature_engineering(df, str(TradeConfig.FEATURES_CSV))
-
-    return df
-
-
-def feature_generator_cycle() -> int:
+    # ATR, core pipeline, final flags & scores (persisted separately by the feature store)
+    run_stages(store, plan_stages(columns))
+
+    return apply_feature_dtypes(pd.DataFrame(store))
+
+
+def model_feature_columns() -> list[str] | None:
     """
-    1) Ensure DB & tables exist
-    2) Read only new bars since last FEATURES timestamp
-    3) Compute ema_filter_15, build features
-    4) Convert datetime columns to strings
-    5) INSERT OR IGNORE into 'features' table
-    Returns number of rows inserted.
+    Output columns the live model consumes (plus the entry EMA filter),
+    or None to compute every feature when pruning is off or no model is found.
     """
-    init_db()
+    if not TradeConfig.FEATURE_PRUNING or not MODEL_PATH.exists():
+        return None
+    try:
+        feature_order = get_feature_order(load_model(MODEL_PATH))
+    except Exception as e:
+        log.warning("Could not read model feature order, computing all features: %s", e)
+        return None
+    return list(feature_order) + [TradeConfig.EMA_FILTER_COLUMN]
 
-    # Ensure 'ema_filter_15' column exists in features table
-    with get_conn() as conn:
-        cur = conn.cursor()
-        cur.execute("PRAGMA table_info(features)")
-        columns = [row[1] for row in cur.fetchall()]
-        if 'ema_filter_15' not in columns:
-            cur.execute("ALTER TABLE features ADD COLUMN ema_filter_15 INTEGER DEFAULT 0;")
-            conn.commit()
-            console.info("✅ Added missing 'ema_filter_15' column to features table")
-
-    # 1) Fetch last feature timestamp
-    with get_conn() as conn:
-        cur = conn.cursor()
-        cur.execute("SELECT MAX(timestamp) FROM features")
-        row = cur.fetchone()
-        last_ts = row[0] if row and row[0] is not None else None
-
-        # 2) Load new bars
-        if last_ts:
-            df_bars = pd.read_sql(
-                "SELECT * FROM bars WHERE timestamp > ? ORDER BY timestamp",
+
+def _load_engine(last_ts) -> StreamingFeatureEngine:
+    """
+    Build the streaming engine once per process, warmed up on the last
+    FEATURE_WARMUP_BARS bars at or before `last_ts` so every rolling window
+    (incl. the 1500-bar HVN profile and today's VWAP) is already full.
+    """
+    global _engine_columns, _engine_model_mtime
+    _engine_model_mtime = _model_mtime()
+    columns = _engine_columns = model_feature_columns()
+    stages = [stage.name for stage in plan_stages(columns)]
+    log.info("Feature stages scheduled: %s", ", ".join(stages))
+    engine = StreamingFeatureEngine(stages=stages)
+    if last_ts:
+        with get_read_conn() as conn:
+            warmup_df = pd.read_sql(
+                """
+                SELECT * FROM (
+                    SELECT * FROM bars
+                     WHERE timestamp <= ?
+                     ORDER BY timestamp DESC
+                     LIMIT ?
+                ) ORDER BY timestamp
+                """,
                 conn,
-                params=(last_ts,)
-            )
-        else:
-            df_bars = pd.read_sql(
-                "SELECT * FROM bars ORDER BY timestamp",
-                conn
+                params=(last_ts, TradeConfig.FEATURE_WARMUP_BARS)
             )
+        engine.warm_up(warmup_df)
+        log.info("Feature engine warmed up on %d bars", len(warmup_df))
+    return engine
 
-    if df_bars.empty:
-        log.info("No new bars to feature.")
-        return 0
 
-    # 3) Compute EMA regime filter
-    ema_flag_series = _compute_ema_filter_15(df_bars)
-    df_bars['ema_filter_15'] = ema_flag_series
+def _model_mtime() -> float | None:
+    return MODEL_PATH.stat().st_mtime if MODEL_PATH.exists() else None
 
-    # 4) Build all other features
-    df_feat = build_features(df_bars)
 
-    # 5) Ensure ema_filter_15 carried into final df
-    if 'ema_filter_15' not in df_feat.columns:
-        df_feat['ema_filter_15'] = ema_flag_series.values
+def _model_columns_changed() -> bool:
+    """True once the model pickle changed and now needs different feature columns."""
+    global _engine_model_mtime
+    mtime = _model_mtime()
+    if mtime == _engine_model_mtime:
+        return False
+    _engine_model_mtime = mtime
+    return model_feature_columns() != _engine_columns
 
-    # 6) Convert timestamps to plain strings
+
+def ensure_feature_columns() -> None:
+    """Add feature columns the pipeline emits but the features table lacks (older databases)."""
+    with get_conn() as conn:
+        added = sync_feature_columns(conn)
+        conn.commit()
+    for col in added:
+        console.info(f"✅ Added missing '{col}' column to features table")
+
+
+def insert_feature_rows(df_feat: pd.DataFrame, wait: bool = False) -> int:
+    """
+    Convert datetime-like columns to "YYYY-MM-DD HH:MM:SS" strings (in place)
+    and INSERT OR IGNORE the rows into the 'features' table in one
+    transaction (db.bulk_insert via db_writer; large backfills go through a
+    staging table). Returns the number of rows queued; with `wait`, blocks
+    until the insert is committed and returns the rows inserted (raises if
+    it failed).
+    """
     df_feat['timestamp'] = (
         pd.to_datetime(df_feat['timestamp'], errors='coerce')
           .dt.strftime("%Y-%m-%d %H:%M:%S")
@@ -202,29 +157,104 @@ def feature_generator_cycle() -> int:
     if 'date' in df_feat.columns:
         df_feat['date'] = df_feat['date'].astype(str)
 
-    # 7) Insert into SQLite
-    cols = df_feat.columns.tolist()
-    placeholders = ",".join("?" for _ in cols)
-    sql = f"INSERT OR IGNORE INTO features ({','.join(cols)}) VALUES ({placeholders})"
+    future = submit(bulk_insert, "features", df_feat)
+    log_bulk_result(future, "features", log)
+    if wait:
+        return future.result().inserted
+    # Committed by the db_writer thread; a failure makes generate_features resync
+    _failed_inserts.watch(future, df_feat['timestamp'].min())
+    return len(df_feat)
 
-    inserted = 0
-    with get_conn() as conn:
-        cur = conn.cursor()
-        for row in df_feat.itertuples(index=False, name=None):
-            try:
-                cur.execute(sql, row)
-                inserted += cur.rowcount
-            except Exception as e:
-                log.error("Feature insert failed: %s", e)
-        conn.commit()
+
+def generate_features(bars: pd.DataFrame | None = None) -> pd.DataFrame:
+    """
+    1) Ensure DB & tables exist
+    2) On first cycle, warm the streaming engine up to the last FEATURES timestamp
+       (after a failed insert: the last one stored before the failed rows)
+    3) New bars: `bars` as handed over by data_fetch (in-memory hot path),
+       else (and after a rebuild) read from 'bars'; only those newer than
+       the engine's last bar
+    4) Push each bar through the engine (one feature row per bar, incl. ema_filter_15)
+    5) Queue rows for the feature store, convert datetime columns to strings
+    6) INSERT OR IGNORE into 'features' table (queued for the db_writer thread)
+    Returns the new feature rows (empty if none).
+    """
+    global _engine
+    init_db()    # also adds feature columns missing from older databases
+
+    # 1) Resume point: engine state, or last FEATURES timestamp on startup
+    failed_from = _failed_inserts.take()
+    if failed_from is not None:
+        log.warning("Feature rows from %s were not stored; rebuilding the engine before them", failed_from)
+        _engine = None
+    if _engine is None:
+        with get_read_conn() as conn:
+            cur = conn.cursor()
+            if failed_from is not None:
+                cur.execute("SELECT MAX(timestamp) FROM features WHERE timestamp < ?", (failed_from,))
+            else:
+                cur.execute("SELECT MAX(timestamp) FROM features")
+            row = cur.fetchone()
+            last_ts = row[0] if row and row[0] is not None else None
+        _engine = _load_engine(last_ts)
+        bars = None   # catch up on every bar after last_ts
+    elif _engine.last_timestamp is not None:
+        last_ts = _engine.last_timestamp.strftime("%Y-%m-%d %H:%M:%S")
+    else:
+        last_ts = None
+
+    # A reloaded model may use columns the pruned stage plan does not compute
+    if _model_columns_changed():
+        log.info("Model feature columns changed; re-planning the feature engine")
+        _engine = _load_engine(last_ts)
+
+    # 2) Load new bars
+    if bars is not None:
+        df_bars = bars[bars['timestamp'] > last_ts] if last_ts and len(bars) else bars
+    else:
+        with measure("features.load_bars") as sample, get_read_conn() as conn:
+            if last_ts:
+                df_bars = pd.read_sql(
+                    "SELECT * FROM bars WHERE timestamp > ? ORDER BY timestamp",
+                    conn,
+                    params=(last_ts,)
+                )
+            else:
+                df_bars = pd.read_sql(
+                    "SELECT * FROM bars ORDER BY timestamp",
+                    conn
+                )
+            sample.rows = len(df_bars)
+
+    if df_bars.empty:
+        log.info("No new bars to feature.")
+        return df_bars.iloc[0:0]
+
+    # 3) One feature row per new bar from the streaming state
+    with measure("features.engine", len(df_bars)) as sample:
+        df_feat = _engine.update_frame(df_bars)
+        sample.nbytes = int(df_feat.memory_usage(deep=False).sum())
+
+    # Queue the rows for the Parquet feature store (written off the trading path)
+    with measure("features.store_append", len(df_feat)):
+        get_feature_store().append(df_feat)
+
+    # 4) Convert timestamps to plain strings, INSERT OR IGNORE into SQLite
+    with measure("features.sqlite_insert", len(df_feat)):
+        stored = insert_feature_rows(df_feat)
 
     log.info(
-        "Inserted %d new feature rows into SQLite 'features' table",
-        inserted
+        "Stored %d new feature rows into SQLite 'features' table",
+        stored
     )
 
-    console.info(f"✅ Inserted {inserted} feature rows")
-    return inserted
+    console.info(f"✅ Inserted {stored} feature rows")
+    return df_feat
+
+
+def feature_generator_cycle(bars: pd.DataFrame | None = None) -> int:
+    """Feature the new bars (see generate_features). Returns number of feature rows."""
+    return len(generate_features(bars))
 
 
 if __name__ == "__main__":
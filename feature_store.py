@@ -0,0 +1,181 @@
+# feature_store.py
+"""
+Append-only, date-partitioned Parquet store for engineered feature rows.
+
+The live loop hands new rows to `FeatureStore.append()`, which only queues
+them; a background thread batches the rows and writes one Parquet part file
+per flush under FEATURE_STORE_DIR/<YYYY-MM-DD>/. Offline tools read the full
+history back with `read_feature_history()`, and `compact_day()` merges a
+day's part files once the session is over.
+"""
+
+import logging
+import queue
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+
+import pandas as pd
+from trade_config import TradeConfig
+from stage_metrics import measure
+
+log = logging.getLogger(__name__)
+
+_STOP = object()
+
+
+class FeatureStore:
+    """
+    Background, batched writer for feature rows.
+
+    append() is non-blocking; rows are written when BATCH_ROWS have queued
+    up, at most FLUSH_SEC seconds after the oldest unwritten row arrived,
+    or on flush()/close().
+    """
+
+    def __init__(
+        self,
+        root: Path = TradeConfig.FEATURE_STORE_DIR,
+        batch_rows: int = TradeConfig.FEATURE_STORE_BATCH_ROWS,
+        flush_sec: float = TradeConfig.FEATURE_STORE_FLUSH_SEC
+    ):
+        self.root = Path(root)
+        self.batch_rows = batch_rows
+        self.flush_sec = flush_sec
+        self._queue = queue.Queue()
+        self._seq = 0
+        self._disabled = False
+        self._thread = threading.Thread(target=self._run, name="feature-store", daemon=True)
+        self._thread.start()
+
+    # ---------- producer side ----------
+
+    def append(self, df: pd.DataFrame) -> None:
+        """Queue a frame of feature rows (snapshotted) for writing."""
+        if df is None or df.empty or self._disabled:
+            return
+        self._queue.put(df.copy())
+
+    def flush(self, timeout: float | None = None) -> None:
+        """Block until every row queued so far has been written."""
+        done = threading.Event()
+        self._queue.put(done)
+        done.wait(timeout)
+
+    def close(self) -> None:
+        """Write everything still queued and stop the writer thread."""
+        self._queue.put(_STOP)
+        self._thread.join()
+
+    # ---------- writer thread ----------
+
+    def _run(self):
+        pending = []
+        n_pending = 0
+        due = None   # monotonic time by which the pending rows must be written
+        while True:
+            # Block until the next item, or until the pending batch is due
+            timeout = None if due is None else max(0.0, due - time.monotonic())
+            try:
+                item = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                item = None
+
+            if isinstance(item, pd.DataFrame):
+                if not pending:
+                    due = time.monotonic() + self.flush_sec
+                pending.append(item)
+                n_pending += len(item)
+                if n_pending < self.batch_rows and time.monotonic() < due:
+                    continue
+
+            if pending:
+                self._write(pd.concat(pending, ignore_index=True))
+                pending, n_pending, due = [], 0, None
+
+            if isinstance(item, threading.Event):
+                item.set()
+            elif item is _STOP:
+                return
+
+    def _write(self, df: pd.DataFrame) -> None:
+        try:
+            ts = pd.to_datetime(df["timestamp"], errors="coerce")
+            for day, part in df.groupby(ts.dt.strftime("%Y-%m-%d"), sort=True):
+                day_dir = self.root / day
+                day_dir.mkdir(parents=True, exist_ok=True)
+                self._seq += 1
+                name = f"part-{datetime.now():%H%M%S}-{self._seq:06d}.parquet"
+                with measure("feature_store.write", len(part)):
+                    part.to_parquet(day_dir / name, index=False, compression=TradeConfig.PARQUET_COMPRESSION)
+            log.debug("Feature store wrote %d rows", len(df))
+        except ImportError as e:
+            # No Parquet engine (pyarrow/fastparquet) installed
+            self._disabled = True
+            log.error("Feature store disabled: %s", e)
+        except Exception as e:
+            log.error("Feature store write failed (%d rows dropped): %s", len(df), e)
+
+
+# ---------- readers / maintenance ----------
+
+def _day_dirs(root: Path, start: str | None, end: str | None) -> list[Path]:
+    days = sorted(p for p in Path(root).iterdir() if p.is_dir()) if Path(root).exists() else []
+    return [
+        p for p in days
+        if (start is None or p.name >= start) and (end is None or p.name <= end)
+    ]
+
+
+def read_feature_history(
+    start: str | None = None,
+    end: str | None = None,
+    columns: list[str] | None = None,
+    root: Path = TradeConfig.FEATURE_STORE_DIR
+) -> pd.DataFrame:
+    """
+    Read stored feature rows for dates in [start, end] ('YYYY-MM-DD',
+    inclusive), sorted by timestamp and de-duplicated on it.
+    """
+    frames = [
+        pd.read_parquet(f, columns=columns)
+        for day_dir in _day_dirs(root, start, end)
+        for f in sorted(day_dir.glob("*.parquet"))
+    ]
+    if not frames:
+        return pd.DataFrame(columns=columns)
+    df = pd.concat(frames, ignore_index=True)
+    if "timestamp" in df.columns:
+        df = (
+            df.drop_duplicates(subset="timestamp", keep="last")
+              .sort_values("timestamp")
+              .reset_index(drop=True)
+        )
+    return df
+
+
+def compact_day(day: str, root: Path = TradeConfig.FEATURE_STORE_DIR) -> int:
+    """Merge one day's part files into a single 'day.parquet'. Returns rows."""
+    day_dir = Path(root) / day
+    parts = sorted(day_dir.glob("part-*.parquet"))
+    if not parts:
+        return 0
+    df = read_feature_history(day, day, root=root)
+    tmp = day_dir / "day.parquet.tmp"
+    df.to_parquet(tmp, index=False, compression=TradeConfig.PARQUET_COMPRESSION)
+    for p in parts:
+        p.unlink()
+    tmp.replace(day_dir / "day.parquet")
+    return len(df)
+
+
+# Process-wide store used by the live loop
+_store = None
+
+
+def get_feature_store() -> FeatureStore:
+    global _store
+    if _store is None:
+        _store = FeatureStore()
+    return _store
@@ -6,18 +6,19 @@ Drives real-time data → feature → prediction pipeline,
 and triggers trade entries & exits every minute.
 """
 
-import time
 import logging
 from datetime import datetime, time as dt_time
 from trade_config import TradeConfig
 from db import init_db
-from data_fetch import data_fetch_cycle
-from feature_generator import feature_generator_cycle
-from predictor import predictor_cycle
-from smooth_prediction import smooth_prediction_cycle
+from db_writer import close_db_writer
+from state_manager import get_trade_book
 from entry_manager import entry_manager
 from exit_manager import exit_manager
 from telegram import send_telegram_message
+from feature_store import get_feature_store
+from stage_metrics import get_stage_metrics
+from scheduler import MinuteScheduler, Stage
+from live_pipeline import HotPath
 
 # ========== Logging Setup ==========
 date_str = datetime.now().strftime("%Y-%m-%d")
@@ -43,17 +44,30 @@ ENTRY_EXIT_START = dt_time(9, 16)  # Delay entries by 1 minute to avoid volatili
 
 # ========== Initialize ==========
 init_db()
+get_trade_book().load()   # open trades from the DB; entry/exit then work in memory
 logger.info("📡 Live bot initialized.")
 send_telegram_message("🚀 Live Bot Started")
 
+# ========== Pipeline ==========
+# data → features → predictions → smoothing handed over in memory (live_pipeline)
+PIPELINE = HotPath().stages()
+# Entries are dropped once a cycle is past its deadline; exits always run
+DECISIONS = [
+    Stage("entry", entry_manager, late_ok=False),
+    Stage("exit", exit_manager),
+]
+
 # ========== Run Loop ==========
+scheduler = MinuteScheduler()
 try:
     while True:
-        now = datetime.now()
+        # Wakes just after each exchange minute boundary (bar close)
+        boundary, missed = scheduler.wait()
+        now = datetime.fromtimestamp(boundary)
 
         if now.time() < MARKET_OPEN:
-            logger.info("⏳ Waiting for market to open...")
-            time.sleep(30)
+            if now.minute % 5 == 0:
+                logger.info("⏳ Waiting for market to open...")
             continue
 
         if now.time() >= MARKET_CLOSE:
@@ -62,22 +76,19 @@ try:
             break
 
         logger.info("⏱️ Running live trading cycle...")
+        stages = PIPELINE + DECISIONS if now.time() >= ENTRY_EXIT_START else PIPELINE
+        scheduler.run_cycle(boundary, stages, missed)
 
-        try:
-            data_fetch_cycle()
-            feature_generator_cycle()
-            predictor_cycle()
-            smooth_prediction_cycle()
-
-            if now.time() >= ENTRY_EXIT_START:
-                entry_manager()
-                exit_manager()
-
-        except Exception as e:
-            logger.exception("❌ Exception in live loop")
-
-        time.sleep(60)
+        # Rolling per-stage percentiles to the log + logs/stage_metrics.json
+        get_stage_metrics().end_cycle()
 
 except KeyboardInterrupt:
     logger.warning("🛑 Interrupted manually.")
     send_telegram_message("🛑 Live bot manually stopped.")
+
+finally:
+    # Commit every queued SQLite write, then the rows queued for the Parquet store
+    close_db_writer()
+    get_feature_store().close()
+    get_stage_metrics().log_summary()
+    get_stage_metrics().dump()
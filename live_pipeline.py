@@ -0,0 +1,68 @@
+# live_pipeline.py
+"""
+In-memory hot path between the live stages.
+
+Each cycle hands the new bars from data_fetch straight to the feature
+engine, its rows to the predictor and the predictions to the smoother,
+as DataFrames. The entry/exit managers read the newest signal from
+db.SignalCache and trades / counters from the state_manager book and
+ledger. SQLite is written as a side effect (db_writer), so a steady-state
+cycle does no database reads. Features are only computed from bars whose
+insert has been committed: the feature stage waits for it (no read), and
+a failed insert fails the cycle.
+
+The first cycle, and the one after any cycle that did not complete, run
+in catch-up mode: every stage reads its input from the database as it
+does standalone, so rows a failed cycle left behind are picked up.
+With LIVE_HOT_PATH off every cycle runs that way.
+"""
+
+import logging
+
+from trade_config import TradeConfig
+from data_fetch import fetch_new_bars, wait_for_bars
+from feature_generator import generate_features
+from predictor import predict
+from smooth_prediction import smooth_prediction_cycle
+from scheduler import Stage
+
+log = logging.getLogger(__name__)
+
+
+class HotPath:
+    def __init__(self, in_memory: bool = TradeConfig.LIVE_HOT_PATH):
+        self.in_memory = in_memory
+        self.bars = None
+        self.features = None
+        self.predictions = None
+        self._complete = False   # last cycle got through smoothing
+        self._from_db = True     # this cycle reads its inputs from the database
+
+    def stages(self) -> list:
+        return [
+            Stage("data_fetch", self.data_fetch),
+            Stage("features", self.generate_features),
+            Stage("predictor", self.predict),
+            Stage("smoothing", self.smooth),
+        ]
+
+    def data_fetch(self) -> None:
+        self._from_db = not (self.in_memory and self._complete)
+        if self._from_db and self.in_memory:
+            log.info("Hot path catching up from the database this cycle")
+        self._complete = False
+        self.features = self.predictions = None
+        self.bars = fetch_new_bars()
+
+    def generate_features(self) -> None:
+        if not self._from_db:
+            wait_for_bars()
+        self.features = generate_features(None if self._from_db else self.bars)
+
+    def predict(self) -> None:
+        self.predictions = predict(None if self._from_db else self.features)
+
+    def smooth(self) -> None:
+        smooth_prediction_cycle(None if self._from_db else self.predictions)
+        self.bars = self.features = self.predictions = None
+        self._complete = True
@@ -1,13 +1,13 @@
 import logging
 import pickle
-import sqlite3
 from pathlib import Path
 import warnings
 
 import pandas as pd
 import numpy as np
 from trade_config import TradeConfig
-from db import init_db, get_conn
+from db import init_db, get_conn, get_read_conn, bulk_insert
+from db_writer import submit, log_bulk_result, FailedWrites
 
 warnings.filterwarnings(
     "ignore",
@@ -17,6 +17,7 @@ warnings.filterwarnings(
 log = logging.getLogger(__name__)
 console = logging.getLogger("console")
 MODEL_PATH = Path(__file__).resolve().parent / TradeConfig.MODEL_PKL
+PREDICTION_COLUMNS = ("timestamp", "direction", "confidence", "long_conf", "short_conf")
 
 def load_model(path: Path):
     with open(path, "rb") as f:
@@ -36,13 +37,58 @@ def prepare_features_for_prediction(df: pd.DataFrame, feature_order: list[str])
             df2[col] = 0
     return df2[feature_order].fillna(0)
 
-def predictor_cycle() -> int:
+# Newest prediction timestamp (read once, then kept in memory) and the loaded model
+_last_ts = None
+_model = None
+_model_mtime = None
+# 'new_predictions' inserts that failed in the db_writer (_last_ts is already past them)
+_failed_inserts = FailedWrites()
+
+
+def _current_model():
+    """The model, loaded once and reloaded only when the pickle changes."""
+    global _model, _model_mtime
+    mtime = MODEL_PATH.stat().st_mtime
+    if _model is None or mtime != _model_mtime:
+        _model = load_model(MODEL_PATH)
+        _model_mtime = mtime
+        if TradeConfig.MODEL_RETRAIN_REQUIRED:
+            log.warning(
+                "⚠️ %s is flagged for retraining: it was trained on lookahead 15m/30m EMA "
+                "cross features that live rows no longer have (MODEL_RETRAIN_REQUIRED)",
+                MODEL_PATH.name
+            )
+    return _model
+
+
+def predict(features: pd.DataFrame | None = None) -> pd.DataFrame:
+    """
+    Predict on feature rows newer than the last prediction: `features` as
+    handed over by the feature stage (in-memory hot path), else read from
+    'features'. Rows are stored in 'new_predictions' via the db_writer
+    thread. Returns them (timestamp as "YYYY-MM-DD HH:MM:SS", direction,
+    confidence, long_conf, short_conf); empty if none.
+    """
+    global _last_ts
+    empty = pd.DataFrame(columns=PREDICTION_COLUMNS)
     init_db()
-    with get_conn() as conn:
-        cur = conn.cursor()
-        cur.execute("SELECT MAX(timestamp) FROM new_predictions")
-        row = cur.fetchone()
-        last_ts = row[0] if row and row[0] is not None else None
+    failed_from = _failed_inserts.take()
+    if failed_from is not None:
+        # Predict again from the last stored prediction before the failed rows
+        log.warning("Predictions from %s were not stored; predicting them again", failed_from)
+        with get_read_conn() as conn:
+            cur = conn.cursor()
+            cur.execute("SELECT MAX(timestamp) FROM new_predictions WHERE timestamp < ?", (failed_from,))
+            row = cur.fetchone()
+            _last_ts = row[0] if row and row[0] is not None else None
+        features = None
+    if _last_ts is None:
+        with get_read_conn() as conn:
+            cur = conn.cursor()
+            cur.execute("SELECT MAX(timestamp) FROM new_predictions")
+            row = cur.fetchone()
+            _last_ts = row[0] if row and row[0] is not None else None
+    last_ts = _last_ts
 
     if last_ts is None:
         with get_conn() as conn:
@@ -56,24 +102,29 @@ def predictor_cycle() -> int:
                     (seed, "LONG", 1.0, 1.0, 0.0)
                 )
                 conn.commit()
+                _last_ts = seed
                 log.info("Seeded new_predictions at %s", seed)
-        return 0
-
-    with get_conn() as conn:
-        df_feat = pd.read_sql(
-            "SELECT * FROM features WHERE timestamp > ? ORDER BY timestamp", conn,
-            params=(last_ts,), parse_dates=["timestamp"]
-        )
+        return empty
+
+    if features is not None:
+        ts = pd.to_datetime(features["timestamp"], errors="coerce") if len(features) else None
+        df_feat = features[ts > pd.to_datetime(last_ts)] if ts is not None else features
+    else:
+        with get_read_conn() as conn:
+            df_feat = pd.read_sql(
+                "SELECT * FROM features WHERE timestamp > ? ORDER BY timestamp", conn,
+                params=(last_ts,), parse_dates=["timestamp"]
+            )
 
     if df_feat.empty:
         log.info("No new feature rows to predict on.")
-        return 0
+        return empty
 
     if not MODEL_PATH.exists():
         log.error("Model file not found: %s", MODEL_PATH)
-        return 0
+        return empty
 
-    model = load_model(MODEL_PATH)
+    model = _current_model()
     feature_order = get_feature_order(model)
     X = prepare_features_for_prediction(df_feat, feature_order)
     proba = model.predict_proba(X)
@@ -84,35 +135,25 @@ def predictor_cycle() -> int:
     directions = ["LONG" if lc >= sc else "SHORT" for lc, sc in zip(long_conf, short_conf)]
     confidences = [max(lc, sc) for lc, sc in zip(long_conf, short_conf)]
 
-    insert_sql = (
-        "INSERT OR IGNORE INTO new_predictions "
-        "(timestamp, direction, confidence, long_conf, short_conf) "
-        "VALUES (?, ?, ?, ?, ?)"
-    )
-
-    inserted = 0
-    with get_conn() as conn:
-        cur = conn.cursor()
-        for i, ts in enumerate(df_feat["timestamp"]):
-            ts_str = ts.strftime("%Y-%m-%d %H:%M:%S")
-            try:
-                cur.execute(insert_sql, (
-                    ts_str, directions[i], confidences[i],
-                    long_conf[i], short_conf[i]
-                ))
-                if cur.rowcount:
-                    ts_short = ts_str[:16]
-                    emoji = "🐂" if directions[i] == "LONG" else "🐻"
-                    console.info(
-                        f"⏱️ [{ts_short}] 📈 {directions[i]:<5} (Conf: {confidences[i]:.2f}) | Model Prediction: {emoji}"
-                    )
-                inserted += cur.rowcount
-            except sqlite3.DatabaseError as e:
-                log.error("DB insert error at %s: %s", ts_str, e)
-        conn.commit()
-
-    log.info("Inserted %d new predictions into 'new_predictions' table", inserted)
-    return inserted
+    ts_strs = pd.to_datetime(df_feat["timestamp"]).dt.strftime("%Y-%m-%d %H:%M:%S").tolist()
+    rows = list(zip(ts_strs, directions, confidences, long_conf, short_conf))
+    # Committed by the db_writer thread (rejected rows are logged by bulk_insert)
+    future = submit(bulk_insert, "new_predictions", rows, columns=list(PREDICTION_COLUMNS))
+    log_bulk_result(future, "new_predictions", log)
+    _failed_inserts.watch(future, min(ts_strs))
+    _last_ts = max(ts_strs)
+
+    for i, ts_str in enumerate(ts_strs):
+        emoji = "🐂" if directions[i] == "LONG" else "🐻"
+        console.info(
+            f"⏱️ [{ts_str[:16]}] 📈 {directions[i]:<5} (Conf: {confidences[i]:.2f}) | Model Prediction: {emoji}"
+        )
+    return pd.DataFrame(rows, columns=PREDICTION_COLUMNS)
+
+
+def predictor_cycle(features: pd.DataFrame | None = None) -> int:
+    """Predict on new feature rows (see predict). Returns number of predictions."""
+    return len(predict(features))
 
 if __name__ == "__main__":
     logging.basicConfig(level=logging.INFO)
@@ -0,0 +1,168 @@
+# scheduler.py
+"""
+Minute-aligned scheduler for the live loop.
+
+Instead of running the pipeline and then sleeping 60 s (which drifts by
+the cycle's own runtime), the scheduler wakes SCHEDULER_OFFSET_SEC after
+every exchange minute boundary, i.e. right after a 1-min bar has closed,
+and runs the stages in order against a per-cycle deadline:
+
+- stages marked `late_ok=False` (entries) are skipped once the cycle is
+  more than SCHEDULER_DEADLINE_SEC past the bar close, so a stale bar is
+  never traded
+- a cycle that runs past the next wake-up is an overrun: with
+  SCHEDULER_OVERRUN = "coalesce" the next cycle starts at once for the
+  newest minute (it picks up every bar since the last cycle), with
+  "skip" the late minute is dropped and the scheduler waits for the
+  following boundary
+
+Every cycle records its wake lag and bar-close-to-decision latency in the
+stage metrics (live.wake_lag, live.bar_to_decision) and appends a row to
+SCHEDULER_LATENCY_CSV.
+"""
+
+import logging
+import math
+import time
+from dataclasses import dataclass, field
+from datetime import datetime
+from pathlib import Path
+from typing import Callable
+
+from trade_config import TradeConfig
+from stage_metrics import get_stage_metrics, measure
+
+log = logging.getLogger(__name__)
+
+_LATENCY_HEADER = "bar_close,wake_lag_sec,decision_latency_sec,missed,skipped,error\n"
+
+
+@dataclass
+class Stage:
+    name: str
+    fn: Callable[[], object]
+    late_ok: bool = True   # False: skipped once the cycle is past its deadline
+
+
+@dataclass
+class CycleReport:
+    bar_close: datetime          # the minute boundary the cycle runs for
+    wake_lag: float              # seconds between the planned and actual wake-up
+    missed: int = 0              # earlier minutes coalesced into / dropped before this one
+    ran: list = field(default_factory=list)
+    skipped: list = field(default_factory=list)
+    latency: float | None = None   # bar close -> last stage done
+    error: str | None = None
+
+
+class MinuteScheduler:
+    def __init__(
+        self,
+        offset_sec: float = TradeConfig.SCHEDULER_OFFSET_SEC,
+        deadline_sec: float = TradeConfig.SCHEDULER_DEADLINE_SEC,
+        overrun: str = TradeConfig.SCHEDULER_OVERRUN,
+        latency_csv: Path | None = TradeConfig.SCHEDULER_LATENCY_CSV,
+        clock: Callable[[], float] = time.time,
+        sleep: Callable[[float], None] = time.sleep
+    ):
+        if overrun not in ("coalesce", "skip"):
+            raise ValueError(f"Unknown overrun policy {overrun!r}; expected 'coalesce' or 'skip'")
+        self.offset = offset_sec
+        self.deadline = deadline_sec
+        self.overrun = overrun
+        self.latency_csv = Path(latency_csv) if latency_csv else None
+        self.clock = clock
+        self.sleep = sleep
+        self._last = None   # epoch seconds of the last boundary a cycle ran for
+
+    # ---------- timing ----------
+
+    def _sleep_until(self, t: float) -> None:
+        while True:
+            remaining = t - self.clock()
+            if remaining <= 0:
+                return
+            self.sleep(remaining)
+
+    def wait(self) -> tuple:
+        """
+        Sleep until the next cycle is due. Returns (boundary epoch seconds,
+        minutes missed since the previous cycle).
+        """
+        now = self.clock()
+        latest = math.floor((now - self.offset) / 60) * 60   # newest boundary whose wake-up has passed
+        missed = 0
+        if self._last is None or latest < self._last + 60:
+            boundary = latest + 60 if self._last is None else self._last + 60
+        else:
+            # Overrun: the wake-up for the next minute (and maybe more) has passed
+            missed = int((latest - self._last) // 60) - 1
+            if self.overrun == "coalesce":
+                boundary = latest
+            else:
+                boundary = latest + 60
+                missed += 1
+            log.warning(
+                "Cycle overran: %d minute(s) %s",
+                missed, "coalesced into the next cycle" if self.overrun == "coalesce" else "skipped"
+            )
+        self._sleep_until(boundary + self.offset)
+        self._last = boundary
+        return boundary, missed
+
+    # ---------- one cycle ----------
+
+    def run_cycle(self, boundary: float, stages: list, missed: int = 0) -> CycleReport:
+        """Run `stages` for the bar that closed at `boundary` (see module docstring)."""
+        report = CycleReport(
+            bar_close=datetime.fromtimestamp(boundary),
+            wake_lag=self.clock() - (boundary + self.offset),
+            missed=missed
+        )
+        deadline = boundary + self.deadline
+        with measure("live.cycle"):
+            for stage in stages:
+                if not stage.late_ok and self.clock() > deadline:
+                    report.skipped.append(stage.name)
+                    continue
+                try:
+                    with measure(f"live.{stage.name}"):
+                        stage.fn()
+                except Exception as e:
+                    # Later stages depend on this one's output
+                    log.exception("❌ Stage %s failed", stage.name)
+                    report.error = f"{stage.name}: {e}"
+                    break
+                report.ran.append(stage.name)
+        report.latency = self.clock() - boundary
+
+        if report.skipped:
+            log.warning(
+                "Cycle %s %.1fs past bar close: skipped %s",
+                f"{report.bar_close:%H:%M}", report.latency, ", ".join(report.skipped)
+            )
+        self._record(report)
+        return report
+
+    def _record(self, report: CycleReport) -> None:
+        metrics = get_stage_metrics()
+        metrics.record("live.wake_lag", report.wake_lag)
+        metrics.record("live.bar_to_decision", report.latency)
+        log.info(
+            "Bar %s: decision %.2fs after close (wake lag %.3fs, missed %d)",
+            f"{report.bar_close:%H:%M}", report.latency, report.wake_lag, report.missed
+        )
+        if self.latency_csv is None:
+            return
+        try:
+            new = not self.latency_csv.exists()
+            self.latency_csv.parent.mkdir(parents=True, exist_ok=True)
+            with open(self.latency_csv, "a") as f:
+                if new:
+                    f.write(_LATENCY_HEADER)
+                f.write(
+                    f"{report.bar_close:%Y-%m-%d %H:%M:%S},{report.wake_lag:.4f},{report.latency:.4f},"
+                    f"{report.missed},{'|'.join(report.skipped)},{(report.error or '').replace(',', ';')}\n"
+                )
+        except OSError as e:
+            log.error("Latency record failed: %s", e)
@@ -2,7 +2,7 @@ import pandas as pd
 import numpy as np
 import os
 from datetime import datetime, date, time, timedelta
-from db import get_conn
+from db import get_read_conn
 
 # === FINALIZED PARAMETERS ===
 LONG_TH = 0.85
@@ -39,7 +39,7 @@ def _parse_date(d_str):
 
 # --- Data Loading ---
 def load_data_from_db():
-    with get_conn() as conn:
+    with get_read_conn() as conn:
         price_df = pd.read_sql(
             "SELECT * FROM bars ORDER BY timestamp", conn,
             parse_dates=["timestamp"]
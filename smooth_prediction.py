@@ -1,10 +1,14 @@
-import sqlite3
 import pandas as pd
-import numpy as np
-from trade_config import BASE_DIR, TradeConfig
+import smoothers
+from trade_config import TradeConfig
+from db import get_read_conn, get_signal_cache, execute_write
+from db_writer import submit
 
-DB_PATH = BASE_DIR / "core_files" / "trading_data.db"
 TABLE_NAME = "new_predictions"
+SMOOTHED_COLUMNS = [
+    "entry_smoothed_long_conf", "entry_smoothed_short_conf",
+    "exit_smoothed_long_conf", "exit_smoothed_short_conf",
+]
 
 
 def weighted_moving_average(series: pd.Series, window: int) -> pd.Series:
@@ -12,83 +16,104 @@ def weighted_moving_average(series: pd.Series, window: int) -> pd.Series:
     Compute a weighted moving average where more recent values
     carry higher weight.
     """
-    weights = np.arange(1, window + 1)
+    return pd.Series(smoothers.wma(series, window), index=series.index)
 
-    def _wma(x: np.ndarray) -> float:
-        w = weights[-len(x):]
-        return np.dot(x, w) / w.sum()
 
-    return series.rolling(window, min_periods=1).apply(_wma, raw=True)
+def smoothing_method(method: str, weighted: bool) -> str:
+    """Configured smoother; an empty method keeps the WEIGHTED_* switch (wma / sma)."""
+    return method or ("wma" if weighted else "sma")
 
 
 def apply_smoothing(
     df: pd.DataFrame,
     column: str,
     window: int,
-    weighted: bool
+    weighted: bool,
+    method: str = ""
 ) -> pd.Series:
     """
-    Apply smoothing (simple or weighted) to the specified column.
+    Apply smoothing (simple, weighted, ema or hull) to the specified column.
     """
-    if weighted:
-        return weighted_moving_average(df[column], window)
-    return df[column].rolling(window, min_periods=1).mean()
+    values = smoothers.smooth(df[column], window, smoothing_method(method, weighted))
+    return pd.Series(values, index=df.index)
 
 
-def smooth_predictions():
+def _smoothing_settings() -> tuple:
+    return (
+        ("entry", TradeConfig.ENABLE_ENTRY_SMOOTHING, TradeConfig.ENTRY_SMOOTHING_WINDOW,
+         smoothing_method(TradeConfig.ENTRY_SMOOTHING_METHOD, TradeConfig.WEIGHTED_ENTRY_SMOOTHING)),
+        ("exit", TradeConfig.ENABLE_EXIT_SMOOTHING, TradeConfig.EXIT_SMOOTHING_WINDOW,
+         smoothing_method(TradeConfig.EXIT_SMOOTHING_METHOD, TradeConfig.WEIGHTED_EXIT_SMOOTHING)),
+    )
+
+
+def smoothed_columns(df: pd.DataFrame) -> dict:
+    """Entry/exit smoothed long/short confidence for every row of `df` (time-ordered)."""
+    out = {}
+    for prefix, enabled, window, method in _smoothing_settings():
+        for side in ("long", "short"):
+            col = f"{side}_conf"
+            values = apply_smoothing(df, col, window, False, method) if enabled else df[col]
+            # Replace NaNs
+            out[f"{prefix}_smoothed_{col}"] = values.fillna(0)
+    return out
+
+
+def _load_unsmoothed(conn, context_rows: int) -> pd.DataFrame:
     """
-    Load the new_predictions table, compute entry/exit smoothed confidence
-    using TradeConfig settings, and overwrite the table.
+    Rows still missing smoothed values, preceded by the `context_rows`
+    rows before the first of them (the rolling windows' history).
     """
-    conn = sqlite3.connect(DB_PATH)
-    df = pd.read_sql_query(f"SELECT * FROM {TABLE_NAME}", conn)
-
-    # Sanity check
-    if df.empty or "timestamp" not in df.columns:
-        print("Table is empty or missing required columns.")
-        conn.close()
-        return
-
-    # Ensure ordering by timestamp
-    df["timestamp"] = pd.to_datetime(df["timestamp"])
-    df.sort_values("timestamp", inplace=True)
-    df.reset_index(drop=True, inplace=True)
-
-    # --- Entry smoothing ---
-    if TradeConfig.ENABLE_ENTRY_SMOOTHING:
-        df["entry_smoothed_long_conf"] = apply_smoothing(
-            df, "long_conf",
-            TradeConfig.ENTRY_SMOOTHING_WINDOW,
-            TradeConfig.WEIGHTED_ENTRY_SMOOTHING
-        )
-        df["entry_smoothed_short_conf"] = apply_smoothing(
-            df, "short_conf",
-            TradeConfig.ENTRY_SMOOTHING_WINDOW,
-            TradeConfig.WEIGHTED_ENTRY_SMOOTHING
-        )
-    else:
-        df["entry_smoothed_long_conf"] = df["long_conf"]
-        df["entry_smoothed_short_conf"] = df["short_conf"]
-
-    # --- Exit smoothing ---
-    if TradeConfig.ENABLE_EXIT_SMOOTHING:
-        df["exit_smoothed_long_conf"] = apply_smoothing(
-            df, "long_conf",
-            TradeConfig.EXIT_SMOOTHING_WINDOW,
-            TradeConfig.WEIGHTED_EXIT_SMOOTHING
+    first = conn.execute(
+        f"SELECT MIN(timestamp) FROM {TABLE_NAME} WHERE entry_smoothed_long_conf IS NULL"
+    ).fetchone()[0]
+    if first is None:
+        return pd.DataFrame()
+    return pd.read_sql_query(
+        f"""
+        SELECT * FROM (
+            SELECT timestamp, direction, confidence, long_conf, short_conf FROM {TABLE_NAME}
+             WHERE timestamp < ?
+             ORDER BY timestamp DESC
+             LIMIT ?
         )
-        df["exit_smoothed_short_conf"] = apply_smoothing(
-            df, "short_conf",
-            TradeConfig.EXIT_SMOOTHING_WINDOW,
-            TradeConfig.WEIGHTED_EXIT_SMOOTHING
-        )
-    else:
-        df["exit_smoothed_long_conf"] = df["long_conf"]
-        df["exit_smoothed_short_conf"] = df["short_conf"]
+        UNION ALL
+        SELECT timestamp, direction, confidence, long_conf, short_conf FROM {TABLE_NAME}
+         WHERE timestamp >= ?
+        ORDER BY timestamp
+        """,
+        conn,
+        params=(first, context_rows, first)
+    ).assign(new=lambda d: d["timestamp"] >= first)
+
+
+def smooth_predictions() -> int:
+    """
+    Smooth the prediction rows that have no smoothed confidence yet.
+
+    Only those rows plus the history the smoothers depend on (window - 1
+    rows for sma/wma) are loaded, so every window sees the same history
+    as a full recompute; the new rows are then UPDATEd in place.
+    Returns rows smoothed.
+    """
+    context = max(
+        smoothers.history_rows(window, method) for _, _, window, method in _smoothing_settings()
+    )
+    with get_read_conn() as conn:
+        df = _load_unsmoothed(conn, context)
+
+    if df.empty:
+        return 0
+
+    for name, values in smoothed_columns(df).items():
+        df[name] = values
+    df = df[df["new"]]
+    _store_smoothed(df)
+    return len(df)
 
-    # Replace NaNs
-    df.fillna(0, inplace=True)
 
+def _store_smoothed(df: pd.DataFrame) -> None:
+    """Print the latest values, UPDATE the rows via db_writer and publish the newest signal."""
     # Show only the latest smoothed values with rounding at display time
     latest_row = df.iloc[-1]
     print(f"\n✅ Smoothed confidence values for latest signal at {latest_row['timestamp']}:")
@@ -97,13 +122,98 @@ def smooth_predictions():
     print(f"   exit_smoothed_long_conf   = {latest_row['exit_smoothed_long_conf']:.3f}")
     print(f"   exit_smoothed_short_conf  = {latest_row['exit_smoothed_short_conf']:.3f}\n")
 
-    # Save back to database (with full float precision)
-    df.to_sql(TABLE_NAME, conn, if_exists="replace", index=False)
-    conn.close()
+    # Save back to database (with full float precision), in place, via db_writer
+    sets = ", ".join(f"{col} = ?" for col in SMOOTHED_COLUMNS)
+    rows = list(zip(*(df[col].astype(float).tolist() for col in SMOOTHED_COLUMNS), df["timestamp"].tolist()))
+    submit(execute_write, f"UPDATE {TABLE_NAME} SET {sets} WHERE timestamp = ?", rows, many=True)
 
+    # Entry/exit read the newest signal from memory (db.SignalCache)
+    get_signal_cache().publish_signal(latest_row.to_dict())
 
-def smooth_prediction_cycle():
-    smooth_predictions()
+
+class LiveSmoother:
+    """
+    In-memory smoothing for the live hot path: one smoothers.Streaming*
+    per smoothed column, seeded once with the history rows stored before
+    the first predictions it sees, then fed each cycle's predictions
+    without touching the database. Gives the values smooth_predictions()
+    computes for the same rows.
+    """
+
+    def __init__(self):
+        self._streams = None   # smoothed column -> (source column, smoother or None)
+        self._last_ts = None
+
+    def _seed(self, before: str) -> None:
+        self._streams = {}
+        for prefix, enabled, window, method in _smoothing_settings():
+            for side in ("long", "short"):
+                col = f"{side}_conf"
+                smoother = smoothers.streaming_smoother(window, method) if enabled else None
+                self._streams[f"{prefix}_smoothed_{col}"] = (col, smoother)
+        context = max(
+            smoothers.history_rows(window, method) for _, _, window, method in _smoothing_settings()
+        )
+        with get_read_conn() as conn:
+            history = pd.read_sql(
+                f"""
+                SELECT * FROM (
+                    SELECT timestamp, long_conf, short_conf FROM {TABLE_NAME}
+                     WHERE timestamp < ?
+                     ORDER BY timestamp DESC
+                     LIMIT ?
+                ) ORDER BY timestamp
+                """,
+                conn,
+                params=(before, context)
+            )
+        self._feed(history)
+
+    def _feed(self, df: pd.DataFrame) -> dict:
+        sources = {col: df[col].astype(float).tolist() for col in ("long_conf", "short_conf")}
+        out = {}
+        for name, (col, smoother) in self._streams.items():
+            values = sources[col] if smoother is None else [smoother.update(x) for x in sources[col]]
+            # Replace NaNs
+            out[name] = [0.0 if v != v else v for v in values]
+        if len(df):
+            self._last_ts = df["timestamp"].iloc[-1]
+        return out
+
+    def update(self, predictions: pd.DataFrame) -> int:
+        """Smooth, store and publish `predictions` (time-ordered, as returned by predictor.predict)."""
+        if predictions.empty:
+            return 0
+        if self._last_ts is not None and predictions["timestamp"].iloc[0] <= self._last_ts:
+            # Rows behind the stream (the predictor re-ran unstored ones): smooth from the database
+            self.reset()
+            return smooth_predictions()
+        if self._streams is None:
+            self._seed(predictions["timestamp"].iloc[0])
+        df = predictions.reset_index(drop=True)
+        for name, values in self._feed(df).items():
+            df[name] = values
+        _store_smoothed(df)
+        return len(df)
+
+    def reset(self) -> None:
+        """Forget the state; the next update() seeds again from the database."""
+        self._streams = None
+        self._last_ts = None
+
+
+_live_smoother = LiveSmoother()
+
+
+def smooth_prediction_cycle(predictions: pd.DataFrame | None = None) -> int:
+    """
+    Smooth new predictions: `predictions` handed over by the predictor
+    (in-memory hot path), else the unsmoothed rows in the database.
+    """
+    if predictions is None:
+        _live_smoother.reset()
+        return smooth_predictions()
+    return _live_smoother.update(predictions)
 
 
 if __name__ == "__main__":
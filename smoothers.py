@@ -0,0 +1,217 @@
+# smoothers.py
+"""
+Moving-average kernels for confidence smoothing.
+
+Batch functions take a 1-D array (or Series) and return a float array
+of the same length; every one follows the `rolling(window,
+min_periods=1)` edge convention of the original smoother, so the first
+window - 1 values are averaged over the rows available so far.
+
+    sma   simple mean of the non-NaN values in the window
+    wma   linear weights window..1 (newest heaviest); NaN if the window holds a NaN
+    ema   ewm(span=window, adjust=False); NaN positions repeat the last value
+    hma   Hull: wma(2·wma(x, n/2) - wma(x, n), √n)
+
+Each has a Streaming* counterpart whose update() is O(1) and returns the
+value the batch function gives for the same position.
+"""
+
+import math
+from collections import deque
+
+import numpy as np
+import pandas as pd
+
+METHODS = ("sma", "wma", "ema", "hma")
+
+
+# === Batch kernels ===
+
+def sma(values, window: int) -> np.ndarray:
+    return pd.Series(np.asarray(values, dtype=float)).rolling(window, min_periods=1).mean().to_numpy()
+
+
+def wma(values, window: int) -> np.ndarray:
+    """
+    Linear-weighted MA by direct convolution, O(n·window) in numpy.
+    Within the first window - 1 rows the weights are the newest ones
+    (window, window-1, ...), normalised by their own sum.
+    """
+    x = np.asarray(values, dtype=float)
+    n = len(x)
+    if n == 0:
+        return x.copy()
+    kernel = np.arange(window, 0, -1, dtype=float)   # weight of x[i - m] is window - m
+    num = np.convolve(x, kernel)[:n]
+    den = np.full(n, kernel.sum())
+    k = min(window, n)
+    den[:k] = np.cumsum(kernel[:k])
+    return num / den
+
+
+def ema(values, window: int) -> np.ndarray:
+    """
+    Recursive EMA through StreamingEMA, so batch and live agree across NaN
+    gaps (pandas' own NaN decay changed between 2.x and 3.x).
+    """
+    smoother = StreamingEMA(window)
+    return np.array([smoother.update(x) for x in np.asarray(values, dtype=float).tolist()], dtype=float)
+
+
+def _hull_windows(window: int) -> tuple:
+    return max(window // 2, 1), max(int(math.sqrt(window)), 1)
+
+
+def hma(values, window: int) -> np.ndarray:
+    half, root = _hull_windows(window)
+    return wma(2 * wma(values, half) - wma(values, window), root)
+
+
+def history_rows(window: int, method: str = "wma") -> int:
+    """
+    Rows before a position that its smoothed value depends on. EMA never
+    forgets, so it gets 10 windows: the dropped weight is below (1-2/(w+1))^(10w) < 1e-8.
+    """
+    if method == "hma":
+        return window + _hull_windows(window)[1] - 2
+    if method == "ema":
+        return 10 * window
+    return window - 1
+
+
+def smooth(values, window: int, method: str = "wma") -> np.ndarray:
+    """Dispatch to one of METHODS."""
+    try:
+        kernel = {"sma": sma, "wma": wma, "ema": ema, "hma": hma}[method]
+    except KeyError:
+        raise ValueError(f"Unknown smoothing method {method!r}; expected one of {METHODS}") from None
+    return kernel(values, window)
+
+
+# === Streaming (one value at a time) ===
+
+class StreamingSMA:
+    def __init__(self, window: int):
+        self.window = window
+        self._buf = deque()
+        self._sum = 0.0
+        self._count = 0   # non-NaN values in the window
+
+    def update(self, x: float) -> float:
+        x = float(x)
+        self._buf.append(x)
+        if not math.isnan(x):
+            self._sum += x
+            self._count += 1
+        if len(self._buf) > self.window:
+            old = self._buf.popleft()
+            if not math.isnan(old):
+                self._sum -= old
+                self._count -= 1
+        if self._count == 0:
+            return math.nan
+        return self._sum / self._count
+
+
+class StreamingWMA:
+    """
+    O(1) linear-weighted MA via running sums:
+        numerator' = numerator - window_sum + window·x
+    NaNs count as 0 in the sums and make the output NaN while they are in
+    the window. The sums are re-derived from the buffer every `resync`
+    updates so rounding drift stays bounded.
+    """
+
+    def __init__(self, window: int, resync: int = 1000):
+        self.window = window
+        self.resync = resync
+        self._buf = deque()
+        self._total = 0.0       # sum of the window's values
+        self._numerator = 0.0   # weighted sum
+        self._weights = 0.0     # sum of the weights in use
+        self._nans = 0
+        self._since_sync = 0
+
+    def update(self, x: float) -> float:
+        x = float(x)
+        is_nan = math.isnan(x)
+        v = 0.0 if is_nan else x
+        self._nans += is_nan
+
+        # Every existing weight drops by one, the new value gets `window`
+        self._numerator += self.window * v - self._total
+        self._total += v
+        self._buf.append(x)
+        if len(self._buf) > self.window:
+            old = self._buf.popleft()
+            # its weight reached 0 above, so only the plain sum changes
+            if math.isnan(old):
+                self._nans -= 1
+            else:
+                self._total -= old
+        else:
+            self._weights += self.window - len(self._buf) + 1
+
+        self._since_sync += 1
+        if self._since_sync >= self.resync:
+            self._resync()
+        if self._nans:
+            return math.nan
+        return self._numerator / self._weights
+
+    def _resync(self):
+        values = [0.0 if math.isnan(v) else v for v in self._buf]
+        k = len(values)
+        self._total = math.fsum(values)
+        self._numerator = math.fsum(
+            (self.window - (k - 1 - i)) * v for i, v in enumerate(values)
+        )
+        self._since_sync = 0
+
+
+class StreamingEMA:
+    """
+    ewm(span=window, adjust=False) one value at a time. A NaN repeats the
+    last value and decays its weight, as pandas < 3 does with
+    ignore_na=False (same step as resample_manager._ewm_step).
+    """
+
+    def __init__(self, window: int):
+        self.alpha = 2.0 / (window + 1.0)
+        self._value = None
+        self._gap = 0   # NaNs since the last observation
+
+    def update(self, x: float) -> float:
+        x = float(x)
+        if math.isnan(x):
+            if self._value is not None:
+                self._gap += 1
+            return math.nan if self._value is None else self._value
+        if self._value is None:
+            self._value = x
+        else:
+            # ignore_na=False: the old value decays over the skipped positions too
+            old_wt = (1.0 - self.alpha) ** (self._gap + 1)
+            self._value = (old_wt * self._value + self.alpha * x) / (old_wt + self.alpha)
+        self._gap = 0
+        return self._value
+
+
+class StreamingHMA:
+    def __init__(self, window: int):
+        half, root = _hull_windows(window)
+        self._half = StreamingWMA(half)
+        self._full = StreamingWMA(window)
+        self._out = StreamingWMA(root)
+
+    def update(self, x: float) -> float:
+        return self._out.update(2 * self._half.update(x) - self._full.update(x))
+
+
+def streaming_smoother(window: int, method: str = "wma"):
+    """Incremental counterpart of smooth(values, window, method)."""
+    try:
+        cls = {"sma": StreamingSMA, "wma": StreamingWMA, "ema": StreamingEMA, "hma": StreamingHMA}[method]
+    except KeyError:
+        raise ValueError(f"Unknown smoothing method {method!r}; expected one of {METHODS}") from None
+    return cls(window)
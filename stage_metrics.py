@@ -0,0 +1,203 @@
+# stage_metrics.py
+"""
+Per-stage timing / memory instrumentation for the live loop and the
+feature pipeline.
+
+    with measure("features.hvn", rows=len(df)) as sample:
+        ...
+        sample.nbytes = out.nbytes   # optional: bytes the stage allocated
+
+Every stage keeps its last STAGE_METRICS_WINDOW samples (wall time, rows,
+bytes) in memory; `summary()` turns them into rolling percentiles,
+`log_summary()` writes one line per stage and `dump()` writes the same
+summary as JSON to STAGE_METRICS_PATH. The live loop calls `end_cycle()`
+once per minute, which does both every STAGE_METRICS_LOG_EVERY cycles.
+
+Bytes are only known when the stage reports them (column-store stages
+report the size of the columns they produce) or, when
+STAGE_METRICS_TRACE_MEMORY is on, from tracemalloc (peak allocation
+inside the stage; noticeably slower, meant for investigations).
+With STAGE_METRICS off, `measure()` does nothing beyond one flag check.
+"""
+
+import json
+import logging
+import threading
+import time
+import tracemalloc
+from collections import deque
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+from trade_config import TradeConfig
+
+log = logging.getLogger(__name__)
+
+_PERCENTILES = (50, 95, 99)
+
+
+class Sample:
+    """What a stage may report about itself while it runs."""
+    __slots__ = ("rows", "nbytes")
+
+    def __init__(self, rows=None):
+        self.rows = rows
+        self.nbytes = None
+
+
+class StageMetrics:
+    """Rolling per-stage samples; safe to use from several threads."""
+
+    def __init__(
+        self,
+        enabled: bool = TradeConfig.STAGE_METRICS,
+        window: int = TradeConfig.STAGE_METRICS_WINDOW,
+        trace_memory: bool = TradeConfig.STAGE_METRICS_TRACE_MEMORY
+    ):
+        self.enabled = enabled
+        self.window = window
+        self.trace_memory = enabled and trace_memory
+        self._samples = {}   # name -> deque of (seconds, rows, bytes)
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._cycles = 0
+        if self.trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+    # ---------- recording ----------
+
+    @contextmanager
+    def measure(self, name: str, rows=None):
+        if not self.enabled:
+            yield Sample(rows)
+            return
+        sample = Sample(rows)
+        mem = self._enter_memory() if self.trace_memory else None
+        t0 = time.perf_counter()
+        try:
+            yield sample
+        finally:
+            elapsed = time.perf_counter() - t0
+            if mem is not None:
+                traced = self._exit_memory(mem)
+                if sample.nbytes is None:
+                    sample.nbytes = traced
+            self.record(name, elapsed, sample.rows, sample.nbytes)
+
+    def record(self, name: str, seconds: float, rows=None, nbytes=None) -> None:
+        """Add one sample (for callers that time a stage themselves)."""
+        if not self.enabled:
+            return
+        with self._lock:
+            samples = self._samples.get(name)
+            if samples is None:
+                samples = self._samples[name] = deque(maxlen=self.window)
+            samples.append((seconds, rows, nbytes))
+
+    # tracemalloc has a single peak counter: each stage resets it on entry,
+    # and the peak seen so far is folded into the enclosing stage first.
+    def _enter_memory(self):
+        stack = getattr(self._local, "stack", None)
+        if stack is None:
+            stack = self._local.stack = []
+        current, peak = tracemalloc.get_traced_memory()
+        if stack:
+            stack[-1][1] = max(stack[-1][1], peak)
+        tracemalloc.reset_peak()
+        frame = [current, current]   # [start, highest peak seen]
+        stack.append(frame)
+        return frame
+
+    def _exit_memory(self, frame) -> int:
+        stack = self._local.stack
+        _, peak = tracemalloc.get_traced_memory()
+        stack.pop()
+        peak = max(frame[1], peak)
+        if stack:
+            stack[-1][1] = max(stack[-1][1], peak)
+        return peak - frame[0]
+
+    # ---------- reporting ----------
+
+    def summary(self) -> dict:
+        """Rolling percentiles per stage: wall time (ms), rows and bytes."""
+        with self._lock:
+            snapshot = {name: list(samples) for name, samples in self._samples.items()}
+        out = {}
+        for name, samples in sorted(snapshot.items()):
+            ms = np.array([s[0] for s in samples]) * 1000.0
+            stats = {
+                "count": len(ms),
+                **{f"p{p}_ms": round(float(np.percentile(ms, p)), 3) for p in _PERCENTILES},
+                "max_ms": round(float(ms.max()), 3),
+                "total_ms": round(float(ms.sum()), 3),
+            }
+            rows = [s[1] for s in samples if s[1] is not None]
+            if rows:
+                stats["rows_p50"] = float(np.percentile(rows, 50))
+            nbytes = [s[2] for s in samples if s[2] is not None]
+            if nbytes:
+                stats["bytes_p50"] = float(np.percentile(nbytes, 50))
+                stats["bytes_p95"] = float(np.percentile(nbytes, 95))
+            out[name] = stats
+        return out
+
+    def log_summary(self, level: int = logging.INFO) -> None:
+        for name, s in self.summary().items():
+            line = (
+                f"{name:<32} n={s['count']:<5} p50={s['p50_ms']:.2f}ms "
+                f"p95={s['p95_ms']:.2f}ms p99={s['p99_ms']:.2f}ms max={s['max_ms']:.2f}ms"
+            )
+            if "rows_p50" in s:
+                line += f" rows~{s['rows_p50']:.0f}"
+            if "bytes_p95" in s:
+                line += f" mem_p95={s['bytes_p95'] / 1e6:.2f}MB"
+            log.log(level, line)
+
+    def dump(self, path: Path = TradeConfig.STAGE_METRICS_PATH) -> None:
+        """Write the summary as JSON (atomically replaced)."""
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_suffix(path.suffix + ".tmp")
+        payload = {
+            "generated_at": datetime.now().isoformat(timespec="seconds"),
+            "window": self.window,
+            "stages": self.summary(),
+        }
+        tmp.write_text(json.dumps(payload, indent=2))
+        tmp.replace(path)
+
+    def end_cycle(self, every: int = TradeConfig.STAGE_METRICS_LOG_EVERY) -> None:
+        """Call once per live cycle; logs and dumps every `every` cycles."""
+        if not self.enabled:
+            return
+        self._cycles += 1
+        if self._cycles % every:
+            return
+        self.log_summary()
+        try:
+            self.dump()
+        except OSError as e:
+            log.error("Stage metrics dump failed: %s", e)
+
+    def reset(self) -> None:
+        with self._lock:
+            self._samples.clear()
+
+
+# Process-wide instance
+_metrics = None
+
+
+def get_stage_metrics() -> StageMetrics:
+    global _metrics
+    if _metrics is None:
+        _metrics = StageMetrics()
+    return _metrics
+
+
+def measure(name: str, rows=None):
+    """Time a block as stage `name` on the process-wide StageMetrics."""
+    return get_stage_metrics().measure(name, rows)
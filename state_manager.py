@@ -1,69 +1,200 @@
 # state_manager.py – DB-based trade state manager
-import sqlite3
 import logging
+import threading
 from typing import List, Dict, Any
 from datetime import date
-from db import get_conn
+from db import get_conn, get_read_conn, transaction, execute_write
+from db_schema import LIVE_TRADE_COLUMNS
+from db_writer import submit
 
 logger = logging.getLogger("state_manager")
 
 # === LIVE TRADE STATE ===
 
-def load_live_trades() -> List[Dict[str, Any]]:
-    """Load open trades (status = 'OPEN') from DB."""
-    with get_conn() as conn:
-        cur = conn.cursor()
-        cur.execute(
-            """
-            SELECT * FROM live_trade_details
-             WHERE status = 'OPEN'
-            """
+class TradeBook:
+    """
+    Open and today's closed trades, held in memory and written through.
+
+    Trades are dicts keyed by live_trade_details column names (extra keys
+    stay in memory only); open trades are indexed by row id, since
+    trade_number restarts every day and a trade left open overnight may
+    share today's number. Every
+    change is one targeted statement on its row: INSERT for a new trade,
+    UPDATE ... WHERE id = ? for a change, handed to db_writer, so neither
+    reads (counts, lookups) nor writes wait on the database. Row ids are
+    allocated here (the book is the table's only writer while the bot
+    runs). `load()` rebuilds the book from the DB on startup.
+    """
+
+    def __init__(self):
+        self._open = {}     # id -> trade
+        self._closed = []   # today's closed trades, in exit order
+        self._last_id = 0
+        self._lock = threading.RLock()
+        self.loaded = False
+
+    # ---------- startup ----------
+
+    def load(self) -> "TradeBook":
+        """Rebuild from live_trade_details: every OPEN row plus today's closed ones."""
+        with get_read_conn() as conn:
+            open_rows = _fetch_trades(conn, "WHERE status = 'OPEN' ORDER BY id")
+            closed_rows = _fetch_trades(
+                conn,
+                """WHERE entry_time >= date('now', 'localtime')
+                     AND entry_time <  date('now', 'localtime', '+1 day')
+                     AND status <> 'OPEN'
+                   ORDER BY id"""
+            )
+            last_id = conn.execute("SELECT MAX(id) FROM live_trade_details").fetchone()[0] or 0
+        with self._lock:
+            self._last_id = last_id
+            self._open = {t["id"]: t for t in open_rows}
+            self._closed = closed_rows
+            self.loaded = True
+        logger.info("Trade book loaded: %d open, %d closed today", len(open_rows), len(closed_rows))
+        return self
+
+    def _ensure_loaded(self):
+        if not self.loaded:
+            self.load()
+
+    # ---------- reads (memory only) ----------
+
+    def open_trades(self) -> List[Dict[str, Any]]:
+        """Copies of the open trades, oldest first."""
+        with self._lock:
+            self._ensure_loaded()
+            return [dict(t) for t in self._open.values()]
+
+    def closed_trades(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            self._ensure_loaded()
+            return [dict(t) for t in self._closed]
+
+    def open_count(self) -> int:
+        with self._lock:
+            self._ensure_loaded()
+            return len(self._open)
+
+    def get(self, trade_id: int) -> Dict[str, Any] | None:
+        with self._lock:
+            self._ensure_loaded()
+            trade = self._open.get(trade_id)
+            return dict(trade) if trade is not None else None
+
+    def find(self, trade_number: int) -> Dict[str, Any] | None:
+        """The newest open trade with this trade number."""
+        with self._lock:
+            self._ensure_loaded()
+            matches = [t for t in self._open.values() if t["trade_number"] == trade_number]
+            return dict(matches[-1]) if matches else None
+
+    # ---------- writes (one statement each) ----------
+
+    def add(self, trade: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Record a new trade and assign its row id (never rejects one: the
+        order behind it has already been placed). Trades whose status is
+        not OPEN go to the closed list.
+        """
+        trade = dict(trade)
+        trade.setdefault("status", "OPEN")
+        cols = [c for c in LIVE_TRADE_COLUMNS if c != "id" and c in trade]
+        with self._lock:
+            self._ensure_loaded()
+            self._last_id += 1
+            trade["id"] = self._last_id
+            submit(
+                execute_write,
+                f"INSERT INTO live_trade_details (id, {', '.join(cols)}) "
+                f"VALUES (?, {', '.join('?' for _ in cols)})",
+                [trade["id"]] + [trade[c] for c in cols]
+            )
+            if trade["status"] == "OPEN":
+                self._open[trade["id"]] = trade
+            else:
+                self._closed.append(trade)
+        return dict(trade)
+
+    def update(self, trade_id: int, fields: Dict[str, Any]) -> Dict[str, Any]:
+        """Change fields of an open trade (UPDATE of the changed columns only)."""
+        with self._lock:
+            self._ensure_loaded()
+            trade = self._open[trade_id]
+            changed = {k: v for k, v in fields.items() if trade.get(k) != v}
+            if not changed:
+                return dict(trade)
+            self._write_fields(trade["id"], changed)
+            trade.update(changed)
+            if trade.get("status") != "OPEN":
+                self._closed.append(self._open.pop(trade_id))
+            return dict(trade)
+
+    def close(self, trade_id: int, status: str = "CLOSED", **exit_fields) -> Dict[str, Any]:
+        """Mark an open trade closed (exit_time, exit prices, pnl, exit_reason ...)."""
+        return self.update(trade_id, dict(exit_fields, status=status))
+
+    def remove(self, trade_id: int) -> None:
+        """Delete an open trade's row (e.g. an order that never filled)."""
+        with self._lock:
+            self._ensure_loaded()
+            trade = self._open.pop(trade_id)
+            submit(execute_write, "DELETE FROM live_trade_details WHERE id = ?", (trade["id"],))
+
+    def sync(self, trades: List[Dict[str, Any]]) -> None:
+        """
+        Make the open book equal to `trades` (the old save_live_trades
+        contract) with targeted writes: trades without a known open id are
+        inserted, changed fields updated (a non-OPEN status closes the
+        trade), and open trades missing from the list deleted.
+        """
+        with self._lock:
+            self._ensure_loaded()
+            known = {t["id"]: t for t in trades if t.get("id") in self._open}
+            for trade_id in [i for i in self._open if i not in known]:
+                self.remove(trade_id)
+            for trade in trades:
+                if trade.get("id") in known:
+                    self.update(trade["id"], {k: v for k, v in trade.items() if k != "id"})
+                else:
+                    self.add({k: v for k, v in trade.items() if k != "id"})
+
+    def _write_fields(self, trade_id: int, fields: Dict[str, Any]) -> None:
+        cols = [c for c in fields if c in LIVE_TRADE_COLUMNS and c != "id"]
+        if not cols:
+            return
+        submit(
+            execute_write,
+            f"UPDATE live_trade_details SET {', '.join(f'{c} = ?' for c in cols)} WHERE id = ?",
+            [fields[c] for c in cols] + [trade_id]
         )
-        rows = cur.fetchall()
-        columns = [col[0] for col in cur.description]
-        return [dict(zip(columns, row)) for row in rows]
+
+
+def _fetch_trades(conn, where: str) -> List[Dict[str, Any]]:
+    cur = conn.execute(f"SELECT * FROM live_trade_details {where}")
+    columns = [col[0] for col in cur.description]
+    return [dict(zip(columns, row)) for row in cur.fetchall()]
+
+
+_trade_book = TradeBook()
+
+
+def get_trade_book() -> TradeBook:
+    return _trade_book
+
+
+def load_live_trades() -> List[Dict[str, Any]]:
+    """Open trades (status = 'OPEN'), from the in-memory book."""
+    return _trade_book.open_trades()
 
 
 def save_live_trades(state: List[Dict[str, Any]]) -> None:
     """
-    Save entire list of open trades (overwrite OPENs).
-    Useful for rare full manual updates.
+    Save the list of open trades (see TradeBook.sync): only the trades
+    that were added, changed or dropped are written.
     """
-    with get_conn() as conn:
-        cur = conn.cursor()
-        cur.execute("DELETE FROM live_trade_details WHERE status = 'OPEN'")
-        for trade in state:
-            cur.execute(
-                """
-                INSERT INTO live_trade_details (
-                    trade_number, timestamp, entry_time, direction,
-                    confidence, instrument, quantity,
-                    entry_index_price, entry_price_option,
-                    status, exit_index_price, option_pnl, index_pnl,
-                    fut_index_sl_level, fut_index_tp_level, strike, raw_confidence
-                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                """,
-                (
-                    trade.get("trade_number"),
-                    trade.get("timestamp"),
-                    trade.get("entry_time"),
-                    trade.get("direction"),
-                    trade.get("confidence"),
-                    trade.get("instrument"),
-                    trade.get("quantity"),
-                    trade.get("entry_index_price"),
-                    trade.get("entry_price_option"),
-                    trade.get("status"),
-                    trade.get("exit_index_price"),
-                    trade.get("option_pnl"),
-                    trade.get("index_pnl"),
-                    trade.get("fut_index_sl_level"),
-                    trade.get("fut_index_tp_level"),
-                    trade.get("strike"),
-                    trade.get("raw_confidence")
-                )
-            )
-        conn.commit()
+    _trade_book.sync(state)
 
 # === ALIASES FOR COMPATIBILITY ===
 get_live_trades = load_live_trades
@@ -71,85 +202,130 @@ update_live_trades = save_live_trades
 
 # === DAILY TRADE STATE ===
 
-def load_trade_state() -> Dict[str, Any]:
-    """Load or initialize today's trade state (from daily_trade_state table)."""
-    today_str = date.today().isoformat()
-    with get_conn() as conn:
-        cur = conn.cursor()
-        cur.execute("SELECT * FROM daily_trade_state WHERE date = ?", (today_str,))
-        row = cur.fetchone()
-        if row:
-            columns = [col[0] for col in cur.description]
-            return dict(zip(columns, row))
-        else:
-            # First call today, insert blank state
-            initial_state = {
-                "date": today_str,
-                "last_trade_number": 0,
-                "active_trade_count": 0,
-                "closed_trade_count": 0,
-                "win_count": 0,
-                "loss_count": 0,
-                "daily_pnl": 0.0
-            }
-            cur.execute(
-                """
-                INSERT INTO daily_trade_state (
-                    date, last_trade_number, active_trade_count,
-                    closed_trade_count, win_count, loss_count, daily_pnl
-                ) VALUES (?, ?, ?, ?, ?, ?, ?)
-                """,
-                (
-                    initial_state["date"],
-                    initial_state["last_trade_number"],
-                    initial_state["active_trade_count"],
-                    initial_state["closed_trade_count"],
-                    initial_state["win_count"],
-                    initial_state["loss_count"],
-                    initial_state["daily_pnl"]
+_LEDGER_COUNTERS = (
+    "last_trade_number", "active_trade_count", "closed_trade_count",
+    "win_count", "loss_count", "daily_pnl",
+)
+
+# Adds the deltas to today's row (created on first use) and returns it, in one statement
+_LEDGER_UPSERT = f"""
+    INSERT INTO daily_trade_state (date, {", ".join(_LEDGER_COUNTERS)})
+    VALUES (?, {", ".join("?" for _ in _LEDGER_COUNTERS)})
+    ON CONFLICT(date) DO UPDATE SET
+        {", ".join(f"{c} = {c} + excluded.{c}" for c in _LEDGER_COUNTERS)}
+    RETURNING {", ".join(_LEDGER_COUNTERS)}
+"""
+
+
+def _upsert_ledger(params) -> tuple:
+    with get_conn() as conn, transaction(conn):
+        return conn.execute(_LEDGER_UPSERT, params).fetchone()
+
+
+class DailyLedger:
+    """
+    Today's counters (trade numbers, open/closed counts, wins/losses,
+    P&L) in memory. Each change is applied under a lock, in memory and as
+    one UPSERT ... RETURNING of the deltas on today's daily_trade_state
+    row. With db_writer running the UPSERT is queued (deltas commute, so
+    the row converges on the in-memory state); run inline, the returned
+    row becomes the in-memory state. Reads are memory only. A new date
+    starts from that day's row.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._date = None
+        self._state = None
+
+    def _current(self) -> Dict[str, Any]:
+        """Today's state, loaded once per day (caller holds the lock)."""
+        today = date.today().isoformat()
+        if self._date != today:
+            with get_read_conn() as conn:
+                cur = conn.execute(
+                    f"SELECT {', '.join(_LEDGER_COUNTERS)} FROM daily_trade_state WHERE date = ?",
+                    (today,)
                 )
-            )
-            conn.commit()
-            return initial_state
+                row = cur.fetchone()
+            self._date = today
+            self._state = dict(zip(_LEDGER_COUNTERS, row or (0, 0, 0, 0, 0, 0.0)))
+        return self._state
 
+    def _apply(self, **deltas) -> Dict[str, Any]:
+        with self._lock:
+            self._current()
+            return self._write(deltas)
 
-def save_trade_state(state: Dict[str, Any]) -> None:
-    """Update today's trade state row in DB."""
-    with get_conn() as conn:
-        cur = conn.cursor()
-        cur.execute(
-            """
-            UPDATE daily_trade_state SET
-                last_trade_number = ?,
-                active_trade_count = ?,
-                closed_trade_count = ?,
-                win_count = ?,
-                loss_count = ?,
-                daily_pnl = ?
-             WHERE date = ?
-            """,
-            (
-                state["last_trade_number"],
-                state["active_trade_count"],
-                state["closed_trade_count"],
-                state["win_count"],
-                state["loss_count"],
-                state["daily_pnl"],
-                state["date"]
-            )
+    def _write(self, deltas: Dict[str, Any]) -> Dict[str, Any]:
+        """Apply `deltas` and persist them with one UPSERT (caller holds the lock)."""
+        params = [self._date] + [deltas.get(c, 0) for c in _LEDGER_COUNTERS]
+        self._state = {c: self._state[c] + deltas.get(c, 0) for c in _LEDGER_COUNTERS}
+        future = submit(_upsert_ledger, params)
+        if future.done() and future.exception() is None:
+            self._state = dict(zip(_LEDGER_COUNTERS, future.result()))
+        return dict(self._state, date=self._date)
+
+    # ---------- reads (memory only) ----------
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return dict(self._current(), date=self._date)
+
+    def trade_count(self) -> int:
+        """Trades opened today (= last trade number handed out)."""
+        with self._lock:
+            return self._current()["last_trade_number"]
+
+    # ---------- changes (one statement each) ----------
+
+    def open_trade(self) -> int:
+        """Allocate today's next trade number and count the trade as active."""
+        return self._apply(last_trade_number=1, active_trade_count=1)["last_trade_number"]
+
+    def close_trade(self, pnl: float, win: bool | None = None) -> Dict[str, Any]:
+        """Count a closed trade as a win (default: pnl > 0) or loss and add its P&L."""
+        win = pnl > 0 if win is None else win
+        return self._apply(
+            active_trade_count=-1, closed_trade_count=1,
+            win_count=int(win), loss_count=int(not win), daily_pnl=float(pnl)
         )
-        conn.commit()
+
+    def assign(self, values: Dict[str, Any]) -> Dict[str, Any]:
+        """Set counters to absolute values (manual corrections)."""
+        with self._lock:
+            current = self._current()
+            return self._write({c: values[c] - current[c] for c in _LEDGER_COUNTERS if c in values})
+
+    def reload(self) -> None:
+        """Drop the in-memory state; the next read loads today's row."""
+        with self._lock:
+            self._date = None
+
+
+_ledger = DailyLedger()
+
+
+def get_daily_ledger() -> DailyLedger:
+    return _ledger
+
+
+def load_trade_state() -> Dict[str, Any]:
+    """Today's trade state (date + counters), from the in-memory ledger."""
+    return _ledger.snapshot()
+
+
+def save_trade_state(state: Dict[str, Any]) -> None:
+    """Set today's counters to `state` (one UPSERT)."""
+    _ledger.assign(state)
 
 # === DAILY COUNT UTILITIES ===
 
 def get_daily_trade_count() -> int:
     """Return today's total number of trades placed."""
-    state = load_trade_state()
-    return state.get("last_trade_number", 0)
+    return _ledger.trade_count()
 
 
-def increment_trade_count() -> None:
-    """Increment today's trade count by one."""
-    state = load_trade_state()
-    state["last_trade_number"] = state.get("last_trade_number", 0) + 1
-    save_trade_state(state)
+def increment_trade_count() -> int:
+    """Increment today's trade count by one; returns the new trade number."""
+    return _ledger.open_trade()
@@ -14,6 +14,10 @@ class TradeConfig:
     FEATURES_CSV:Path = BASE_DIR / "core_files" / "EVAL_features_final.csv"
     PRED_CSV:    Path = BASE_DIR / "core_files" / "model_predictions.csv"
     MODEL_PKL:   Path = BASE_DIR / "models" / "xgb_model.pkl"
+    # xgb_model.pkl was trained on the lookahead ema_50_15m_above_ema_200_15m
+    # (15m close merged onto every minute of its candle); live rows are now
+    # as-of each minute. Retrain, then set False.
+    MODEL_RETRAIN_REQUIRED: bool = True
 
     CLOSED_TRADES_JSON: Path = BASE_DIR / "logs" / "closed_trades.json"
     TRADE_HISTORY_CSV:  Path = BASE_DIR / "logs" / "trade_history.csv"
@@ -36,6 +40,8 @@ class TradeConfig:
     WEIGHTED_EXIT_SMOOTHING:  bool = True
     ENTRY_SMOOTHING_WINDOW:   int  = 3
     EXIT_SMOOTHING_WINDOW:    int  = 15
+    ENTRY_SMOOTHING_METHOD:   str  = ""  # "" -> wma/sma per WEIGHTED_*; or one of smoothers.METHODS
+    EXIT_SMOOTHING_METHOD:    str  = ""
 
     # === Risk & Trade Management ===
     FIXED_TP: int = 50
@@ -44,11 +50,57 @@ class TradeConfig:
     MAX_CONCURRENT_TRADES:  int = 60
     ENTRY_MAX_SIGNAL_AGE:   int = 120  # seconds
 
+    # === Live Feature Engine ===
+    FEATURE_WARMUP_BARS: int = 3000  # bars replayed on startup (≥ 1500-bar HVN window)
+    FEATURE_PRUNING:     bool = True  # compute only the columns the model uses
+
+    # === Feature Store (append-only Parquet, partitioned by date) ===
+    FEATURE_STORE_DIR:        Path  = BASE_DIR / "core_files" / "feature_store"
+    FEATURE_STORE_BATCH_ROWS: int   = 30
+    FEATURE_STORE_FLUSH_SEC:  float = 300.0
+    PARQUET_COMPRESSION:      str   = "zstd"  # feature store, backfill and training dataset files
+
+    # === SQLite Connections (see db.ConnectionManager) ===
+    DB_READ_POOL_SIZE:     int = 4            # pooled read-only connections
+    DB_CACHED_STATEMENTS:  int = 256          # prepared statements cached per connection
+    DB_CACHE_SIZE_KB:      int = 64 * 1024    # page cache per connection
+    DB_MMAP_SIZE:          int = 256 * 1024 * 1024
+    DB_BUSY_TIMEOUT_MS:    int = 10_000
+    DB_BULK_STAGING_ROWS:  int = 50_000       # bulk_insert loads via a TEMP staging table from here on
+    DB_BULK_CHUNK_ROWS:    int = 20_000       # rows converted / bound per executemany
+    DB_ASYNC_WRITES:       bool = True        # live writes go through the db_writer thread
+    DB_WRITER_QUEUE:       int = 1_000        # queued write jobs before submit() blocks
+    DB_WRITER_BATCH_JOBS:  int = 256          # jobs per group commit
+
+    # === Live Hot Path (live_pipeline.HotPath) ===
+    LIVE_HOT_PATH: bool = True   # stages hand data over in memory; SQLite is only written
+
+    # === Live Scheduler (scheduler.MinuteScheduler) ===
+    SCHEDULER_OFFSET_SEC:   float = 2.0          # wake this long after each minute boundary (bar close)
+    SCHEDULER_DEADLINE_SEC: float = 30.0         # entries are skipped once a cycle is this far past the bar close
+    SCHEDULER_OVERRUN:      str   = "coalesce"   # overrun: "coalesce" missed minutes or "skip" them
+    SCHEDULER_LATENCY_CSV:  Path  = BASE_DIR / "logs" / "cycle_latency.csv"
+
+    # === Live Signal Cache (db.SignalCache) ===
+    SIGNAL_CACHE_BARS: int = 120   # recent bar closes kept for the prediction/close join
+
+    # === Stage Metrics (per-stage wall time / rows / memory) ===
+    STAGE_METRICS:              bool = True
+    STAGE_METRICS_WINDOW:       int  = 500    # samples kept per stage for the rolling percentiles
+    STAGE_METRICS_LOG_EVERY:    int  = 15     # live cycles between summary log + JSON dump
+    STAGE_METRICS_TRACE_MEMORY: bool = False  # tracemalloc peak per stage (slow; for investigations)
+    STAGE_METRICS_PATH:         Path = BASE_DIR / "logs" / "stage_metrics.json"
+
     # === Raw bar CSV column order ===
     BAR_COLS: tuple = (
         "timestamp", "open", "high", "low", "close", "volume", "open_interest"
     )
 
+    # === Session Calendar ===
+    MARKET_HOLIDAYS_CSV: Path = BASE_DIR / "core_files" / "market_holidays.csv"  # one YYYY-MM-DD per line
+    # Monthly expiry = last <weekday> of the month (0=Mon), by effective date
+    EXPIRY_WEEKDAYS: tuple = (("2000-01-01", 3), ("2025-09-01", 1))
+
     # === Symbol Format ===
     SYMBOL_PREFIX: str = "BANKNIFTY"
     EXPIRY_DATE:   str = "25JUL2024"
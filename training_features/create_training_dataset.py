@@ -2,72 +2,154 @@
 
 import sys
 import os
+from pathlib import Path
 
-# Add the current folder to path
-sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+# Add the project root to path (this script lives in training_features/)
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
+import numpy as np
 import pandas as pd
+from trade_config import TradeConfig
 
 # Now normal imports
-from features.price_action import add_price_action_features
-from features.volume_features import add_volume_features
-from features.trend_features import add_trend_features
-from features.structure_features import add_structure_features
-from features.time_features import add_time_features
-from features.momentum_features import add_momentum_features
-from label_generator import generate_labels
+from training_features.price_action import add_price_action_features
+from training_features.volume_features import add_volume_features
+from training_features.trend_features import add_trend_features
+from training_features.structure_features import add_structure_features
+from training_features.time_features import add_time_features
+from training_features.momentum_features import add_momentum_features
+from training_features.label_generator import generate_labels
+from training_features.feature_schema import FEATURE_DTYPES, apply_feature_dtypes
 
 
 # ==== CONFIGURATION ====
 RAW_DATA_FILE = "/Users/aneeshvr/Desktop/BN-Raw Data/banknifty_1m_full_2012_2022.csv"  # <<< Full merged raw file
 OUTPUT_FOLDER = "/Users/aneeshvr/Desktop/BN-Raw Data/output/"
-OUTPUT_FILE = "dataset_with_labels.csv"
+OUTPUT_DATASET = "dataset_with_labels"  # Parquet dataset dir, partitioned by year=YYYY
 
 # Labeling parameters
 SL_PERCENT = 0.002  # 0.2% stoploss assumption
 FUTURE_WINDOW = 15  # 15 minute lookahead for future max high/min low
 
-# ==== MAIN PIPELINE ====
-def create_training_dataset():
-    print("📥 Loading raw 1-minute BankNifty futures data...")
-    df = pd.read_csv(RAW_DATA_FILE)
-
-    print(f"🧠 Initial Data Loaded: {len(df)} rows, {df.shape[1]} columns")
-
-    # ==== Feature Engineering ====
-    print("🛠 Applying feature engineering modules...")
-
+# Chunking: raw rows read per chunk (cut back to whole trading days), and
+# warm-up rows carried into each chunk so every rolling window is full
+# (longest lookback: the 1500-bar HVN window).
+CHUNK_ROWS = 250_000
+OVERLAP_BARS = 1500
+
+
+# ==== CHUNKING HELPERS ====
+def _with_datetime(df: pd.DataFrame) -> pd.DataFrame:
+    """Ensure a parsed 'datetime' column (from 'datetime', 'timestamp' or 'date' + 'time')."""
+    if 'datetime' in df.columns:
+        df['datetime'] = pd.to_datetime(df['datetime'])
+    elif 'timestamp' in df.columns:
+        df['datetime'] = pd.to_datetime(df['timestamp'])
+    else:
+        df['datetime'] = pd.to_datetime(df['date'].astype(str) + ' ' + df['time'].astype(str))
+    return df
+
+
+def _day_chunks(path, chunk_rows: int):
+    """
+    Stream the raw CSV and yield frames of whole trading days.
+    The (possibly incomplete) last day of each read is held back and
+    prepended to the next one.
+    """
+    pending = None
+    for raw in pd.read_csv(path, chunksize=chunk_rows):
+        raw = _with_datetime(raw)
+        if pending is not None:
+            raw = pd.concat([pending, raw], ignore_index=True)
+        day = raw['datetime'].dt.normalize()
+        complete = (day < day.iloc[-1]).to_numpy()
+        pending = raw[~complete]
+        if complete.any():
+            yield raw[complete].reset_index(drop=True)
+    if pending is not None and len(pending):
+        yield pending.reset_index(drop=True)
+
+
+def _downcast(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Feature/label columns to the feature_schema dtypes; any other column:
+    float64 -> float32, ints to the smallest int type.
+    """
+    df = apply_feature_dtypes(df)
+    for col in df.columns:
+        if col in FEATURE_DTYPES:
+            continue
+        dtype = df[col].dtype
+        if dtype == np.float64:
+            df[col] = df[col].astype(np.float32)
+        elif pd.api.types.is_integer_dtype(dtype) and not pd.api.types.is_bool_dtype(dtype):
+            df[col] = pd.to_numeric(df[col], downcast='integer')
+    return df
+
+
+def _build_chunk(df: pd.DataFrame, trend_carry: dict, carry_at: int) -> pd.DataFrame:
+    """Feature engineering for one (warm-up prefix + chunk) frame."""
     df = add_price_action_features(df)
-    print("✅ Price Action Features added.")
-
     df = add_volume_features(df)
-    print("✅ Volume Features added.")
-
-    df = add_trend_features(df)
-    print("✅ Trend Features added.")
-
+    # EWM state of the 15m EMAs is carried across chunks instead of re-warmed
+    df = add_trend_features(df, carry=trend_carry, carry_at=carry_at)
     df = add_structure_features(df)
-    print("✅ Structure Features added.")
-
     df = add_time_features(df)
-    print("✅ Time Features added.")
-
     df = add_momentum_features(df)
-    print("✅ Momentum Features added.")
+    return df
 
-    # ==== Label Generation ====
-    print("🏷️ Generating long and short labels based on future returns...")
-    df = generate_labels(df, sl_percent=SL_PERCENT, future_window=FUTURE_WINDOW)
-    print("✅ Labels added.")
 
-    # ==== Save Output ====
-    os.makedirs(OUTPUT_FOLDER, exist_ok=True)
-    output_path = os.path.join(OUTPUT_FOLDER, OUTPUT_FILE)
+def _write_partitions(df: pd.DataFrame, out_dir: Path, chunk_no: int) -> None:
+    """Write one chunk as year=YYYY/part-NNNNN.parquet files."""
+    for year, part in df.groupby(df['datetime'].dt.year, sort=True):
+        part_dir = out_dir / f"year={year}"
+        part_dir.mkdir(parents=True, exist_ok=True)
+        part.to_parquet(
+            part_dir / f"part-{chunk_no:05d}.parquet",
+            index=False,
+            compression=TradeConfig.PARQUET_COMPRESSION
+        )
 
-    df.to_csv(output_path, index=False)
 
-    print(f"💾 Dataset saved to: {output_path}")
-    print(f"🧠 Final Dataset: {len(df)} rows, {df.shape[1]} columns")
+# ==== MAIN PIPELINE ====
+def create_training_dataset():
+    print("📥 Streaming raw 1-minute BankNifty futures data in day-aligned chunks...")
+
+    out_dir = Path(OUTPUT_FOLDER) / OUTPUT_DATASET
+    if out_dir.exists() and any(out_dir.rglob("*.parquet")):
+        raise FileExistsError(f"{out_dir} already holds a dataset; move or delete it first.")
+    out_dir.mkdir(parents=True, exist_ok=True)
+
+    prefix = None       # last OVERLAP_BARS raw rows of the previous chunk
+    trend_carry = {}    # 15m EMA state as of the first prefix row
+    total_rows = 0
+    n_cols = 0
+
+    for chunk_no, chunk in enumerate(_day_chunks(RAW_DATA_FILE, CHUNK_ROWS)):
+        n_prefix = 0 if prefix is None else len(prefix)
+        raw = chunk if prefix is None else pd.concat([prefix, chunk], ignore_index=True)
+        next_prefix_len = min(OVERLAP_BARS, len(raw))
+        next_prefix = raw.iloc[len(raw) - next_prefix_len:].copy()
+
+        # ==== Feature Engineering (warm-up rows dropped afterwards) ====
+        df = _build_chunk(raw, trend_carry, carry_at=len(raw) - next_prefix_len)
+        df = df.iloc[n_prefix:].reset_index(drop=True)
+
+        # ==== Label Generation ====
+        # Labels never look past the session close, so whole-day chunks label exactly
+        df = generate_labels(df, sl_percent=SL_PERCENT, future_window=FUTURE_WINDOW)
+
+        # ==== Save Output ====
+        _write_partitions(_downcast(df), out_dir, chunk_no)
+
+        total_rows += len(df)
+        n_cols = df.shape[1]
+        prefix = next_prefix
+        print(f"✅ Chunk {chunk_no}: {len(df)} rows "
+              f"({df['datetime'].iloc[0]:%Y-%m-%d} → {df['datetime'].iloc[-1]:%Y-%m-%d})")
+
+    print(f"💾 Dataset saved to: {out_dir}")
+    print(f"🧠 Final Dataset: {total_rows} rows, {n_cols} columns")
     print("🎯 Feature + Label Dataset creation completed successfully!")
 
 # ==== RUN SCRIPT ====
@@ -0,0 +1,165 @@
+# features/feature_registry.py
+
+from dataclasses import dataclass
+from typing import Callable, Iterable, Mapping, Optional
+
+from stage_metrics import measure
+
+from training_features.price_action       import price_action_columns, atr_columns
+from training_features.volume_features    import volume_feature_columns
+from training_features.volume_signals     import volume_signal_columns
+from training_features.open_interest      import oi_columns
+from training_features.structure_features import structure_columns
+from training_features.vwap_utils         import vwap_columns
+from training_features.hvn_engine         import hvn_columns, HVN_COLUMNS
+from training_features.time_features      import time_columns
+from training_features.momentum_features  import momentum_columns
+from training_features.trend_detector     import trend_regime_columns
+from training_features.meta_features      import meta_columns
+from training_features.features_engineered import engineered_columns
+from training_features.resample_manager   import multi_timeframe_columns, MULTI_TIMEFRAME_COLUMNS
+
+# Columns present before any stage runs (raw bar + build_features prep)
+BASE_COLUMNS = (
+    "timestamp", "open", "high", "low", "close", "volume",
+    "open_interest", "oi", "datetime", "symbol", "date", "ema_filter_15",
+)
+
+
+@dataclass(frozen=True)
+class FeatureStage:
+    """
+    One build_features stage: a column-store node plus the columns it
+    reads and the columns it writes. `compute(cols)` takes a mapping of
+    column name -> array and returns {produced column: array}.
+    """
+    name: str
+    compute: Callable[[Mapping], dict]
+    requires: tuple
+    produces: tuple
+
+
+# In build_features order. Later stages may overwrite earlier outputs
+# (e.g. meta re-derives volume_spike/delta_volume_sign); the last writer wins.
+FEATURE_STAGES = (
+    FeatureStage(
+        "atr", atr_columns,
+        requires=("high", "low", "close"),
+        produces=("atr",),
+    ),
+    FeatureStage(
+        "price_action", price_action_columns,
+        requires=("open", "high", "low", "close"),
+        produces=("body_size", "candle_range", "wick_top", "wick_bottom", "is_bullish",
+                  "is_bearish", "direction", "body_ratio", "wick_ratio"),
+    ),
+    FeatureStage(
+        "volume_features", volume_feature_columns,
+        requires=("volume", "close", "open_interest"),
+        produces=("volume_spike_flag", "volume_surge_magnitude", "oi_change_1min",
+                  "oi_change_5min", "rolling_oi_increase_flag", "rolling_oi_decrease_flag",
+                  "price_oi_divergence_flag", "price_volume_oi_confluence_flag"),
+    ),
+    FeatureStage(
+        "volume_signals", volume_signal_columns,
+        requires=("volume", "open", "close"),
+        produces=("rolling_avg_vol_10", "volume_spike", "direction",
+                  "delta_volume_sign", "cum_delta_5"),
+    ),
+    FeatureStage(
+        "open_interest", oi_columns,
+        requires=("oi", "open", "close"),
+        produces=("oi_change", "oi_change_5", "price_up", "price_down", "price_up_oi_up",
+                  "price_down_oi_up", "price_up_oi_down", "price_down_oi_down"),
+    ),
+    FeatureStage(
+        "structure", structure_columns,
+        requires=("high", "low", "close"),
+        produces=("distance_from_vwap", "distance_from_high_volume_node", "support_distance",
+                  "resistance_distance", "nearest_zone_strength"),
+    ),
+    FeatureStage(
+        "vwap", vwap_columns,
+        requires=("datetime", "high", "low", "close", "volume"),
+        produces=("date", "tp", "vwap", "vwap_distance", "vwap_distance_pct",
+                  "above_vwap_flag", "vwap_trend_slope_15m"),
+    ),
+    FeatureStage(
+        "hvn", hvn_columns,
+        requires=("close", "volume"),
+        produces=HVN_COLUMNS,
+    ),
+    FeatureStage(
+        "time", time_columns,
+        requires=("datetime",),
+        produces=("time", "hour", "minute", "minute_of_day", "expiry_week_flag", "weekday"),
+    ),
+    FeatureStage(
+        "momentum", momentum_columns,
+        requires=("close",),
+        produces=("macd_histogram_30m",),
+    ),
+    FeatureStage(
+        "trend", trend_regime_columns,
+        requires=("close",),
+        produces=("trend_strength", "trend_regime"),
+    ),
+    FeatureStage(
+        "meta", meta_columns,
+        requires=("volume", "close", "rolling_avg_vol_10", "oi_change") + HVN_COLUMNS,
+        produces=("volume_spike", "delta_volume_sign", "rr_ratio_estimate",
+                  "zone_cluster_strength", "high_confidence_window"),
+    ),
+    FeatureStage(
+        "engineered", engineered_columns,
+        requires=("datetime", "body_size", "volume_surge_magnitude", "rolling_oi_increase_flag",
+                  "candle_range", "distance_from_vwap"),
+        produces=("hour", "minute", "event_score", "no_trade_zone_flag", "is_alpha_hour"),
+    ),
+    FeatureStage(
+        "multi_timeframe", multi_timeframe_columns,
+        requires=("datetime", "close"),
+        produces=MULTI_TIMEFRAME_COLUMNS,
+    ),
+)
+
+STAGES_BY_NAME = {stage.name: stage for stage in FEATURE_STAGES}
+
+# Column -> name of the stage whose value survives to the output
+FINAL_PRODUCER = {col: stage.name for stage in FEATURE_STAGES for col in stage.produces}
+
+
+def plan_stages(columns: Optional[Iterable[str]] = None) -> list:
+    """
+    Return the FEATURE_STAGES (in pipeline order) needed to produce
+    `columns`, including the stages their inputs depend on.
+    None schedules every stage; unknown column names are ignored
+    (the predictor zero-fills them).
+    """
+    if columns is None:
+        return list(FEATURE_STAGES)
+
+    needed = set(columns)
+    plan = []
+    for stage in reversed(FEATURE_STAGES):
+        if needed.intersection(stage.produces):
+            plan.append(stage)
+            needed = (needed - set(stage.produces)) | set(stage.requires)
+    plan.reverse()
+    return plan
+
+
+def run_stages(store: dict, stages: Iterable[FeatureStage]) -> dict:
+    """
+    Run `stages` in order over a column store (dict of name -> array),
+    writing each node's outputs back into it. Overwritten columns keep
+    their original position, like DataFrame column assignment.
+    Each stage is timed as 'features.<stage name>' (see stage_metrics).
+    """
+    rows = len(store["close"]) if "close" in store else None
+    for stage in stages:
+        with measure(f"features.{stage.name}", rows) as sample:
+            out = stage.compute(store)
+            sample.nbytes = sum(getattr(v, "nbytes", 0) for v in out.values())
+        store.update(out)
+    return store
@@ -0,0 +1,100 @@
+# features/feature_schema.py
+
+import numpy as np
+import pandas as pd
+
+from training_features.feature_registry import FEATURE_STAGES
+from training_features.label_generator import LABEL_COLUMNS
+from training_features.session_calendar import MINUTE_LABEL
+
+# === Compact dtype policy for every feature / label column ===
+#
+#   0/1 flags and small counts  -> int8 (int16 for minute_of_day)
+#   trend_regime / time         -> categorical (fixed categories, so frames concat cleanly)
+#   date / symbol               -> categorical (categories inferred; a few values per frame)
+#   raw bar prices / volume/OI  -> float64 (tick precision at index levels needs > 7 digits)
+#   derived price levels        -> float64 (vwap, HVN levels, EMAs, label highs/lows: same scale)
+#   every other numeric feature -> float32 (ratios, distances, sizes; XGBoost evaluates in float32)
+
+FLAG_COLUMNS = (
+    "ema_filter_15",
+    "is_bullish", "is_bearish",
+    "volume_spike_flag", "rolling_oi_increase_flag", "rolling_oi_decrease_flag",
+    "price_oi_divergence_flag", "price_volume_oi_confluence_flag",
+    "price_up", "price_down",
+    "price_up_oi_up", "price_down_oi_up", "price_up_oi_down", "price_down_oi_down",
+    "above_vwap_flag", "expiry_week_flag",
+    "high_confidence_window", "no_trade_zone_flag", "is_alpha_hour",
+    "ema_50_15m_above_ema_200_15m", "ema_50_30m_above_ema_200_30m",
+    "long_label", "short_label",
+)
+
+SMALL_INT_COLUMNS = {
+    "hour": "int8",
+    "minute": "int8",
+    "weekday": "int8",
+    "minute_of_day": "int16",
+    "nearest_zone_strength": "int8",
+    "zone_cluster_strength": "int8",
+    "long_outcome": "int8",
+    "short_outcome": "int8",
+}
+
+TREND_REGIME_DTYPE = pd.CategoricalDtype(["downtrend", "range", "uptrend"])
+TIME_DTYPE = pd.CategoricalDtype(list(MINUTE_LABEL))
+
+RAW_FLOAT_COLUMNS = ("open", "high", "low", "close", "volume", "open_interest", "oi")
+
+# Absolute index levels (~50 000: float32 steps there are ~0.004)
+PRICE_LEVEL_COLUMNS = (
+    "tp", "vwap",
+    "dominant_hvn_above", "dominant_hvn_below", "whvn_above", "whvn_below",
+    "ema_50_15m", "ema_200_15m", "ema_50_30m", "ema_200_30m",
+    "future_max_high", "future_min_low",
+)
+
+# Columns kept as they are (bar keys)
+_UNTYPED = {"timestamp", "datetime"}
+
+FEATURE_DTYPES = {
+    **{col: "float32" for stage in FEATURE_STAGES for col in stage.produces},
+    **{col: "float32" for col in LABEL_COLUMNS},
+    **{col: "float64" for col in RAW_FLOAT_COLUMNS + PRICE_LEVEL_COLUMNS},
+    **{col: "int8" for col in FLAG_COLUMNS},
+    **SMALL_INT_COLUMNS,
+    "trend_regime": TREND_REGIME_DTYPE,
+    "time": TIME_DTYPE,
+    "date": pd.CategoricalDtype(),
+    "symbol": pd.CategoricalDtype(),
+}
+for _col in _UNTYPED:
+    FEATURE_DTYPES.pop(_col, None)
+
+
+def apply_feature_dtypes(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Cast known columns (in place) to FEATURE_DTYPES. Integer columns that
+    contain NaN fall back to float32; unknown columns are left alone.
+    """
+    for col in df.columns:
+        dtype = FEATURE_DTYPES.get(col)
+        if dtype is None or df[col].dtype == dtype:
+            continue
+        if isinstance(dtype, pd.CategoricalDtype):
+            df[col] = df[col].astype(dtype)
+            continue
+        values = pd.to_numeric(df[col], errors="coerce")
+        if np.dtype(dtype).kind == "i" and values.isna().any():
+            dtype = "float32"
+        df[col] = values.astype(dtype)
+    return df
+
+
+def sqlite_type(col: str) -> str:
+    """SQLite column declaration for a feature column."""
+    dtype = FEATURE_DTYPES.get(col)
+    if dtype is None or isinstance(dtype, pd.CategoricalDtype):
+        return "TEXT"
+    if np.dtype(dtype).kind == "i":
+        return "INTEGER DEFAULT 0" if col in FLAG_COLUMNS else "INTEGER"
+    return "REAL"
@@ -1,6 +1,46 @@
+import numpy as np
 import pandas as pd
 from typing import Optional, Union
 
+from stage_metrics import measure
+from training_features.session_calendar import ALPHA_MINUTES
+
+
+def engineered_columns(cols) -> dict:
+    """
+    Column-store node for add_feature_engineering.
+    `cols` maps column names to arrays (with a parsed 'datetime'); returns {new column: array}.
+    """
+    dt = pd.DatetimeIndex(np.asarray(cols['datetime']))
+    hour = dt.hour.to_numpy()
+    minute = dt.minute.to_numpy()
+    surge = np.asarray(cols['volume_surge_magnitude'], dtype=float)
+    # Minute of day, -1 where the timestamp is missing (not an alpha minute)
+    minute_of_day = np.nan_to_num(np.asarray(hour * 60 + minute, dtype=float), nan=-1).astype(np.int64)
+    valid = minute_of_day >= 0
+    is_alpha = np.zeros(len(minute_of_day), dtype=int)
+    is_alpha[valid] = ALPHA_MINUTES[minute_of_day[valid]]
+
+    return {
+        # Always create hour & minute
+        'hour': hour,
+        'minute': minute,
+        # Event Score
+        'event_score': (
+            np.asarray(cols['body_size'], dtype=float) *
+            surge *
+            np.asarray(cols['rolling_oi_increase_flag'])
+        ),
+        # No Trade Zone Flag
+        'no_trade_zone_flag': (
+            (np.asarray(cols['candle_range'], dtype=float) < 8) &
+            (surge < 1.1) &
+            (np.abs(np.asarray(cols['distance_from_vwap'], dtype=float)) < 5)
+        ).astype(int),
+        # Alpha Hour Flag
+        'is_alpha_hour': is_alpha,
+    }
+
 
 def add_feature_engineering(
     df_or_input: Union[pd.DataFrame, str],
@@ -19,12 +59,12 @@ def add_feature_engineering(
     Returns
     -------
     pd.DataFrame
-        The DataFrame with added features: 'hour', 'minute', 'event_score',
-        'no_trade_zone_flag', and 'is_alpha_hour'.
+        The DataFrame (modified in place when one is passed) with added features:
+        'hour', 'minute', 'event_score', 'no_trade_zone_flag', and 'is_alpha_hour'.
     """
-    # Load or copy DataFrame
+    # Use the DataFrame in place, or load it
     if isinstance(df_or_input, pd.DataFrame):
-        df = df_or_input.copy()
+        df = df_or_input
     else:
         # assume string path
         df = pd.read_csv(df_or_input)
@@ -45,39 +85,14 @@ def add_feature_engineering(
         else:
             raise KeyError("Cannot find datetime information in DataFrame or CSV.")
 
-    # Always create hour & minute
-    df['hour'] = df['datetime'].dt.hour
-    df['minute'] = df['datetime'].dt.minute
-
-    # Event Score
-    df['event_score'] = (
-        df['body_size'] *
-        df['volume_surge_magnitude'] *
-        df['rolling_oi_increase_flag']
-    )
-
-    # No Trade Zone Flag
-    df['no_trade_zone_flag'] = (
-        (df['candle_range'] < 8) &
-        (df['volume_surge_magnitude'] < 1.1) &
-        (df['distance_from_vwap'].abs() < 5)
-    ).astype(int)
-
-    # Alpha Hour Flag
-    df['is_alpha_hour'] = df.apply(
-        lambda row: (
-            (row['hour'] == 9   and row['minute'] >= 20) or
-            (row['hour'] == 10) or
-            (row['hour'] == 11  and row['minute'] <= 0) or
-            (row['hour'] == 13  and row['minute'] >= 30) or
-            (row['hour'] == 14)
-        ),
-        axis=1
-    ).astype(int)
+    # hour, minute, event_score, no_trade_zone_flag, is_alpha_hour
+    for name, values in engineered_columns(df).items():
+        df[name] = values
 
     # Save if path given
     if output_csv_path:
-        df.to_csv(output_csv_path, index=False)
+        with measure("features.csv_write", len(df)):
+            df.to_csv(output_csv_path, index=False)
         #print(f"✅ Features added and saved to {output_csv_path}")
 
     return df
@@ -1,7 +1,239 @@
 # features/hvn_engine.py
 
-import pandas as pd
-from collections import defaultdict
+import math
+from collections import deque
+
+import numpy as np
+
+HVN_COLUMNS = (
+    "dominant_hvn_above",
+    "dominant_hvn_below",
+    "whvn_above",
+    "whvn_below",
+    "distance_to_resistance",
+    "distance_to_support",
+)
+
+
+class RollingHVN:
+    """
+    Rolling price-volume profile over the last `window_size` bars.
+
+    Closes are bucketed to the nearest ₹1 (same rounding as the original
+    dict-based implementation). Each bucket keeps its volume, bar count and
+    the window positions it occurs at, so a bar entering or leaving the
+    window is a point update:
+        - a segment tree over bucket indexes answers "dominant bucket above /
+          below close" (highest volume, ties to the bucket seen first in the
+          window, exactly like the old stable sort)
+        - two Fenwick trees hold Σvolume and Σprice·volume for the weighted
+          HVN on either side of close
+    Every push/query is O(log buckets).
+
+    Streaming use:
+        engine = RollingHVN()
+        row = engine.push(close, volume)   # six HVN values for this bar
+    """
+
+    def __init__(self, window_size=1500, price_lo=None, price_hi=None):
+        self.window_size = window_size
+        self._window = deque()      # (bucket_index, volume, position)
+        self._pos = 0
+        self._lo = None
+        self._n = 0
+        if price_lo is not None and price_hi is not None:
+            self._allocate(int(price_lo), int(price_hi))
+
+    # ---------- storage ----------
+
+    def _allocate(self, lo, hi):
+        n = hi - lo + 1
+        size = 1
+        while size < n:
+            size *= 2
+        self._lo = lo
+        self._n = n
+        self._size = size
+        self._vol = [0.0] * n
+        self._count = [0] * n
+        self._first = [0] * n
+        self._positions = {}
+        self._best = [-1] * (2 * size)
+        self._fw_vol = [0.0] * (n + 1)
+        self._fw_pv = [0.0] * (n + 1)
+
+    def _ensure_range(self, price):
+        if self._lo is None:
+            self._allocate(price - 2048, price + 2048)
+            return
+        if self._lo <= price < self._lo + self._n:
+            return
+        # Grow the bucket range and replay the current window into it
+        lo = min(self._lo, price - 2048)
+        hi = max(self._lo + self._n - 1, price + 2048)
+        window = [(b + self._lo, v, p) for b, v, p in self._window]
+        self._allocate(lo, hi)
+        self._window = deque()
+        for price_b, vol, pos in window:
+            self._add(price_b - self._lo, vol, pos)
+
+    # ---------- point updates ----------
+
+    def _fenwick_add(self, i, dv, dpv):
+        i += 1
+        fw_vol, fw_pv, n = self._fw_vol, self._fw_pv, self._n
+        while i <= n:
+            fw_vol[i] += dv
+            fw_pv[i] += dpv
+            i += i & -i
+
+    def _fenwick_sum(self, i):
+        """Σ over buckets [0, i]."""
+        i += 1
+        sv = spv = 0.0
+        fw_vol, fw_pv = self._fw_vol, self._fw_pv
+        while i > 0:
+            sv += fw_vol[i]
+            spv += fw_pv[i]
+            i -= i & -i
+        return sv, spv
+
+    def _pick(self, a, b):
+        if a < 0:
+            return b
+        if b < 0:
+            return a
+        va, vb = self._vol[a], self._vol[b]
+        if va > vb:
+            return a
+        if vb > va:
+            return b
+        return a if self._first[a] < self._first[b] else b
+
+    def _refresh(self, i):
+        best = self._best
+        p = i + self._size
+        best[p] = i if self._count[i] else -1
+        p >>= 1
+        while p:
+            best[p] = self._pick(best[2 * p], best[2 * p + 1])
+            p >>= 1
+
+    def _add(self, i, vol, pos):
+        self._window.append((i, vol, pos))
+        self._vol[i] += vol
+        self._count[i] += 1
+        q = self._positions.get(i)
+        if q is None:
+            q = self._positions[i] = deque()
+        if not q:
+            self._first[i] = pos
+        q.append(pos)
+        self._fenwick_add(i, vol, (i + self._lo) * vol)
+        self._refresh(i)
+
+    def _evict(self):
+        i, vol, _ = self._window.popleft()
+        self._vol[i] -= vol
+        self._count[i] -= 1
+        q = self._positions[i]
+        q.popleft()
+        if q:
+            self._first[i] = q[0]
+        else:
+            self._vol[i] = 0.0
+        self._fenwick_add(i, -vol, -(i + self._lo) * vol)
+        self._refresh(i)
+
+    # ---------- queries ----------
+
+    def _dominant(self, l, r):
+        """Best bucket index in [l, r], or -1."""
+        best = self._best
+        res = -1
+        l += self._size
+        r += self._size + 1
+        while l < r:
+            if l & 1:
+                res = self._pick(res, best[l])
+                l += 1
+            if r & 1:
+                r -= 1
+                res = self._pick(res, best[r])
+            l >>= 1
+            r >>= 1
+        return res
+
+    def _side(self, l, r):
+        """(dominant price, weighted price) over bucket indexes [l, r]."""
+        l = max(l, 0)
+        r = min(r, self._n - 1)
+        if l > r:
+            return None, None
+        i = self._dominant(l, r)
+        if i < 0:
+            return None, None
+        sv, spv = self._fenwick_sum(r)
+        if l > 0:
+            sv0, spv0 = self._fenwick_sum(l - 1)
+            sv -= sv0
+            spv -= spv0
+        # numpy rounding, as the original rounded numpy scalars from iterrows()
+        weighted = float(np.round(spv / sv, 2)) if sv > 0 else None
+        return i + self._lo, weighted
+
+    def query(self, close):
+        """Six HVN values for `close` against the current window."""
+        if len(self._window) < self.window_size:
+            return (None,) * 6
+        dom_above, whvn_abv = self._side(math.floor(close) + 1 - self._lo, self._n - 1)
+        dom_below, whvn_blw = self._side(0, math.ceil(close) - 1 - self._lo)
+        dist_r = dom_above - close if dom_above is not None else None
+        dist_s = close - dom_below if dom_below is not None else None
+        return dom_above, dom_below, whvn_abv, whvn_blw, dist_r, dist_s
+
+    def push(self, close, volume):
+        """
+        Return the HVN values for this bar (computed from the preceding
+        `window_size` bars), then add the bar to the window.
+        """
+        row = self.query(close)
+        price = round(close)
+        self._ensure_range(price)
+        self._add(price - self._lo, volume, self._pos)
+        self._pos += 1
+        if len(self._window) > self.window_size:
+            self._evict()
+        return row
+
+
+def compute_rolling_hvn_arrays(close, volume, window_size=1500):
+    """
+    Batch mode: run RollingHVN over full-history numpy arrays.
+    Returns a dict of float64 arrays keyed by HVN_COLUMNS (NaN where undefined).
+    """
+    close = np.asarray(close, dtype=float)
+    volume = np.asarray(volume, dtype=float)
+    n = len(close)
+    out = np.full((6, n), np.nan)
+    if n > window_size:
+        buckets = np.round(close)
+        engine = RollingHVN(window_size, buckets.min(), buckets.max())
+        push = engine.push
+        for idx, (c, v) in enumerate(zip(close.tolist(), volume.tolist())):
+            row = push(c, v)
+            if idx >= window_size:
+                out[:, idx] = [np.nan if x is None else x for x in row]
+    return dict(zip(HVN_COLUMNS, out))
+
+
+def hvn_columns(cols, window_size=1500):
+    """
+    Column-store node for compute_rolling_hvn.
+    `cols` maps column names to arrays; returns {new column: array}.
+    """
+    return compute_rolling_hvn_arrays(np.asarray(cols["close"]), np.asarray(cols["volume"]), window_size)
+
 
 def compute_rolling_hvn(df, window_size=1500):
     """
@@ -12,69 +244,7 @@ def compute_rolling_hvn(df, window_size=1500):
         - distance_to_resistance
         - distance_to_support
     """
-    dominant_above = []
-    dominant_below = []
-    weighted_above = []
-    weighted_below = []
-    dist_res = []
-    dist_sup = []
-
-    for idx in range(len(df)):
-        if idx < window_size:
-            # Not enough data to compute HVNs
-            dominant_above.append(None)
-            dominant_below.append(None)
-            weighted_above.append(None)
-            weighted_below.append(None)
-            dist_res.append(None)
-            dist_sup.append(None)
-            continue
-
-        window = df.iloc[idx - window_size:idx]
-        close = df.iloc[idx]["close"]
-
-        # Price-volume map rounded to nearest ₹1
-        price_volume = defaultdict(float)
-        for _, row in window.iterrows():
-            price = round(row["close"])
-            price_volume[price] += row["volume"]
-
-        # Sort by volume
-        sorted_hvns = sorted(price_volume.items(), key=lambda x: x[1], reverse=True)
-
-        # Separate above/below HVNs
-        hvn_above = [(p, v) for p, v in sorted_hvns if p > close]
-        hvn_below = [(p, v) for p, v in sorted_hvns if p < close]
-
-        # Dominant HVN (highest volume)
-        dom_above = hvn_above[0][0] if hvn_above else None
-        dom_below = hvn_below[0][0] if hvn_below else None
-
-        # Weighted HVN
-        def weighted(hvns):
-            total_vol = sum(v for _, v in hvns)
-            return round(sum(p * v for p, v in hvns) / total_vol, 2) if total_vol > 0 else None
-
-        whvn_abv = weighted(hvn_above)
-        whvn_blw = weighted(hvn_below)
-
-        # Distances
-        dist_r = dom_above - close if dom_above is not None else None
-        dist_s = close - dom_below if dom_below is not None else None
-
-        # Append all
-        dominant_above.append(dom_above)
-        dominant_below.append(dom_below)
-        weighted_above.append(whvn_abv)
-        weighted_below.append(whvn_blw)
-        dist_res.append(dist_r)
-        dist_sup.append(dist_s)
-
-    df["dominant_hvn_above"] = dominant_above
-    df["dominant_hvn_below"] = dominant_below
-    df["whvn_above"] = weighted_above
-    df["whvn_below"] = weighted_below
-    df["distance_to_resistance"] = dist_res
-    df["distance_to_support"] = dist_sup
+    for name, values in hvn_columns(df, window_size).items():
+        df[name] = values
 
     return df
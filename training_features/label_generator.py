@@ -0,0 +1,162 @@
+# features/label_generator.py
+
+import numpy as np
+import pandas as pd
+
+from training_features.session_calendar import MINUTES_PER_DAY, minute_index
+
+LABEL_COLUMNS = (
+    "future_max_high",
+    "future_min_low",
+    "long_outcome",
+    "short_outcome",
+    "long_label",
+    "short_label",
+    "max_profit_next_6",
+)
+
+# Bars ahead used for max_profit_next_6 (read by option_pl_simulator)
+PROFIT_WINDOW = 6
+
+
+def _session_ids(cols, n) -> np.ndarray:
+    """Trading-day id per row (from 'datetime' or 'timestamp'); one session if neither exists."""
+    for col in ("datetime", "timestamp"):
+        if col in cols:
+            return minute_index(pd.to_datetime(np.asarray(cols[col]))) // MINUTES_PER_DAY
+    return np.zeros(n, dtype=np.int64)
+
+
+def _pad_sessions(session, width):
+    """
+    Positions of each row in a padded layout where every session is
+    followed by `width` empty slots, so a forward window never crosses
+    into the next session. Returns (positions, padded length).
+    """
+    new_session = np.ones(len(session), dtype=bool)
+    new_session[1:] = session[1:] != session[:-1]
+    sid = np.cumsum(new_session) - 1
+    pos = np.arange(len(session)) + sid * width
+    n_sessions = int(sid[-1]) + 1 if len(sid) else 0
+    return pos, len(session) + n_sessions * width
+
+
+def _padded(values, pos, size, fill):
+    out = np.full(size, fill)
+    out[pos] = values
+    return out
+
+
+def _sliding_max(a, width):
+    """
+    out[s] = max(a[s:s + width]) for every full window, in O(n) regardless
+    of width (van Herk / Gil-Werman: block prefix and suffix maxima, the
+    array form of the monotonic-deque sliding maximum). NaN is ignored.
+    """
+    n = len(a)
+    m = -(-n // width) * width
+    blocks = np.full(m, -np.inf)
+    blocks[:n] = a
+    blocks = blocks.reshape(-1, width)
+    prefix = np.fmax.accumulate(blocks, axis=1).ravel()
+    suffix = np.fmax.accumulate(blocks[:, ::-1], axis=1)[:, ::-1].ravel()
+    starts = np.arange(n - width + 1)
+    return np.fmax(suffix[starts], prefix[starts + width - 1])
+
+
+def _forward_max(padded, pos, width):
+    """Max over the next `width` bars of the same session (NaN when there are none)."""
+    out = _sliding_max(padded, width)[pos + 1]
+    out[np.isneginf(out)] = np.nan
+    return out
+
+
+def _first_touch(padded, level, width, above):
+    """
+    Bars ahead (1..width) until `padded` first reaches `level` (both in the
+    padded layout), 0 if never. Offsets run from far to near so the
+    nearest hit is written last; each pass is a contiguous slice compare.
+    """
+    m = len(padded) - width
+    first = np.zeros(m, dtype=np.int8)
+    base = level[:m]
+    for k in range(width, 0, -1):
+        ahead = padded[k:k + m]
+        hit = ahead >= base if above else ahead <= base
+        np.copyto(first, k, where=hit)
+    return first
+
+
+def _outcome(tp_at, sl_at):
+    """+1 if TP is touched first, -1 if SL is (a bar touching both counts as SL), 0 if neither."""
+    tp_first = (tp_at > 0) & ((sl_at == 0) | (tp_at < sl_at))
+    sl_first = (sl_at > 0) & ((tp_at == 0) | (sl_at <= tp_at))
+    return np.select([tp_first, sl_first], [1, -1], 0)
+
+
+def label_columns(cols, sl_percent, future_window, tp_percent=None) -> dict:
+    """
+    Forward-looking labels for every bar; `cols` maps column names to
+    arrays ('high', 'low', 'close', plus 'datetime'/'timestamp' for sessions).
+    Windows never look past the bar's own session close.
+    """
+    high = np.asarray(cols["high"], dtype=float)
+    low = np.asarray(cols["low"], dtype=float)
+    close = np.asarray(cols["close"], dtype=float)
+    tp_percent = sl_percent if tp_percent is None else tp_percent
+
+    width = max(future_window, PROFIT_WINDOW)
+    pos, size = _pad_sessions(_session_ids(cols, len(close)), width)
+    high_p = _padded(high, pos, size, -np.inf)
+    low_p = _padded(low, pos, size, np.inf)
+
+    # === Forward extremes (sliding window over the padded layout)
+    future_max_high = _forward_max(high_p, pos, future_window)
+    future_min_low = -_forward_max(-low_p, pos, future_window)
+
+    # === First-touch TP/SL within the window, entering at this bar's close
+    up_tp = _padded(close * (1 + tp_percent), pos, size, np.nan)
+    down_sl = _padded(close * (1 - sl_percent), pos, size, np.nan)
+    down_tp = _padded(close * (1 - tp_percent), pos, size, np.nan)
+    up_sl = _padded(close * (1 + sl_percent), pos, size, np.nan)
+    long_outcome = _outcome(
+        _first_touch(high_p, up_tp, future_window, above=True)[pos],
+        _first_touch(low_p, down_sl, future_window, above=False)[pos],
+    )
+    short_outcome = _outcome(
+        _first_touch(low_p, down_tp, future_window, above=False)[pos],
+        _first_touch(high_p, up_sl, future_window, above=True)[pos],
+    )
+
+    return {
+        "future_max_high": future_max_high,
+        "future_min_low": future_min_low,
+        "long_outcome": long_outcome,
+        "short_outcome": short_outcome,
+        "long_label": (long_outcome == 1).astype(int),
+        "short_label": (short_outcome == 1).astype(int),
+        # Best long excursion (futures points) over the next 6 bars
+        "max_profit_next_6": _forward_max(high_p, pos, PROFIT_WINDOW) - close,
+    }
+
+
+def generate_labels(df, sl_percent=0.002, future_window=15, tp_percent=None):
+    """
+    Adds long/short training labels from the next `future_window` bars of
+    the same session (rows must be in time order).
+
+    A long (short) trade enters at the bar's close with TP at
+    +tp_percent (-tp_percent) and SL at -sl_percent (+sl_percent);
+    tp_percent defaults to sl_percent (1R).
+
+    Returns:
+        pd.DataFrame with new columns (added in place):
+            - future_max_high / future_min_low
+            - long_outcome / short_outcome  (+1 = TP first, -1 = SL first, 0 = neither)
+            - long_label / short_label      (1 = TP first)
+            - max_profit_next_6
+    """
+    for name, values in label_columns(df, sl_percent, future_window, tp_percent).items():
+        df[name] = values
+
+    return df
@@ -3,48 +3,63 @@
 import numpy as np
 import pandas as pd
 
-def add_meta_quality_flags(df):
+def _numeric(cols, col, n):
+    """Column as a float array (all NaN if missing)."""
+    if col not in cols:
+        return np.full(n, np.nan)
+    return pd.to_numeric(pd.Series(np.asarray(cols[col])), errors="coerce").to_numpy(dtype=float)
+
+
+def meta_columns(cols):
     """
-    Adds high-confidence trade quality flags & meta features.
-    Works in both strict and relaxed modes.
+    Column-store node for add_meta_quality_flags.
+    `cols` maps column names to arrays; returns {new column: array}.
     """
-    # === Volume spike confirmation
-    df["volume_spike"] = df["volume"] / df["rolling_avg_vol_10"].replace(0, np.nan)
+    volume = np.asarray(cols["volume"], dtype=float)
+    n = len(volume)
 
-    # === Delta volume signal (simplified logic)
-    df["delta_volume_sign"] = np.sign(df["volume_spike"] - 1)
+    # === Volume spike confirmation
+    avg_vol_10 = np.asarray(cols["rolling_avg_vol_10"], dtype=float)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        volume_spike = volume / np.where(avg_vol_10 == 0, np.nan, avg_vol_10)
 
     # === R/R ratio estimate (based on HVN levels)
-    def compute_rr(row):
-        if (
-            pd.notna(row.get("distance_to_resistance")) and
-            pd.notna(row.get("distance_to_support")) and
-            row["distance_to_support"] != 0
-        ):
-            return round(row["distance_to_resistance"] / row["distance_to_support"], 2)
-        return None
-
-    df["rr_ratio_estimate"] = df.apply(compute_rr, axis=1)
+    dist_res = _numeric(cols, "distance_to_resistance", n)
+    dist_sup = _numeric(cols, "distance_to_support", n)
+    valid = ~np.isnan(dist_res) & ~np.isnan(dist_sup) & (dist_sup != 0)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        rr = np.where(valid, np.round(dist_res / dist_sup, 2), np.nan)
 
     # === SR Cluster strength: count how many HVNs are close to current price
-    def compute_zone_strength(row):
-        close = row.get("close")
-        zones = [row.get("dominant_hvn_above"), row.get("dominant_hvn_below"),
-                 row.get("whvn_above"), row.get("whvn_below")]
-        count = sum(
-            1 for z in zones
-            if pd.notna(z) and abs(z - close) <= 50  # within ₹50 proximity
-        )
-        return count
-
-    df["zone_cluster_strength"] = df.apply(compute_zone_strength, axis=1)
-
-    # === High confidence filter (relaxed logic)
-    df["high_confidence_window"] = (
-        (df["volume_spike"] > 1.5) &
-        (df["oi_change"] > 0) &
-        (df["rr_ratio_estimate"] > 2.0) &
-        (df["zone_cluster_strength"] >= 2)
-    ).astype(int)
+    close = _numeric(cols, "close", n)
+    zones = ("dominant_hvn_above", "dominant_hvn_below", "whvn_above", "whvn_below")
+    zone_strength = sum(
+        (np.abs(_numeric(cols, z, n) - close) <= 50).astype(int)  # within ₹50 proximity
+        for z in zones
+    )
+
+    return {
+        "volume_spike": volume_spike,
+        # === Delta volume signal (simplified logic)
+        "delta_volume_sign": np.sign(volume_spike - 1),
+        "rr_ratio_estimate": rr,
+        "zone_cluster_strength": zone_strength,
+        # === High confidence filter (relaxed logic)
+        "high_confidence_window": (
+            (volume_spike > 1.5) &
+            (np.asarray(cols["oi_change"], dtype=float) > 0) &
+            (rr > 2.0) &
+            (zone_strength >= 2)
+        ).astype(int),
+    }
+
+
+def add_meta_quality_flags(df):
+    """
+    Adds high-confidence trade quality flags & meta features.
+    Works in both strict and relaxed modes.
+    """
+    for name, values in meta_columns(df).items():
+        df[name] = values
 
     return df
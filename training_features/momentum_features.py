@@ -14,6 +14,14 @@ def calculate_macd_histogram(df: pd.DataFrame) -> pd.Series:
     histogram = macd - signal
     return histogram.rename('macd_histogram_30m')
 
+def momentum_columns(cols):
+    """
+    Column-store node for add_momentum_features.
+    `cols` maps column names to arrays; returns {new column: array}.
+    """
+    close = pd.Series(np.asarray(cols['close']))
+    return {'macd_histogram_30m': calculate_macd_histogram(close.to_frame('close')).to_numpy()}
+
 # ==== NEW: Main Aggregator Function for Momentum Features ====
 
 def add_momentum_features(df):
@@ -22,6 +30,6 @@ def add_momentum_features(df):
     """
 
     # Example: Add MACD Histogram (can extend later for RSI, Stochastic, etc.)
-    df['macd_histogram_30m'] = calculate_macd_histogram(df)
+    df['macd_histogram_30m'] = momentum_columns(df)['macd_histogram_30m']
 
     return df
@@ -1,7 +1,38 @@
 # features/open_interest.py
 
+import numpy as np
 import pandas as pd
 
+
+def oi_columns(cols):
+    """
+    Column-store node for add_oi_features.
+    `cols` maps column names to arrays; returns {new column: array}.
+    """
+    oi = pd.Series(np.asarray(cols["oi"]))
+    close = np.asarray(cols["close"])
+    open_ = np.asarray(cols["open"])
+
+    # OI changes
+    oi_change = oi.diff().to_numpy()
+
+    # Price direction
+    price_up = (close > open_).astype(int)
+    price_down = (close < open_).astype(int)
+
+    return {
+        "oi_change": oi_change,
+        "oi_change_5": oi.diff(periods=5).to_numpy(),
+        "price_up": price_up,
+        "price_down": price_down,
+        # Behavior flags
+        "price_up_oi_up": ((price_up == 1) & (oi_change > 0)).astype(int),       # Long buildup
+        "price_down_oi_up": ((price_down == 1) & (oi_change > 0)).astype(int),   # Short buildup
+        "price_up_oi_down": ((price_up == 1) & (oi_change < 0)).astype(int),     # Short covering
+        "price_down_oi_down": ((price_down == 1) & (oi_change < 0)).astype(int), # Long unwinding
+    }
+
+
 def add_oi_features(df):
     """
     Adds open interest (OI) based features to detect build-up and unwinding activity.
@@ -18,22 +49,9 @@ def add_oi_features(df):
         df (pd.DataFrame): Must contain 'oi', 'close', 'open'
 
     Returns:
-        pd.DataFrame: With new OI-related features added
+        pd.DataFrame: With new OI-related features added (in place)
     """
-    df = df.copy()
-
-    # OI changes
-    df["oi_change"] = df["oi"].diff()
-    df["oi_change_5"] = df["oi"].diff(periods=5)
-
-    # Price direction
-    df["price_up"] = (df["close"] > df["open"]).astype(int)
-    df["price_down"] = (df["close"] < df["open"]).astype(int)
-
-    # Behavior flags
-    df["price_up_oi_up"] = ((df["price_up"] == 1) & (df["oi_change"] > 0)).astype(int)       # Long buildup
-    df["price_down_oi_up"] = ((df["price_down"] == 1) & (df["oi_change"] > 0)).astype(int)   # Short buildup
-    df["price_up_oi_down"] = ((df["price_up"] == 1) & (df["oi_change"] < 0)).astype(int)     # Short covering
-    df["price_down_oi_down"] = ((df["price_down"] == 1) & (df["oi_change"] < 0)).astype(int) # Long unwinding
+    for name, values in oi_columns(df).items():
+        df[name] = values
 
     return df
@@ -1,5 +1,6 @@
 # features/option_pl_simulator.py
 
+import numpy as np
 import pandas as pd
 
 def simulate_option_pl(df, delta=0.5, lot_size=15, sl_points=30, r_multiplier=3):
@@ -31,8 +32,11 @@ def simulate_option_pl(df, delta=0.5, lot_size=15, sl_points=30, r_multiplier=3)
     df["option_loss_SL"] = -sl_points * delta * lot_size
 
     # Final outcome flag (+1 = 3R hit, -1 = SL hit, 0 = undecided)
-    df["expected_3R_profit"] = df["max_profit_next_6"].apply(
-        lambda x: 1 if x >= target_fut else (-1 if x <= -sl_points else 0)
+    max_profit = df["max_profit_next_6"].to_numpy()
+    df["expected_3R_profit"] = np.select(
+        [max_profit >= target_fut, max_profit <= -sl_points],
+        [1, -1],
+        0
     )
 
     # Net R multiple (realized result)
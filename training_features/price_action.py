@@ -1,14 +1,48 @@
 # features/price_action.py
 
+import numpy as np
 import pandas as pd
 
+
+def price_action_columns(cols):
+    """
+    Column-store node for add_price_action_features.
+    `cols` maps column names to arrays; returns {new column: array}.
+    """
+    o = np.asarray(cols["open"], dtype=float)
+    h = np.asarray(cols["high"], dtype=float)
+    l = np.asarray(cols["low"], dtype=float)
+    c = np.asarray(cols["close"], dtype=float)
+
+    # Basic candle shape features (fmax/fmin skip NaN like DataFrame.max)
+    body_size = np.abs(c - o)
+    candle_range = h - l
+    wick_top = h - np.fmax(o, c)
+    wick_bottom = np.fmin(o, c) - l
+    safe_range = np.where(candle_range == 0, 0.0001, candle_range)
+
+    return {
+        "body_size": body_size,
+        "candle_range": candle_range,
+        "wick_top": wick_top,
+        "wick_bottom": wick_bottom,
+        # Candle direction
+        "is_bullish": (c > o).astype(int),
+        "is_bearish": (c < o).astype(int),
+        "direction": c - o,
+        # Candle structure ratios
+        "body_ratio": body_size / safe_range,
+        "wick_ratio": (wick_top + wick_bottom) / safe_range,
+    }
+
+
 def add_price_action_features(df):
     """
     Adds price action features like body size, wick length, and direction.
     Assumes input DataFrame has at least: ['open', 'high', 'low', 'close']
 
     Returns:
-        pd.DataFrame with new columns:
+        pd.DataFrame with new columns (added in place):
             - body_size
             - wick_top
             - wick_bottom
@@ -19,21 +53,34 @@ def add_price_action_features(df):
             - body_ratio
             - wick_ratio
     """
-    df = df.copy()
-
-    # Basic candle shape features
-    df["body_size"] = abs(df["close"] - df["open"])
-    df["candle_range"] = df["high"] - df["low"]
-    df["wick_top"] = df["high"] - df[["open", "close"]].max(axis=1)
-    df["wick_bottom"] = df[["open", "close"]].min(axis=1) - df["low"]
-
-    # Candle direction
-    df["is_bullish"] = (df["close"] > df["open"]).astype(int)
-    df["is_bearish"] = (df["close"] < df["open"]).astype(int)
-    df["direction"] = df["close"] - df["open"]
-
-    # Candle structure ratios
-    df["body_ratio"] = df["body_size"] / df["candle_range"].replace(0, 0.0001)
-    df["wick_ratio"] = (df["wick_top"] + df["wick_bottom"]) / df["candle_range"].replace(0, 0.0001)
+    for name, values in price_action_columns(df).items():
+        df[name] = values
+
+    return df
+
+
+def atr_columns(cols, window=14):
+    """Column-store node for add_atr."""
+    h = np.asarray(cols["high"], dtype=float)
+    l = np.asarray(cols["low"], dtype=float)
+    c = np.asarray(cols["close"], dtype=float)
+
+    prev_close = np.empty_like(c)
+    prev_close[:1] = np.nan
+    prev_close[1:] = c[:-1]
+    true_range = np.fmax.reduce([h - l, np.abs(h - prev_close), np.abs(l - prev_close)])
+
+    return {"atr": pd.Series(true_range).rolling(window=window, min_periods=1).mean().to_numpy()}
+
+
+def add_atr(df, window=14):
+    """
+    Adds the average true range over `window` bars (min_periods=1).
+
+    Returns:
+        pd.DataFrame with new column:
+            - atr
+    """
+    df["atr"] = atr_columns(df, window)["atr"]
 
     return df
@@ -1,10 +1,210 @@
+import numpy as np
 import pandas as pd
 
+# Higher timeframes (minutes) and EMA spans tracked by the multi-timeframe cache
+TIMEFRAMES = (15, 30)
+EMA_SPANS = (50, 200)
+
+_OHLCV_AGG = {
+    "open": "first",
+    "high": "max",
+    "low": "min",
+    "close": "last",
+    "volume": "sum"
+}
+
+
+def multi_timeframe_column_names(timeframes=TIMEFRAMES, spans=EMA_SPANS) -> tuple:
+    """Feature columns produced per 1-min bar, e.g. ema_50_15m, ema_50_15m_above_ema_200_15m."""
+    fast, slow = spans[0], spans[-1]
+    names = []
+    for tf in timeframes:
+        names += [f"ema_{span}_{tf}m" for span in spans]
+        names.append(f"ema_{fast}_{tf}m_above_ema_{slow}_{tf}m")
+    return tuple(names)
+
+
+MULTI_TIMEFRAME_COLUMNS = multi_timeframe_column_names()
+
+
+def _minute_index(datetimes) -> np.ndarray:
+    """Minutes since the epoch; HTF candle index = minute // timeframe (bins start at midnight)."""
+    return np.asarray(datetimes, dtype="datetime64[ns]").astype("datetime64[m]").astype(np.int64)
+
+
+def _ewm_step(value, x, gap, alpha):
+    """
+    One pandas ewm(adjust=False) step over candle closes. `gap` empty
+    candles since the previous one decay the old weight, exactly as the
+    NaN rows of a resampled series do (ignore_na=False).
+    """
+    if value is None or value != value:
+        return x
+    if value == x:
+        return value
+    old_wt = (1.0 - alpha) ** (gap + 1)
+    return (old_wt * value + alpha * x) / (old_wt + alpha)
+
+
+class _TimeframeState:
+    """The partial candle of one higher timeframe plus its committed EMA states."""
+
+    __slots__ = ("minutes", "bin", "gap", "candle", "alphas", "emas")
+
+    def __init__(self, minutes, spans):
+        self.minutes = minutes
+        self.bin = None
+        self.gap = 0
+        self.candle = None
+        self.alphas = [2.0 / (span + 1.0) for span in spans]
+        self.emas = [None] * len(spans)
+
+    def update(self, minute, o, h, l, c, v) -> list:
+        b = minute // self.minutes
+        if self.bin is None or b != self.bin:
+            if self.candle is not None:
+                # Close the previous candle into the EMA states
+                close = self.candle[3]
+                self.emas = [
+                    _ewm_step(ema, close, self.gap, alpha)
+                    for ema, alpha in zip(self.emas, self.alphas)
+                ]
+                self.gap = b - self.bin - 1
+            self.bin = b
+            self.candle = [o, h, l, c, v]
+        else:
+            candle = self.candle
+            candle[1] = max(candle[1], h)
+            candle[2] = min(candle[2], l)
+            candle[3] = c
+            candle[4] += v
+
+        # EMAs as of this minute: committed state advanced by the partial candle
+        return [_ewm_step(ema, c, self.gap, alpha) for ema, alpha in zip(self.emas, self.alphas)]
+
+
+class MultiTimeframeAggregator:
+    """
+    Streaming 15m/30m bars and EMAs built from 1-min bars.
+
+    Keeps, per timeframe, only the current (partial) candle and the EMA
+    states of the candles already closed, so `update()` costs O(1) per
+    1-min bar and never resamples history. Values are "as of" the bar:
+    the partial candle counts with its latest close, which equals the
+    resampled candle value on the candle's last minute.
+    `multi_timeframe_columns()` is the batch equivalent.
+    """
+
+    def __init__(self, timeframes=TIMEFRAMES, spans=EMA_SPANS):
+        self.timeframes = tuple(timeframes)
+        self.spans = tuple(spans)
+        self.columns = multi_timeframe_column_names(self.timeframes, self.spans)
+        self._states = [_TimeframeState(tf, self.spans) for tf in self.timeframes]
+
+    def candle(self, timeframe) -> dict | None:
+        """Current partial candle of `timeframe` (start, open, high, low, close, volume)."""
+        state = self._states[self.timeframes.index(timeframe)]
+        if state.candle is None:
+            return None
+        start = pd.Timestamp(state.bin * timeframe, unit="m")
+        return dict(zip(("start", "open", "high", "low", "close", "volume"), [start, *state.candle]))
+
+    def update(self, ts, o, h, l, c, v) -> dict:
+        """Consume one 1-min bar (ascending `ts`) and return its MULTI_TIMEFRAME_COLUMNS."""
+        minute = int(pd.Timestamp(ts).value // 60_000_000_000)
+        values = []
+        for state in self._states:
+            emas = state.update(minute, o, h, l, c, v)
+            values += emas
+            values.append(int(emas[0] > emas[-1]))
+        return dict(zip(self.columns, values))
+
+
+def multi_timeframe_columns(cols, timeframes=TIMEFRAMES, spans=EMA_SPANS, carry=None, carry_at=None) -> dict:
+    """
+    Column-store node: batch MultiTimeframeAggregator over sorted 1-min bars.
+    `cols` maps column names to arrays ('datetime', 'close'); returns {new column: array}.
+
+    The EMA recursion runs once per closed candle; the per-minute "as of"
+    values are then one vectorized step from the previous candle's state.
+
+    For chunked runs pass a `carry` dict: its state (if any) is continued
+    from before the first row, and on return it holds the state after
+    row `carry_at - 1` (default: the last row).
+    """
+    close = np.asarray(cols["close"], dtype=float)
+    minute = _minute_index(cols["datetime"])
+    fast, slow = spans[0], spans[-1]
+    alphas = [2.0 / (span + 1.0) for span in spans]
+    out = {}
+
+    for tf in timeframes:
+        b = minute // tf
+        new_candle = np.ones(len(b), dtype=bool)
+        new_candle[1:] = b[1:] != b[:-1]
+        starts = np.flatnonzero(new_candle)
+        candle_id = np.cumsum(new_candle) - 1
+        candle_close = close[np.r_[starts[1:], len(b)] - 1]
+        gaps = np.zeros(len(starts), dtype=np.int64)
+        gaps[1:] = np.diff(b[starts]) - 1
+        gaps, candle_close = gaps.tolist(), candle_close.tolist()
+
+        # EMA states before the first candle: fresh, or resumed from `carry`
+        init = [None] * len(spans)
+        prior = carry.get(tf) if carry is not None else None
+        if prior is not None and len(b):
+            if b[0] == prior["bin"]:
+                init, gaps[0] = prior["emas"], prior["gap"]
+            else:
+                init = [_ewm_step(e, prior["close"], prior["gap"], a) for e, a in zip(prior["emas"], alphas)]
+                gaps[0] = int(b[0]) - prior["bin"] - 1
+
+        emas, prevs = {}, []
+        for span, alpha, value in zip(spans, alphas, init):
+            # State before each candle (NaN before the first)
+            prev = np.full(len(starts), np.nan)
+            if value is not None:
+                prev[0] = value
+            for i in range(len(starts) - 1):
+                value = _ewm_step(value, candle_close[i], gaps[i], alpha)
+                prev[i + 1] = value
+            prevs.append(prev)
+
+            p = prev[candle_id]
+            # Same scalar pow as _ewm_step so batch and streaming agree bit for bit
+            old_wt = np.array([(1.0 - alpha) ** (g + 1) for g in gaps])[candle_id]
+            with np.errstate(invalid="ignore"):
+                step = (old_wt * p + alpha * close) / (old_wt + alpha)
+            emas[span] = np.where(np.isnan(p), close, np.where(p == close, p, step))
+            out[f"ema_{span}_{tf}m"] = emas[span]
+
+        out[f"ema_{fast}_{tf}m_above_ema_{slow}_{tf}m"] = (emas[fast] > emas[slow]).astype(int)
+
+        last = (len(b) if carry_at is None else carry_at) - 1
+        if carry is not None and last >= 0:
+            cid = candle_id[last]
+            carry[tf] = {
+                "bin": int(b[last]),
+                "gap": gaps[cid],
+                "close": float(close[last]),
+                "emas": [None if np.isnan(prev[cid]) else float(prev[cid]) for prev in prevs],
+            }
+
+    return out
+
+
+def _closed_candles(df_1m: pd.DataFrame, minutes: int) -> pd.DataFrame:
+    """OHLCV candles of `minutes`, labelled by start time; empty candles are skipped."""
+    start = (_minute_index(df_1m.index) // minutes) * minutes
+    labels = pd.DatetimeIndex(start.astype("datetime64[m]"), name=df_1m.index.name)
+    return df_1m.groupby(labels, sort=True).agg(_OHLCV_AGG).dropna()
+
+
 def resample_all_timeframes(df_1m: pd.DataFrame) -> dict:
     """
     Resamples 1-minute OHLCV data to 15-minute and 30-minute intervals.
-    
-    Assumes df_1m has datetime index and columns: 
+
+    Assumes df_1m has datetime index and columns:
     ['open', 'high', 'low', 'close', 'volume']
 
     Returns:
@@ -14,24 +214,8 @@ def resample_all_timeframes(df_1m: pd.DataFrame) -> dict:
             "30m": 30-minute resampled OHLCV DataFrame
         }
     """
-    df_15m = df_1m.resample("15T").agg({
-        "open": "first",
-        "high": "max",
-        "low": "min",
-        "close": "last",
-        "volume": "sum"
-    }).dropna()
-
-    df_30m = df_1m.resample("30T").agg({
-        "open": "first",
-        "high": "max",
-        "low": "min",
-        "close": "last",
-        "volume": "sum"
-    }).dropna()
-
     return {
         "1m": df_1m,
-        "15m": df_15m,
-        "30m": df_30m
+        "15m": _closed_candles(df_1m, 15),
+        "30m": _closed_candles(df_1m, 30)
     }
@@ -0,0 +1,134 @@
+# features/session_calendar.py
+
+import logging
+from datetime import date, timedelta
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+from trade_config import TradeConfig
+
+log = logging.getLogger(__name__)
+
+# === Minute-of-day lookups (index = hour * 60 + minute) ===
+MINUTES_PER_DAY = 24 * 60
+MINUTE_HOUR = (np.arange(MINUTES_PER_DAY) // 60).astype(np.int32)
+MINUTE_MINUTE = (np.arange(MINUTES_PER_DAY) % 60).astype(np.int32)
+MINUTE_OF_DAY = np.arange(MINUTES_PER_DAY, dtype=np.int32)
+MINUTE_LABEL = np.array([f"{m // 60:02d}:{m % 60:02d}" for m in range(MINUTES_PER_DAY)], dtype=object)
+
+# Alpha hours by minute of day: 09:20–11:00 and 13:30–14:59
+ALPHA_MINUTES = np.zeros(MINUTES_PER_DAY, dtype=bool)
+ALPHA_MINUTES[9 * 60 + 20: 11 * 60 + 1] = True
+ALPHA_MINUTES[13 * 60 + 30: 15 * 60] = True
+
+_EPOCH = date(1970, 1, 1)
+
+
+def minute_index(datetimes) -> np.ndarray:
+    """Minutes since the epoch for an array of datetimes (naive, exchange time); NaT -> NAT_MINUTE."""
+    return np.asarray(datetimes, dtype="datetime64[ns]").astype("datetime64[m]").astype(np.int64)
+
+
+# minute_index / day numbers of NaT
+NAT_MINUTE = np.iinfo(np.int64).min
+
+
+def mask_invalid(values: np.ndarray, valid: np.ndarray) -> np.ndarray:
+    """`values` with the rows where `valid` is False set to NaN (None for labels)."""
+    if valid.all():
+        return values
+    out = values.astype(float) if values.dtype.kind in "iub" else values.astype(object)
+    out[~valid] = np.nan if out.dtype.kind == "f" else None
+    return out
+
+
+def _load_holidays(path) -> list:
+    """
+    Exchange holidays, one 'YYYY-MM-DD' per line (first CSV column). The
+    file is not shipped: without it no day is a holiday, so an expiry that
+    falls on a holiday is not moved to the previous trading day.
+    """
+    try:
+        dates = pd.read_csv(path, header=None, comment="#").iloc[:, 0]
+    except (FileNotFoundError, pd.errors.EmptyDataError):
+        log.warning("No market holidays listed in %s; expiry dates are not holiday-adjusted", path)
+        return []
+    return list(pd.to_datetime(dates, errors="coerce").dropna().dt.date)
+
+
+class SessionCalendar:
+    """
+    Per-date session facts over a fixed range of days, filled once:
+        - weekday (0=Monday)
+        - holiday (exchange holiday listed in MARKET_HOLIDAYS_CSV)
+        - expiry_day: the month's actual monthly expiry — last expiry
+          weekday of the month, moved back to the previous trading day
+          when that is a holiday
+        - is_expiry_day / expiry_week_flag (Monday of the expiry week
+          up to and including the expiry day)
+    Lookups take day numbers (days since 1970-01-01) and are pure
+    integer indexing.
+    """
+
+    def __init__(
+        self,
+        start: str = "2000-01-01",
+        end: str = "2040-12-31",
+        holidays=(),
+        expiry_weekdays=TradeConfig.EXPIRY_WEEKDAYS
+    ):
+        self.first_day = (date.fromisoformat(start) - _EPOCH).days
+        last_day = (date.fromisoformat(end) - _EPOCH).days
+        days = np.arange(self.first_day, last_day + 1)
+
+        # 1970-01-01 was a Thursday
+        self.weekday = ((days + 3) % 7).astype(np.int32)
+        holiday_days = [(d - _EPOCH).days for d in holidays]
+        self.holiday = np.isin(days, holiday_days).astype(np.int8)
+        trading = (self.weekday < 5) & (self.holiday == 0)
+
+        rules = sorted((date.fromisoformat(since), weekday) for since, weekday in expiry_weekdays)
+        dates = days.astype("datetime64[D]")
+        month_start = dates.astype("datetime64[M]")
+
+        self.expiry_day = np.zeros(len(days), dtype=np.int64)
+        for month in np.unique(month_start):
+            in_month = np.flatnonzero(month_start == month)
+            month_first = month.astype("datetime64[D]").astype(object)
+            expiry_weekday = next(
+                (wd for since, wd in reversed(rules) if since <= month_first), rules[0][1]
+            )
+            candidates = in_month[self.weekday[in_month] == expiry_weekday]
+            i = candidates[-1]
+            while i > in_month[0] and not trading[i]:
+                i -= 1
+            self.expiry_day[in_month] = days[i]
+
+        self.is_expiry_day = (days == self.expiry_day).astype(np.int8)
+        expiry_monday = self.expiry_day - self.weekday[self.expiry_day - self.first_day]
+        self.expiry_week_flag = ((days >= expiry_monday) & (days <= self.expiry_day)).astype(np.int64)
+
+    def index(self, day_numbers) -> np.ndarray:
+        """Row positions for day numbers; raises if a day is outside the calendar (mask NaT first)."""
+        idx = np.asarray(day_numbers, dtype=np.int64) - self.first_day
+        if idx.size and (idx.min() < 0 or idx.max() >= len(self.weekday)):
+            raise ValueError("date outside the session calendar range")
+        return idx
+
+    def day_info(self, day: date) -> dict:
+        """Calendar facts for one date (used by the streaming engine once per day)."""
+        i = int(self.index((day - _EPOCH).days))
+        return {
+            "weekday": int(self.weekday[i]),
+            "holiday": int(self.holiday[i]),
+            "expiry_week_flag": int(self.expiry_week_flag[i]),
+            "is_expiry_day": int(self.is_expiry_day[i]),
+            "expiry_date": _EPOCH + timedelta(days=int(self.expiry_day[i])),
+        }
+
+
+@lru_cache(maxsize=1)
+def get_session_calendar() -> SessionCalendar:
+    """Process-wide calendar, built on first use."""
+    return SessionCalendar(holidays=_load_holidays(TradeConfig.MARKET_HOLIDAYS_CSV))
@@ -0,0 +1,334 @@
+# features/streaming_engine.py
+
+import math
+from collections import deque
+
+import numpy as np
+import pandas as pd
+
+from training_features.feature_registry import STAGES_BY_NAME
+from training_features.feature_schema import apply_feature_dtypes
+from training_features.hvn_engine import RollingHVN
+from training_features.resample_manager import MultiTimeframeAggregator
+from training_features.session_calendar import ALPHA_MINUTES, MINUTE_LABEL, get_session_calendar
+from training_features.vwap_utils import VWAPAccumulator
+
+_NAN = float("nan")
+
+
+def _div(a, b):
+    """a / b with numpy semantics (x/0 -> ±inf, 0/0 -> NaN) instead of raising."""
+    if b == 0:
+        if a == 0 or math.isnan(a):
+            return _NAN
+        return math.copysign(math.inf, a) * math.copysign(1.0, b)
+    return a / b
+
+
+def _sign(x):
+    if x > 0:
+        return 1.0
+    if x < 0:
+        return -1.0
+    return x  # 0.0 or NaN, like np.sign
+
+
+def _diff(hist, periods):
+    """hist[-1] - hist[-1 - periods], NaN while history is too short."""
+    if len(hist) > periods:
+        return hist[-1] - hist[-1 - periods]
+    return _NAN
+
+
+class _Ewm:
+    """EWM(span, adjust=False) accumulator using pandas' own update formula."""
+
+    __slots__ = ("alpha", "old_wt", "value")
+
+    def __init__(self, span):
+        self.alpha = 2.0 / (span + 1.0)
+        self.old_wt = 1.0 - self.alpha
+        self.value = None
+
+    def update(self, x):
+        if self.value is None:
+            self.value = x
+        else:
+            self.value = (self.old_wt * self.value + self.alpha * x) / (self.old_wt + self.alpha)
+        return self.value
+
+
+class _RollingMean:
+    """rolling(window, min_periods).mean() over a ring buffer."""
+
+    __slots__ = ("buf", "min_periods")
+
+    def __init__(self, window, min_periods=None):
+        self.buf = deque(maxlen=window)
+        self.min_periods = window if min_periods is None else min_periods
+
+    def update(self, x):
+        self.buf.append(x)
+        n = len(self.buf)
+        return sum(self.buf) / n if n >= self.min_periods else _NAN
+
+
+class StreamingFeatureEngine:
+    """
+    Per-bar equivalent of feature_generator.build_features (plus the
+    ema_filter_15 regime flag).
+
+    Holds the rolling state every feature family needs across cycles:
+        - ring buffers for ATR14, 10/20-bar means, diff(5/15), 30-bar
+          support/resistance and the 5-bar delta-volume sum
+        - EWM accumulators for MACD(12/26/9) and EMA20/EMA50
+        - the daily VWAPAccumulator
+        - the 1500-bar RollingHVN profile
+        - the partial 15m/30m candles and their EMA50/EMA200 states
+    so each new bar costs one `update()` call and no history reads.
+
+    Feed history once with `warm_up()`, then call `update()` for each new
+    bar. Rows match a full-history batch run, except the random
+    placeholder 'nearest_zone_strength'. Pass `stages` (e.g. from
+    feature_registry.plan_stages) to compute only those families.
+    """
+
+    def __init__(self, hvn_window=1500, stages=None):
+        # Stage names (see feature_registry) to compute; None = all
+        self.stages = frozenset(stages) if stages is not None else frozenset(STAGES_BY_NAME)
+        self.last_timestamp = None
+        self._prev_close = None
+
+        self._tr = _RollingMean(14, min_periods=1)
+        self._vol20 = _RollingMean(20, min_periods=1)
+        self._close20 = _RollingMean(20, min_periods=1)
+        self._vol10 = _RollingMean(10)
+        self._delta5 = deque(maxlen=5)
+        self._low30 = deque(maxlen=30)
+        self._high30 = deque(maxlen=30)
+
+        self._closes = deque(maxlen=16)
+        self._vols = deque(maxlen=6)
+        self._ois = deque(maxlen=6)
+
+        self._vwap = VWAPAccumulator()
+
+        self._hvn = RollingHVN(hvn_window)
+
+        self._mtf = MultiTimeframeAggregator()
+
+        self._calendar = get_session_calendar()
+        self._day = None
+        self._day_info = None
+
+        self._ema12 = _Ewm(12)
+        self._ema26 = _Ewm(26)
+        self._macd_signal = _Ewm(9)
+        self._ema20 = _Ewm(20)
+        self._ema50 = _Ewm(50)
+
+    def warm_up(self, bars: pd.DataFrame) -> None:
+        """Replay historical bars (ascending) to build state, discarding rows."""
+        for bar in bars.to_dict("records"):
+            self.update(bar)
+
+    def update_frame(self, bars: pd.DataFrame) -> pd.DataFrame:
+        """Run `update()` over each bar of `bars` and return the feature rows (schema dtypes)."""
+        return apply_feature_dtypes(pd.DataFrame([self.update(bar) for bar in bars.to_dict("records")]))
+
+    def update(self, bar: dict) -> dict:
+        """
+        Consume one 1-min bar (keys as in the 'bars' table) and return its
+        feature row, with columns in build_features order.
+        """
+        row = dict(bar)
+        o, h, l, c = float(row["open"]), float(row["high"]), float(row["low"]), float(row["close"])
+        v = float(row["volume"])
+
+        # EMA20/EMA50 regime flag
+        row["ema_filter_15"] = int(self._ema20.update(c) > self._ema50.update(c))
+
+        # Align OI columns
+        if "oi" in row and "open_interest" not in row:
+            row["open_interest"] = row["oi"]
+        elif "open_interest" in row and "oi" not in row:
+            row["oi"] = row["open_interest"]
+        oi = float(row["open_interest"])
+
+        ts = pd.Timestamp(row["timestamp"])
+        row["datetime"] = ts
+        self.last_timestamp = ts
+
+        # Shared per-bar state (cheap, read by several families)
+        direction = c - o
+        body_size = abs(c - o)
+        candle_range = h - l
+        tp = (h + l + c) / 3
+        day = ts.date()
+        prev_close = self._prev_close
+        self._prev_close = c
+        self._closes.append(c)
+        self._vols.append(v)
+        self._ois.append(oi)
+        oi_change = _diff(self._ois, 1)
+        oi_change_5 = _diff(self._ois, 5)
+        stages = self.stages
+
+        # ATR(14)
+        if "atr" in stages:
+            if prev_close is None:
+                tr = h - l
+            else:
+                tr = max(h - l, abs(h - prev_close), abs(l - prev_close))
+            row["atr"] = self._tr.update(tr)
+
+        # Price action
+        if "price_action" in stages:
+            wick_top = h - max(o, c)
+            wick_bottom = min(o, c) - l
+            safe_range = candle_range if candle_range != 0 else 0.0001
+            row["body_size"] = body_size
+            row["candle_range"] = candle_range
+            row["wick_top"] = wick_top
+            row["wick_bottom"] = wick_bottom
+            row["is_bullish"] = int(c > o)
+            row["is_bearish"] = int(c < o)
+            row["direction"] = direction
+            row["body_ratio"] = body_size / safe_range
+            row["wick_ratio"] = (wick_top + wick_bottom) / safe_range
+
+        # Volume features
+        if "volume_features" in stages:
+            vol_mean20 = self._vol20.update(v)
+            surge = _div(v, vol_mean20)
+            price_change_5 = _diff(self._closes, 5)
+            volume_change_5 = _diff(self._vols, 5)
+            row["volume_spike_flag"] = int(v > vol_mean20 * 1.5)
+            row["volume_surge_magnitude"] = surge
+            row["oi_change_1min"] = oi_change
+            row["oi_change_5min"] = oi_change_5
+            row["rolling_oi_increase_flag"] = int(oi_change_5 > 0)
+            row["rolling_oi_decrease_flag"] = int(oi_change_5 < 0)
+            row["price_oi_divergence_flag"] = int(price_change_5 * oi_change_5 < 0)
+            row["price_volume_oi_confluence_flag"] = int(
+                _sign(price_change_5) == _sign(oi_change_5) and
+                _sign(price_change_5) == _sign(volume_change_5)
+            )
+
+        # Volume signals
+        if "volume_signals" in stages:
+            avg_vol_10 = self._vol10.update(v)
+            delta_volume = v * _sign(direction) if direction == direction else 0.0
+            self._delta5.append(delta_volume)
+            row["rolling_avg_vol_10"] = avg_vol_10
+            row["volume_spike"] = _div(v, 1.0 if avg_vol_10 == 0 else avg_vol_10)
+            row["direction"] = direction
+            row["delta_volume_sign"] = delta_volume
+            row["cum_delta_5"] = sum(self._delta5) if len(self._delta5) == 5 else _NAN
+
+        # Open interest
+        if "open_interest" in stages:
+            price_up = int(c > o)
+            price_down = int(c < o)
+            row["oi_change"] = oi_change
+            row["oi_change_5"] = oi_change_5
+            row["price_up"] = price_up
+            row["price_down"] = price_down
+            row["price_up_oi_up"] = int(price_up == 1 and oi_change > 0)
+            row["price_down_oi_up"] = int(price_down == 1 and oi_change > 0)
+            row["price_up_oi_down"] = int(price_up == 1 and oi_change < 0)
+            row["price_down_oi_down"] = int(price_down == 1 and oi_change < 0)
+
+        # Structure
+        if "structure" in stages:
+            self._low30.append(l)
+            self._high30.append(h)
+            row["distance_from_vwap"] = c - tp
+            row["distance_from_high_volume_node"] = c - self._close20.update(c)
+            row["support_distance"] = c - min(self._low30)
+            row["resistance_distance"] = max(self._high30) - c
+            row["nearest_zone_strength"] = int(np.random.randint(1, 5))
+
+        # Daily VWAP
+        if "vwap" in stages:
+            row["date"] = day
+            row["tp"] = tp
+            row.update(self._vwap.update(day, h, l, c, v))
+
+        # Rolling HVN
+        if "hvn" in stages:
+            dom_above, dom_below, whvn_above, whvn_below, dist_res, dist_sup = (
+                _NAN if x is None else x for x in self._hvn.push(c, v)
+            )
+            row["dominant_hvn_above"] = dom_above
+            row["dominant_hvn_below"] = dom_below
+            row["whvn_above"] = whvn_above
+            row["whvn_below"] = whvn_below
+            row["distance_to_resistance"] = dist_res
+            row["distance_to_support"] = dist_sup
+
+        # Time (session calendar looked up once per day)
+        hour, minute = ts.hour, ts.minute
+        minute_of_day = hour * 60 + minute
+        if "time" in stages:
+            if day != self._day:
+                self._day = day
+                self._day_info = self._calendar.day_info(day)
+            row["time"] = MINUTE_LABEL[minute_of_day]
+            row["hour"] = hour
+            row["minute"] = minute
+            row["minute_of_day"] = minute_of_day
+            row["expiry_week_flag"] = self._day_info["expiry_week_flag"]
+            row["weekday"] = self._day_info["weekday"]
+
+        # Momentum
+        if "momentum" in stages:
+            macd = self._ema12.update(c) - self._ema26.update(c)
+            row["macd_histogram_30m"] = macd - self._macd_signal.update(macd)
+
+        # Trend regime (15-bar slope, threshold 0.15)
+        if "trend" in stages:
+            trend_strength = _diff(self._closes, 15)
+            row["trend_strength"] = trend_strength
+            if trend_strength != trend_strength:
+                row["trend_regime"] = None
+            elif trend_strength > 0.15:
+                row["trend_regime"] = "uptrend"
+            elif trend_strength < -0.15:
+                row["trend_regime"] = "downtrend"
+            else:
+                row["trend_regime"] = "range"
+
+        # Meta quality flags (planning guarantees volume_signals and hvn ran)
+        if "meta" in stages:
+            volume_spike = _div(v, _NAN if avg_vol_10 == 0 else avg_vol_10)
+            rr = _NAN
+            if dist_res == dist_res and dist_sup == dist_sup and dist_sup != 0:
+                rr = float(np.round(dist_res / dist_sup, 2))
+            zone_strength = sum(
+                1 for z in (dom_above, dom_below, whvn_above, whvn_below)
+                if z == z and abs(z - c) <= 50
+            )
+            row["volume_spike"] = volume_spike
+            row["delta_volume_sign"] = _sign(volume_spike - 1)
+            row["rr_ratio_estimate"] = rr
+            row["zone_cluster_strength"] = zone_strength
+            row["high_confidence_window"] = int(
+                volume_spike > 1.5 and oi_change > 0 and rr > 2.0 and zone_strength >= 2
+            )
+
+        # Final flags & scores (planning guarantees volume_features ran)
+        if "engineered" in stages:
+            row["hour"] = hour
+            row["minute"] = minute
+            row["event_score"] = body_size * surge * row["rolling_oi_increase_flag"]
+            row["no_trade_zone_flag"] = int(
+                candle_range < 8 and surge < 1.1 and abs(c - tp) < 5
+            )
+            row["is_alpha_hour"] = int(ALPHA_MINUTES[minute_of_day])
+
+        # 15m/30m EMAs as of this bar
+        if "multi_timeframe" in stages:
+            row.update(self._mtf.update(ts, o, h, l, c, v))
+
+        return row
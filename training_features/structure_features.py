@@ -34,23 +34,36 @@ def calculate_nearest_zone_strength(df: pd.DataFrame) -> pd.Series:
     # Placeholder: assign random strength
     return pd.Series(np.random.randint(1, 5, size=len(df)), name='nearest_zone_strength')
 
-# ==== NEW: Main Aggregator Function for Structure Features ====
+# ==== Column-store node ====
 
-def add_structure_features(df):
+def structure_columns(cols):
     """
-    Adds structure-related features to the dataframe by calling existing helper functions.
+    Column-store node for add_structure_features.
+    `cols` maps column names to arrays; returns {new column: array}.
     """
+    # Small frame over just the inputs so the helpers above can be reused
+    frame = pd.DataFrame({k: np.asarray(cols[k]) for k in ('high', 'low', 'close')}, copy=False)
+    frame = calculate_support_resistance_distances(frame)
 
-    # Distance from VWAP
-    df['distance_from_vwap'] = calculate_distance_from_vwap(df)
+    return {
+        # Distance from VWAP
+        'distance_from_vwap': calculate_distance_from_vwap(frame).to_numpy(),
+        # Distance from High Volume Node (simplified)
+        'distance_from_high_volume_node': calculate_distance_from_high_volume_node(frame).to_numpy(),
+        # Support and Resistance Distances
+        'support_distance': frame['support_distance'].to_numpy(),
+        'resistance_distance': frame['resistance_distance'].to_numpy(),
+        # Nearest Zone Strength (dummy for now)
+        'nearest_zone_strength': calculate_nearest_zone_strength(frame).to_numpy(),
+    }
 
-    # Distance from High Volume Node (simplified)
-    df['distance_from_high_volume_node'] = calculate_distance_from_high_volume_node(df)
-
-    # Support and Resistance Distances
-    df = calculate_support_resistance_distances(df)
+# ==== NEW: Main Aggregator Function for Structure Features ====
 
-    # Nearest Zone Strength (dummy for now)
-    df['nearest_zone_strength'] = calculate_nearest_zone_strength(df)
+def add_structure_features(df):
+    """
+    Adds structure-related features to the dataframe (in place).
+    """
+    for name, values in structure_columns(df).items():
+        df[name] = values
 
     return df
@@ -1,5 +1,11 @@
+import numpy as np
 import pandas as pd
 
+from training_features.session_calendar import (
+    MINUTES_PER_DAY, MINUTE_HOUR, MINUTE_MINUTE, MINUTE_OF_DAY, MINUTE_LABEL,
+    NAT_MINUTE, minute_index, mask_invalid, get_session_calendar,
+)
+
 # ==== Your Existing Functions ====
 
 def extract_hour(df: pd.DataFrame) -> pd.Series:
@@ -24,10 +30,14 @@ def calculate_minute_of_day(df: pd.DataFrame) -> pd.Series:
 
 def is_expiry_week(df: pd.DataFrame) -> pd.Series:
     """
-    Flags if the current date falls in the expiry week (assumed last week of month).
+    Flags if the current date falls in the week of the month's actual expiry
+    (Monday up to the expiry day; see session_calendar).
     """
-    date_series = pd.to_datetime(df['date'])
-    return (date_series.dt.day >= 23).astype(int).rename('expiry_week_flag')
+    days = pd.to_datetime(df['date']).to_numpy().astype('datetime64[D]').astype(np.int64)
+    cal = get_session_calendar()
+    valid = days != NAT_MINUTE
+    flags = cal.expiry_week_flag[cal.index(np.where(valid, days, cal.first_day))]
+    return pd.Series(mask_invalid(flags, valid), index=df.index, name='expiry_week_flag')
 
 def get_weekday(df: pd.DataFrame) -> pd.Series:
     """
@@ -35,25 +45,52 @@ def get_weekday(df: pd.DataFrame) -> pd.Series:
     """
     return pd.to_datetime(df['date']).dt.weekday.rename('weekday')
 
-# ==== Main Aggregator Function for Time Features ====
+# ==== Column-store node ====
 
-def add_time_features(df: pd.DataFrame) -> pd.DataFrame:
+def time_columns(cols) -> dict:
     """
-    Adds time-based features to the dataframe using existing helper functions.
-    Ensures 'time' and 'date' columns are available for feature extraction.
+    Column-store node for add_time_features.
+    `cols` maps column names to arrays; returns {new column: array}.
     """
+    out = {}
+
+    # Minutes since the epoch, from 'datetime' (or 'date' + 'time' strings)
+    if 'datetime' in cols:
+        minutes = minute_index(cols['datetime'])
+    else:
+        stamps = pd.Series(np.asarray(cols['date'])).astype(str) + ' ' + pd.Series(np.asarray(cols['time']))
+        minutes = minute_index(pd.to_datetime(stamps))
+    # NaT rows: looked up at a valid placeholder, then set back to NaN
+    cal = get_session_calendar()
+    valid = minutes != NAT_MINUTE
+    minutes = np.where(valid, minutes, cal.first_day * MINUTES_PER_DAY)
+    minute_of_day = minutes % MINUTES_PER_DAY
+    days = minutes // MINUTES_PER_DAY
 
     # 🛠 Fallback: Create 'time' and 'date' from 'datetime' if missing
-    if 'time' not in df.columns:
-        df['time'] = pd.to_datetime(df['datetime']).dt.strftime('%H:%M')
-    if 'date' not in df.columns:
-        df['date'] = pd.to_datetime(df['datetime']).dt.date.astype(str)
-
-    # 🔧 Apply all time-based feature generators
-    df['hour'] = extract_hour(df)
-    df['minute'] = extract_minute(df)
-    df['minute_of_day'] = calculate_minute_of_day(df)
-    df['expiry_week_flag'] = is_expiry_week(df)
-    df['weekday'] = get_weekday(df)
+    if 'time' not in cols:
+        out['time'] = MINUTE_LABEL[minute_of_day]
+    if 'date' not in cols:
+        out['date'] = days.astype('datetime64[D]').astype(str)
+
+    # 🔧 Everything else is integer indexing into the precomputed lookups
+    day_idx = cal.index(days)
+    out['hour'] = MINUTE_HOUR[minute_of_day]
+    out['minute'] = MINUTE_MINUTE[minute_of_day]
+    out['minute_of_day'] = MINUTE_OF_DAY[minute_of_day]
+    out['expiry_week_flag'] = cal.expiry_week_flag[day_idx]
+    out['weekday'] = cal.weekday[day_idx]
+
+    return {name: mask_invalid(values, valid) for name, values in out.items()}
+
+# ==== Main Aggregator Function for Time Features ====
+
+def add_time_features(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Adds time-based features to the dataframe from the session calendar lookups.
+    Ensures 'time' and 'date' columns are available.
+    """
+    for name, values in time_columns(df).items():
+        df[name] = values
 
     return df
@@ -1,5 +1,33 @@
+import numpy as np
 import pandas as pd
 
+def trend_regime_columns(cols, window=15, slope_threshold=0.15):
+    """
+    Column-store node for add_trend_regime.
+    `cols` maps column names to arrays; returns {new column: array}.
+    """
+    # ✅ Ensure 'close' exists
+    if 'close' not in cols:
+        n = len(cols.index) if hasattr(cols, "index") else len(next(iter(cols.values()), ()))
+        return {
+            "trend_strength": np.zeros(n, dtype=int),
+            "trend_regime": np.full(n, "range", dtype=object),
+        }
+
+    # ✅ Compute slope over rolling window
+    slope = pd.Series(np.asarray(cols["close"], dtype=float)).diff(periods=window).to_numpy()
+
+    # Classify trend regime (None where the slope is undefined)
+    regime = np.select(
+        [slope > slope_threshold, slope < -slope_threshold],
+        ["uptrend", "downtrend"],
+        "range"
+    ).astype(object)
+    regime[np.isnan(slope)] = None
+
+    return {"trend_strength": slope, "trend_regime": regime}
+
+
 def add_trend_regime(df, window=15, slope_threshold=0.15):
     """
     Detects trend regime based on slope of close price over rolling window.
@@ -14,30 +42,9 @@ def add_trend_regime(df, window=15, slope_threshold=0.15):
         slope_threshold (float): Threshold to define trend strength
 
     Returns:
-        pd.DataFrame: With trend regime and strength columns
+        pd.DataFrame: With trend regime and strength columns (added in place)
     """
-    df = df.copy()
-
-    # ✅ Ensure 'close' exists
-    if 'close' not in df.columns:
-        df['trend_strength'] = 0
-        df['trend_regime'] = 'range'
-        return df
-
-    # ✅ Compute slope over rolling window
-    df["trend_strength"] = df["close"].diff(periods=window)
-
-    # Classify trend regime
-    def classify_trend(slope):
-        if pd.isna(slope):
-            return None
-        if slope > slope_threshold:
-            return "uptrend"
-        elif slope < -slope_threshold:
-            return "downtrend"
-        else:
-            return "range"
-
-    df["trend_regime"] = df["trend_strength"].apply(classify_trend)
+    for name, values in trend_regime_columns(df, window, slope_threshold).items():
+        df[name] = values
 
     return df
@@ -1,6 +1,8 @@
 import pandas as pd
 import numpy as np
 
+from training_features.resample_manager import multi_timeframe_columns
+
 # ==== Your Existing Functions ====
 
 def cvd_slope_10m(df: pd.DataFrame, window: int = 10) -> pd.Series:
@@ -21,8 +23,11 @@ def entry_direction_aligned_with_trend(entry_dir: pd.Series, trend_dir: pd.Serie
 
 # ==== Main Aggregator ====
 
-def add_trend_features(df: pd.DataFrame) -> pd.DataFrame:
-    """Adds trend-related features to the dataframe using existing helper functions."""
+def add_trend_features(df: pd.DataFrame, carry: dict = None, carry_at: int = None) -> pd.DataFrame:
+    """
+    Adds trend-related features to the dataframe using existing helper functions.
+    `carry`/`carry_at` resume the 15m EMA state across chunks (see multi_timeframe_columns).
+    """
 
     df = df.copy()
 
@@ -32,24 +37,12 @@ def add_trend_features(df: pd.DataFrame) -> pd.DataFrame:
     else:
         df['cvd_slope_10m'] = 0  # fallback if not present in forward test
 
-    # ✅ EMA 15min Feature (resampling needs datetime index)
+    # ✅ EMA 15min Feature from the multi-timeframe cache (as of each 1-min bar,
+    # i.e. the partial 15m candle counts with its latest close — same as live)
     try:
-        df_resample = df.set_index('datetime')[['open', 'high', 'low', 'close', 'volume']]
-        df_15m = df_resample.resample('15min').agg({
-            'open': 'first',
-            'high': 'max',
-            'low': 'min',
-            'close': 'last',
-            'volume': 'sum'
-        })
-
-        ema_cross_flag = ema_50_15m_above_ema_200_15m(df_15m)
-       # Proper datetime-based alignment using merge_asof
-        ema_cross_flag = ema_cross_flag.reset_index().rename(columns={'index': 'datetime'})
-        df = pd.merge_asof(df.sort_values('datetime'), ema_cross_flag.sort_values('datetime'),
-                   on='datetime', direction='backward')
-
-
+        df = df.sort_values('datetime').reset_index(drop=True)
+        mtf = multi_timeframe_columns(df, timeframes=(15,), carry=carry, carry_at=carry_at)
+        df['ema_50_15m_above_ema_200_15m'] = mtf['ema_50_15m_above_ema_200_15m']
     except Exception as e:
         print(f"⚠️ EMA Crossover Feature generation failed: {e}")
         df['ema_50_15m_above_ema_200_15m'] = 0  # fallback
@@ -3,58 +3,77 @@
 import pandas as pd
 import numpy as np
 
-def add_volume_features(df):
+
+def volume_feature_columns(cols):
     """
-    Adds volume-based features to the dataframe.
-    Auto-skips features if buy/sell volume or open_interest is missing.
+    Column-store node for add_volume_features.
+    `cols` maps column names to arrays; returns {new column: array}.
     """
+    out = {}
+    volume = pd.Series(np.asarray(cols['volume']))
+    close = pd.Series(np.asarray(cols['close']))
 
     # ==== Basic Volume Features (total volume available) ====
-    df['volume_spike_flag'] = (df['volume'] > df['volume'].rolling(window=20, min_periods=1).mean() * 1.5).astype(int)
-    df['volume_surge_magnitude'] = df['volume'] / (df['volume'].rolling(window=20, min_periods=1).mean())
+    vol_mean_20 = volume.rolling(window=20, min_periods=1).mean()
+    out['volume_spike_flag'] = (volume > vol_mean_20 * 1.5).astype(int).to_numpy()
+    out['volume_surge_magnitude'] = (volume / vol_mean_20).to_numpy()
 
     # ==== Buy/Sell Volume Based Features (only if buy/sell volume exists) ====
-    if 'buy_volume' in df.columns and 'sell_volume' in df.columns:
+    if 'buy_volume' in cols and 'sell_volume' in cols:
         print("✅ Buy/Sell Volume detected — adding CVD features.")
 
         # Cumulative Volume Delta
-        df['cumulative_volume_delta'] = (df['buy_volume'] - df['sell_volume']).cumsum()
+        buy_sell_diff = pd.Series(np.asarray(cols['buy_volume']) - np.asarray(cols['sell_volume']))
+        cvd = buy_sell_diff.cumsum()
+        out['cumulative_volume_delta'] = cvd.to_numpy()
 
         # CVD Slopes
-        df['cvd_slope_5min'] = df['cumulative_volume_delta'].diff(periods=5)
-        df['cvd_slope_15min'] = df['cumulative_volume_delta'].diff(periods=15)
+        out['cvd_slope_5min'] = cvd.diff(periods=5).to_numpy()
+        out['cvd_slope_15min'] = cvd.diff(periods=15).to_numpy()
 
         # Buy/Sell Volume Difference
-        df['buy_sell_volume_diff'] = df['buy_volume'] - df['sell_volume']
+        out['buy_sell_volume_diff'] = buy_sell_diff.to_numpy()
 
     else:
 
         print("")
 
     # ==== Open Interest (OI) Based Features (only if open_interest exists) ====
-    if 'open_interest' in df.columns:
+    if 'open_interest' in cols:
         #print("✅ Open Interest detected — adding OI features.")
+        open_interest = pd.Series(np.asarray(cols['open_interest']))
 
-        df['oi_change_1min'] = df['open_interest'].diff()
-        df['oi_change_5min'] = df['open_interest'].diff(periods=5)
+        oi_change_5min = open_interest.diff(periods=5)
+        out['oi_change_1min'] = open_interest.diff().to_numpy()
+        out['oi_change_5min'] = oi_change_5min.to_numpy()
 
         # Rolling OI trend flags
-        df['rolling_oi_increase_flag'] = (df['open_interest'].diff(periods=5) > 0).astype(int)
-        df['rolling_oi_decrease_flag'] = (df['open_interest'].diff(periods=5) < 0).astype(int)
+        out['rolling_oi_increase_flag'] = (oi_change_5min > 0).astype(int).to_numpy()
+        out['rolling_oi_decrease_flag'] = (oi_change_5min < 0).astype(int).to_numpy()
 
         # Price-OI Divergence
-        price_change_5min = df['close'].diff(periods=5)
-        oi_change_5min = df['open_interest'].diff(periods=5)
-        df['price_oi_divergence_flag'] = ((price_change_5min * oi_change_5min) < 0).astype(int)
+        price_change_5min = close.diff(periods=5)
+        out['price_oi_divergence_flag'] = ((price_change_5min * oi_change_5min) < 0).astype(int).to_numpy()
 
         # Price-Volume-OI Confluence
-        volume_change_5min = df['volume'].diff(periods=5)
-        df['price_volume_oi_confluence_flag'] = (
+        volume_change_5min = volume.diff(periods=5)
+        out['price_volume_oi_confluence_flag'] = (
             (np.sign(price_change_5min) == np.sign(oi_change_5min)) &
             (np.sign(price_change_5min) == np.sign(volume_change_5min))
-        ).astype(int)
+        ).astype(int).to_numpy()
 
     else:
         print("⚠️ Open Interest not detected — skipping OI features.")
 
+    return out
+
+
+def add_volume_features(df):
+    """
+    Adds volume-based features to the dataframe.
+    Auto-skips features if buy/sell volume or open_interest is missing.
+    """
+    for name, values in volume_feature_columns(df).items():
+        df[name] = values
+
     return df
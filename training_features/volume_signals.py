@@ -1,7 +1,34 @@
 # features/volume_signals.py
 
+import numpy as np
 import pandas as pd
 
+
+def volume_signal_columns(cols, rolling_window=10):
+    """
+    Column-store node for add_volume_features (volume signals).
+    `cols` maps column names to arrays; returns {new column: array}.
+    """
+    volume = pd.Series(np.asarray(cols["volume"]))
+    direction = np.asarray(cols["close"]) - np.asarray(cols["open"])
+
+    # Rolling average volume
+    rolling_avg = volume.rolling(window=rolling_window).mean()
+
+    # Directional delta volume (approximated as buyer/seller aggression)
+    delta_volume = volume * np.sign(np.nan_to_num(direction, nan=0.0)).astype(int)
+
+    return {
+        "rolling_avg_vol_10": rolling_avg.to_numpy(),
+        # Volume spike ratio
+        "volume_spike": (volume / rolling_avg.replace(0, 1)).to_numpy(),
+        "direction": direction,
+        "delta_volume_sign": delta_volume.to_numpy(),
+        # Rolling sum of delta volume
+        "cum_delta_5": delta_volume.rolling(window=5).sum().to_numpy(),
+    }
+
+
 def add_volume_features(df, rolling_window=10):
     """
     Adds volume-based features for spike and direction bias.
@@ -17,21 +44,9 @@ def add_volume_features(df, rolling_window=10):
         rolling_window (int): Window size for rolling volume averages
 
     Returns:
-        pd.DataFrame: With new volume features added
+        pd.DataFrame: With new volume features added (in place)
     """
-    df = df.copy()
-
-    # Rolling average volume
-    df["rolling_avg_vol_10"] = df["volume"].rolling(window=rolling_window).mean()
-
-    # Volume spike ratio
-    df["volume_spike"] = df["volume"] / df["rolling_avg_vol_10"].replace(0, 1)
-
-    # Directional delta volume (approximated as buyer/seller aggression)
-    df["direction"] = df["close"] - df["open"]
-    df["delta_volume_sign"] = df["volume"] * df["direction"].apply(lambda x: 1 if x > 0 else (-1 if x < 0 else 0))
-
-    # Rolling sum of delta volume
-    df["cum_delta_5"] = df["delta_volume_sign"].rolling(window=5).sum()
+    for name, values in volume_signal_columns(df, rolling_window).items():
+        df[name] = values
 
     return df
@@ -1,7 +1,66 @@
 # features/vwap_utils.py
 
+from collections import deque
+
+import numpy as np
 import pandas as pd
 
+VWAP_COLUMNS = (
+    "vwap",
+    "vwap_distance",
+    "vwap_distance_pct",
+    "above_vwap_flag",
+    "vwap_trend_slope_15m",
+)
+
+
+def compute_vwap_arrays(session, high, low, close, volume):
+    """
+    Batch daily VWAP over numpy arrays.
+
+    `session` labels each bar with its trading day (dates or integer codes);
+    the cumulative TP·V and V sums restart on every new label in a single
+    grouped cumulative pass.
+
+    Returns:
+        (tp, dict of VWAP_COLUMNS -> numpy arrays)
+    """
+    high = np.asarray(high, dtype=float)
+    low = np.asarray(low, dtype=float)
+    close = np.asarray(close, dtype=float)
+    volume = np.asarray(volume, dtype=float)
+
+    tp = (high + low + close) / 3
+    codes = pd.factorize(np.asarray(session))[0]
+    sums = pd.DataFrame({"pv": tp * volume, "v": volume}).groupby(codes, sort=False).cumsum()
+    with np.errstate(divide="ignore", invalid="ignore"):
+        vwap = sums["pv"].to_numpy() / sums["v"].to_numpy()
+
+    vwap_distance = close - vwap
+    slope = np.full(len(vwap), np.nan)
+    slope[3:] = vwap[3:] - vwap[:-3]
+
+    return tp, {
+        "vwap": vwap,
+        "vwap_distance": vwap_distance,
+        "vwap_distance_pct": vwap_distance / np.where(vwap == 0, 0.0001, vwap),
+        "above_vwap_flag": (close > vwap).astype(int),
+        "vwap_trend_slope_15m": slope,
+    }
+
+
+def vwap_columns(cols):
+    """
+    Column-store node for calculate_vwap.
+    `cols` maps column names to arrays; returns {new column: array}.
+    """
+    dt = pd.DatetimeIndex(pd.to_datetime(np.asarray(cols["datetime"])))
+    tp, out = compute_vwap_arrays(
+        dt.normalize().to_numpy(), cols["high"], cols["low"], cols["close"], cols["volume"]
+    )
+    return {"date": dt.date, "tp": tp, **out}
+
+
 def calculate_vwap(df):
     """
     Calculates daily VWAP and VWAP-based features.
@@ -16,37 +75,51 @@ def calculate_vwap(df):
     Assumes DataFrame has: ['datetime', 'high', 'low', 'close', 'volume']
 
     Returns:
-        pd.DataFrame: With VWAP and derived features added
+        pd.DataFrame: With VWAP and derived features added (in place)
     """
-    df = df.copy()
-
     # Ensure datetime is datetime type
     df["datetime"] = pd.to_datetime(df["datetime"])
 
-    # Create a date column to reset VWAP daily
-    df["date"] = df["datetime"].dt.date
+    # Adds 'date' (resets VWAP daily), 'tp' and the VWAP columns
+    for name, values in vwap_columns(df).items():
+        df[name] = values
 
-    # Typical price
-    df["tp"] = (df["high"] + df["low"] + df["close"]) / 3
+    return df
 
-    # Initialize VWAP column
-    df["vwap"] = 0.0
 
-    # Daily VWAP calculation
-    for date in df["date"].unique():
-        mask = df["date"] == date
-        tp = df.loc[mask, "tp"]
-        vol = df.loc[mask, "volume"]
+class VWAPAccumulator:
+    """
+    Incremental daily VWAP for the live loop.
 
-        cum_vwap = (tp * vol).cumsum() / vol.cumsum()
-        df.loc[mask, "vwap"] = cum_vwap
+    Keeps cumulative TP·V and V for the current session (reset when the
+    session label changes) plus the last few VWAP values for the slope.
+    `update()` returns the same columns as calculate_vwap for one bar.
+    """
 
-    # VWAP distance
-    df["vwap_distance"] = df["close"] - df["vwap"]
-    df["vwap_distance_pct"] = df["vwap_distance"] / df["vwap"].replace(0, 0.0001)
-    df["above_vwap_flag"] = (df["close"] > df["vwap"]).astype(int)
+    def __init__(self):
+        self.session = None
+        self.cum_pv = 0.0
+        self.cum_v = 0.0
+        self._vwaps = deque(maxlen=4)
 
-    # VWAP slope over 15-minute window (3 bars if 5-min candles)
-    df["vwap_trend_slope_15m"] = df["vwap"].diff(periods=3)
+    def update(self, session, high, low, close, volume) -> dict:
+        if session != self.session:
+            self.session = session
+            self.cum_pv = 0.0
+            self.cum_v = 0.0
 
-    return df
+        tp = (high + low + close) / 3
+        self.cum_pv += tp * volume
+        self.cum_v += volume
+        vwap = self.cum_pv / self.cum_v if self.cum_v else float("nan")
+        self._vwaps.append(vwap)
+
+        vwap_distance = close - vwap
+        slope = vwap - self._vwaps[0] if len(self._vwaps) == 4 else float("nan")
+        return {
+            "vwap": vwap,
+            "vwap_distance": vwap_distance,
+            "vwap_distance_pct": vwap_distance / (vwap if vwap != 0 else 0.0001),
+            "above_vwap_flag": int(close > vwap),
+            "vwap_trend_slope_15m": slope,
+        }